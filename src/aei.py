@@ -0,0 +1,179 @@
+"""
+Command-line tool calling the aEi.ai service, one subcommand per endpoint.
+
+The access token is cached, so that only the first call, or the first one after it expires, logs in.
+API modules are only imported once the arguments are parsed, so that --help and usage errors return at once, and
+calls are sent with the standard library rather than requests, which would take longer to import than most calls.
+
+Usage:
+    export AEI_USERNAME=... AEI_PASSWORD=...
+    python aei.py users create
+    python aei.py interactions create <user ID> <user ID>
+    python aei.py inputs text <user ID> <interaction ID> "I am happy"
+    python aei.py users emotion <user ID>
+"""
+
+import argparse
+import os
+import sys
+from typing import Any, Callable, Dict, List, Optional, Text
+
+DEFAULT_TOKEN_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "aei", "token.json")
+USER_FACETS = ("emotion", "mood", "personality", "satisfaction", "social-perception")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Builds the parser of the command line, every leaf subcommand setting the client method to call and a function
+    building its keyword arguments from the parsed arguments.
+
+    Returns:
+        Argument parser.
+    """
+    parser = argparse.ArgumentParser(prog="aei", description="Call the aEi.ai service.")
+    parser.add_argument("--base-url", help="base URL of the aEi.ai service, https://aei.ai by default")
+    parser.add_argument("--username", default=os.environ.get("AEI_USERNAME"), help="username, $AEI_USERNAME by default")
+    parser.add_argument("--password", default=os.environ.get("AEI_PASSWORD"), help="password, $AEI_PASSWORD by default")
+    parser.add_argument("--token", default=os.environ.get("AEI_ACCESS_TOKEN"),
+                        help="access token to use instead of logging in, $AEI_ACCESS_TOKEN by default")
+    parser.add_argument("--token-cache", default=os.environ.get("AEI_TOKEN_CACHE", DEFAULT_TOKEN_CACHE),
+                        help="path of the file caching the access token, $AEI_TOKEN_CACHE or %s by default"
+                             % DEFAULT_TOKEN_CACHE)
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    login = commands.add_parser("login", help="log in and cache the access token")
+    login.set_defaults(method=None)
+
+    # users
+    users = _group(commands, "users", "create, get and list users, and get their affect")
+    create = users.add_parser("create", help="create a user")
+    create.add_argument("--attribute", action="append", default=[], metavar="KEY=VALUE", help="user attribute")
+    create.set_defaults(method="create_new_user", arguments=lambda a: {"attributes": _attributes(a.attribute)})
+    users.add_parser("list", help="list users").set_defaults(method="get_user_list", arguments=lambda a: {})
+    get = users.add_parser("get", help="get a user")
+    get.add_argument("user_id")
+    get.set_defaults(method="get_user", arguments=lambda a: {"user_id": a.user_id})
+    for facet in USER_FACETS:
+        command = users.add_parser(facet, help="get a user's " + facet.replace("-", " "))
+        command.add_argument("user_id")
+        command.set_defaults(method="get_user_" + facet.replace("-", "_"), arguments=lambda a: {"user_id": a.user_id})
+    empathy = users.add_parser("empathy", help="get a user's empathy towards other users")
+    empathy.add_argument("user_id")
+    empathy.add_argument("target_user_ids", nargs="+", metavar="target_user_id")
+    empathy.set_defaults(method="get_user_empathy",
+                         arguments=lambda a: {"user_id": a.user_id, "target_user_ids": a.target_user_ids})
+
+    # interactions
+    interactions = _group(commands, "interactions", "create, get and list interactions, and add users to them")
+    create = interactions.add_parser("create", help="create an interaction of users")
+    create.add_argument("user_ids", nargs="+", metavar="user_id")
+    create.set_defaults(method="create_new_interaction", arguments=lambda a: {"user_ids": a.user_ids})
+    interactions.add_parser("list", help="list interactions").set_defaults(method="get_interaction_list",
+                                                                          arguments=lambda a: {})
+    get = interactions.add_parser("get", help="get an interaction")
+    get.add_argument("interaction_id")
+    get.set_defaults(method="get_interaction", arguments=lambda a: {"interaction_id": a.interaction_id})
+    add_users = interactions.add_parser("add-users", help="add users to an interaction")
+    add_users.add_argument("interaction_id")
+    add_users.add_argument("user_ids", nargs="+", metavar="user_id")
+    add_users.set_defaults(method="add_users_to_interaction",
+                           arguments=lambda a: {"interaction_id": a.interaction_id, "user_ids": a.user_ids})
+
+    # inputs
+    inputs = _group(commands, "inputs", "send text, image and multiple inputs")
+    text = inputs.add_parser("text", help="send a user's text to an interaction")
+    text.add_argument("user_id")
+    text.add_argument("interaction_id")
+    text.add_argument("text")
+    text.set_defaults(method="send_text", arguments=lambda a: {"user_id": a.user_id,
+                                                               "interaction_id": a.interaction_id, "text": a.text})
+    image = inputs.add_parser("image", help="send a user's image to an interaction")
+    image.add_argument("user_id")
+    image.add_argument("interaction_id")
+    image.add_argument("image", help="image URL or file path")
+    image.set_defaults(method="send_image", arguments=lambda a: {"user_id": a.user_id,
+                                                                 "interaction_id": a.interaction_id, "image": a.image})
+    batch = inputs.add_parser("batch", help="send multiple inputs given as JSON")
+    batch.add_argument("file", help='path of a {"inputs": [...]} JSON file, - for standard input')
+    batch.set_defaults(method="send_inputs", arguments=lambda a: {"inputs": _read(a.file)})
+
+    # metrics
+    metrics = _group(commands, "metrics", "get the number of used queries")
+    metrics.add_parser("free", help="get the number of used free queries").set_defaults(
+        method="get_used_free_queries", arguments=lambda a: {})
+    metrics.add_parser("paid", help="get the number of used paid queries").set_defaults(
+        method="get_used_paid_queries", arguments=lambda a: {})
+
+    # subscription
+    subscription = _group(commands, "subscription", "get and update the subscription")
+    subscription.add_parser("get", help="get the subscription").set_defaults(method="get_subscription",
+                                                                            arguments=lambda a: {})
+    update = subscription.add_parser("update", help="update the subscription")
+    update.add_argument("subscription_type")
+    update.set_defaults(method="update_subscription", arguments=lambda a: {"subscription_type": a.subscription_type})
+    return parser
+
+
+def main(argv: List[Text] = None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.token is None and (not args.username or not args.password):
+        parser.error("username and password, or an access token, are required")
+
+    # imported only now, so that parsing the command line does not pay for the HTTP stack, and the calls are sent
+    # with the standard library, a single call not being worth importing requests
+    from api.aei_ai import AEI_AI_URL, AeiClient
+    from api.tokens import TokenProvider
+    from api.transport import StdlibSession
+
+    client = AeiClient(base_url=args.base_url or AEI_AI_URL, session=StdlibSession())
+    with client:
+        if args.token is not None:
+            def call(function: Callable[..., Any], **kwargs) -> Any:
+                return function(access_token=args.token, **kwargs)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(args.token_cache)), exist_ok=True)
+            tokens = TokenProvider(username=args.username, password=args.password, client=client,
+                                   cache_path=args.token_cache)
+            call = tokens.call
+            if args.method is None:
+                # logs in unless the cached token is still valid
+                tokens.get_token()
+
+        if args.method is None:
+            return
+        response = call(getattr(client, args.method), **args.arguments(args))
+
+    out = sys.stdout.buffer
+    out.write(response.content)
+    out.write(b"\n")
+    out.flush()
+    if response.status_code >= 400:
+        sys.exit(1)
+
+
+def _group(commands: argparse._SubParsersAction, name: Text, help: Text) -> argparse._SubParsersAction:
+    """Adds a subcommand taking subcommands of its own."""
+    group = commands.add_parser(name, help=help).add_subparsers(dest=name + "_command", metavar="command")
+    group.required = True
+    return group
+
+
+def _attributes(pairs: List[Text]) -> Optional[Dict[Text, Text]]:
+    attributes = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        attributes[key] = value
+    return attributes or None
+
+
+def _read(path: Text) -> Text:
+    if path == "-":
+        return sys.stdin.read()
+    with open(path) as f:
+        return f.read()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,32 +2,62 @@
 aEi.ai Python API.
 """
 
-import json
-from requests import post, get, put, delete
-from requests.models import Response
-from typing import Text, Dict, List
+from typing import TYPE_CHECKING, Any, Text, Dict, Iterable, List, Optional, Set, Tuple, Union
 from base64 import b64encode
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic, perf_counter
+
+from api import codec
+# Status used to be defined here
+from api.models import Status
+from api.uploads import ImageBody, ImageSource, inputs_body, is_buffer, is_image_url
+
+# requests and the optional client layers are only imported by their users, so that importing the client stays fast
+if TYPE_CHECKING:
+    from requests import Session
+    from requests.models import Response
+
+    from api.budget import QueryBudget
+    from api.compression import Compression
+    from api.hedging import Hedging
+    from api.instrumentation import RequestHook
+    from api.resilience import Resilience
+    from api.transport import StdlibSession
+
+# public API, so that wildcard imports do not re-export the names this module imports
+__all__ = [
+    "AEI_AI_URL", "API_VERSION", "API_URL", "DEFAULT_POOL_CONNECTIONS", "DEFAULT_POOL_MAXSIZE", "DEFAULT_TIMEOUT",
+    "DEFAULT_CACHE_MAX_ENTRIES", "DEFAULT_CACHE_TTLS", "DEFAULT_MAX_URL_LENGTH", "TARGET_PARAMETER", "Status",
+    "auth_headers", "params_2_string", "split_targets", "is_success",
+    "text_input", "image_input", "inputs_2_string", "input_count", "input_sources", "input_user_ids",
+    "ResponseCache", "AeiClient", "default_client", "set_default_client", "register", "login", "create_new_user",
+    "create_new_interaction", "get_interaction", "get_interaction_list", "add_users_to_interaction", "send_text",
+    "send_image", "send_inputs", "get_user", "get_user_emotion", "get_user_mood", "get_user_personality",
+    "get_user_satisfaction", "get_user_social_perception", "get_user_empathy", "get_user_list",
+    "get_used_free_queries", "get_used_paid_queries", "get_payment_sources", "get_payment_source",
+    "add_payment_source", "get_subscription", "update_subscription", "delete_source", "update_source",
+    "change_password", "reset_password", "update_password"
+]
 
 AEI_AI_URL = "https://aei.ai"
 API_VERSION = "v1"
 API_URL = AEI_AI_URL + "/api/" + API_VERSION
 
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_TIMEOUT = (3.05, 30)
+DEFAULT_MAX_URL_LENGTH = 2000
+TARGET_PARAMETER = "target_user_id"
 
-class Status:
-    """HTTP response status."""
-    def __init__(self, code: int = None, error: Text = None, help: Text = None, **kwargs):
-        """
-        Constructs an HTTP response status.
-
-        Args:
-            code: HTTP response status code.
-            error: Error message when response code is not 200.
-            help: Instruction on how to fix the error.
-            **kwargs: Arguments as key-value pairs.
-        """
-        self.code = code
-        self.error = error
-        self.help = help
+DEFAULT_CACHE_MAX_ENTRIES = 10000
+DEFAULT_CACHE_TTLS = {
+    "emotion": 2.0,
+    "mood": 30.0,
+    "satisfaction": 30.0,
+    "social_perception": 300.0,
+    "personality": 3600.0
+}
 
 
 def auth_headers(access_token: Text) -> Dict[Text, Text]:
@@ -43,46 +73,63 @@ def auth_headers(access_token: Text) -> Dict[Text, Text]:
     return {"Authorization": "Bearer " + access_token}
 
 
-def params_2_string(name: Text, values: List[Text]) -> Text:
+def params_2_string(params: Dict[Text, Text] = None, name: Text = None, values: List[Text] = None) -> Text:
     """
-    Converts given list of parameter values to a string.
-
-    Args:
-        name: Name of all parameters.
-        values: List of values for given parameter name.
-
-    Returns:
-        String including key-value pairs, for example, ?key=value1&key=value2 for
-        name=key and value = [value1, value2].
-    """
-    params = ""
-    for i, value in enumerate(values):
-        params += "?" if i == 0 else "&"
-        params += name + "=" + value
-    return params
-
-
-def params_2_string(params: Dict[Text, Text]) -> Text:
-    """
-    Converts given key-value pairs to a string.
+    Converts given key-value pairs, or given list of values of a repeated parameter, to a string.
 
     Args:
         params: key-value pairs as a map.
+        name: Name of all parameters, when given a list of values instead of key-value pairs.
+        values: List of values for given parameter name.
 
     Returns:
          String including key-value pairs, for example, ?key1=value1&key2=value2 for
-         {"key1": "value1", "key2": "value2"}.
-    """
-    if params is None or len(params.keys()) == 0:
+         {"key1": "value1", "key2": "value2"}, or ?key=value1&key=value2 for name=key and
+         values=[value1, value2].
+    """
+    if name is not None:
+        pairs = [(name, value) for value in values or []]
+    elif params:
+        pairs = params.items()
+    else:
         return ""
 
     out = "?"
-    for k, v in params.items():
+    for k, v in pairs:
         out = out + k + "=" + v + "&"
+    if len(out) == 1:
+        return ""
     out = out[:-1]  # remove last &
     return out
 
 
+def split_targets(target_user_ids: List[Text], base_length: int,
+                  max_url_length: int = DEFAULT_MAX_URL_LENGTH) -> List[List[Text]]:
+    """
+    Splits target user IDs into lists whose query strings fit a URL length limit.
+
+    Args:
+        target_user_ids: Target user IDs.
+        base_length: Length of the URL without query string.
+        max_url_length: Maximum length of a URL.
+
+    Returns:
+        Consecutive lists of target user IDs, each holding at least one ID.
+    """
+    chunks, chunk, length = [], [], base_length
+    for target_id in target_user_ids:
+        # ?target_user_id=... or &target_user_id=...
+        part = len(TARGET_PARAMETER) + len(target_id) + 2
+        if chunk and length + part > max_url_length:
+            chunks.append(chunk)
+            chunk, length = [], base_length
+        chunk.append(target_id)
+        length += part
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
 def is_success(status: Dict[Text, Text]) -> bool:
     """
     Asserts if HTTP response is successful.
@@ -100,7 +147,1226 @@ def is_success(status: Dict[Text, Text]) -> bool:
     return True
 
 
-def register(username: Text, email: Text, password: Text, agreed: bool) -> Response:
+def text_input(user_id: Text, interaction_id: Text, text: Text) -> Dict[Text, Text]:
+    """
+    Builds a text input entry for a multi-input request.
+
+    Args:
+        user_id: Source user ID.
+        interaction_id: Target interaction ID.
+        text: User's utterance.
+
+    Returns:
+        Text input as key-value pairs.
+    """
+    return {"userId": user_id, "interactionId": interaction_id, "text": text}
+
+
+def image_input(user_id: Text, interaction_id: Text, image: ImageSource) -> Dict[Text, Any]:
+    """
+    Builds an image input entry for a multi-input request.
+
+    Args:
+        user_id: Source user ID.
+        interaction_id: Target interaction ID.
+        image: User's input image URL, file path, bytes or binary file-like object.
+
+    Returns:
+        Image input as key-value pairs.
+    """
+    return {"userId": user_id, "interactionId": interaction_id, "image": image}
+
+
+def inputs_2_string(inputs: List[Dict[Text, Text]]) -> Text:
+    """
+    Converts given input entries to the JSON string accepted by the multi-input endpoint.
+
+    Images must be given by URL; send_inputs also accepts the entries themselves, streaming images given
+    by content.
+
+    Args:
+        inputs: Input entries built by text_input or image_input, in the order they should be analyzed.
+
+    Returns:
+        Inputs as JSON string, for example, {"inputs": [{"userId": ..., "interactionId": ..., "text": ...}]}.
+    """
+    return codec.dumps({"inputs": inputs})
+
+
+def input_count(inputs: Union[Text, List[Dict[Text, Any]]]) -> int:
+    """
+    Counts given inputs.
+
+    Args:
+        inputs: Inputs as JSON string, as built by inputs_2_string, or input entries.
+
+    Returns:
+        Number of inputs, 1 if inputs are not in the expected format.
+    """
+    if isinstance(inputs, list):
+        return len(inputs)
+    try:
+        return len(codec.loads(inputs)["inputs"])
+    except (ValueError, TypeError, KeyError):
+        return 1
+
+
+def input_sources(inputs: Union[Text, List[Dict[Text, Any]]]) -> List[Tuple[Text, Optional[Text]]]:
+    """
+    Extracts source user and target interaction IDs of given inputs.
+
+    Args:
+        inputs: Inputs as JSON string, as built by inputs_2_string, or input entries.
+
+    Returns:
+        (user ID, interaction ID) of each input, in input order, empty if inputs are not in the expected format.
+    """
+    try:
+        entries = inputs if isinstance(inputs, list) else codec.loads(inputs)["inputs"]
+        return [(entry["userId"], entry.get("interactionId")) for entry in entries]
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return []
+
+
+def input_user_ids(inputs: Union[Text, List[Dict[Text, Any]]]) -> Set[Text]:
+    """
+    Extracts IDs of the users who sent given inputs.
+
+    Args:
+        inputs: Inputs as JSON string, as built by inputs_2_string, or input entries.
+
+    Returns:
+        Set of source user IDs, empty if inputs are not in the expected format.
+    """
+    return {user_id for user_id, _ in input_sources(inputs)}
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of user model responses with a separate time-to-live per facet.
+
+    Entries are keyed by access token, user ID and facet. Every entry of a user is dropped when
+    an input of that user is sent through the client owning the cache.
+    """
+    def __init__(self, ttls: Dict[Text, float] = None, max_entries: int = DEFAULT_CACHE_MAX_ENTRIES):
+        """
+        Constructs a response cache.
+
+        Args:
+            ttls: Time-to-live in seconds per facet (emotion, mood, personality, satisfaction, social_perception),
+                overriding the defaults. Facets with a non-positive time-to-live are not cached.
+            max_entries: Maximum number of cached responses, least recently used ones are evicted first.
+        """
+        self.ttls = dict(DEFAULT_CACHE_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.max_entries = max_entries
+
+        self._entries: "OrderedDict[Tuple[Text, Text, Text], Tuple[float, Response]]" = OrderedDict()
+        self._user_keys: Dict[Text, Set[Tuple[Text, Text, Text]]] = {}
+        self._generations: Dict[Text, int] = {}
+        self._lock = Lock()
+
+    def get(self, access_token: Text, user_id: Text, facet: Text) -> Optional["Response"]:
+        """
+        Gets a cached response.
+
+        Args:
+            access_token: Client's access token.
+            user_id: Given user ID.
+            facet: User model facet, for example, emotion.
+
+        Returns:
+            Cached response, None if there is no fresh one.
+        """
+        key = (access_token, user_id, facet)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def generation(self, user_id: Text) -> int:
+        """
+        Gets the number of times entries of given user were invalidated.
+
+        Args:
+            user_id: Given user ID.
+
+        Returns:
+            Invalidation generation of the user, to be passed to put.
+        """
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def put(self, access_token: Text, user_id: Text, facet: Text, response: "Response", generation: int):
+        """
+        Caches a response, unless the user was invalidated since the request was made.
+
+        Args:
+            access_token: Client's access token.
+            user_id: Given user ID.
+            facet: User model facet, for example, emotion.
+            response: Response to cache.
+            generation: Invalidation generation of the user read before the request was made.
+        """
+        ttl = self.ttls.get(facet, 0)
+        if ttl <= 0:
+            return
+
+        key = (access_token, user_id, facet)
+        with self._lock:
+            # a response that raced with an input of the user may be stale already
+            if self._generations.get(user_id, 0) != generation:
+                return
+            self._entries[key] = (monotonic() + ttl, response)
+            self._entries.move_to_end(key)
+            self._user_keys.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: Text):
+        """
+        Drops all cached responses of given user.
+
+        Args:
+            user_id: Given user ID.
+        """
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for key in self._user_keys.pop(user_id, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        """Drops all cached responses."""
+        with self._lock:
+            for user_id in self._user_keys:
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: Tuple[Text, Text, Text]):
+        """Removes a cached response, must be called while holding the lock."""
+        self._entries.pop(key, None)
+        keys = self._user_keys.get(key[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[key[1]]
+
+
+class AeiClient:
+    """aEi.ai API client backed by a pooled, keep-alive HTTP session."""
+    def __init__(self, base_url: Text = AEI_AI_URL, pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize: int = DEFAULT_POOL_MAXSIZE, pool_block: bool = False,
+                 timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT, warm_up: int = 0,
+                 cache: ResponseCache = None, resilience: "Resilience" = None, budget: "QueryBudget" = None,
+                 hooks: Iterable["RequestHook"] = None, compression: "Compression" = None,
+                 hedging: "Hedging" = None, session: Union["Session", "StdlibSession"] = None):
+        """
+        Constructs an aEi.ai API client.
+
+        Args:
+            base_url: Base URL of the aEi.ai service.
+            pool_connections: Number of host connection pools to cache.
+            pool_maxsize: Maximum number of keep-alive connections kept per host.
+            pool_block: True to block when all pooled connections are in use, instead of opening extra ones.
+            timeout: Request timeout in seconds, either a single value or a (connect, read) tuple.
+            warm_up: Number of connections to open in advance, 0 to open them lazily.
+            cache: Cache of user model responses, None to always call the service.
+            resilience: Rate limiting, retry and circuit breaking layer all requests go through, None to send
+                every request exactly once.
+            budget: Query budget counting the billable calls of the client, None for no accounting.
+            hooks: Hooks called around every request, such as metrics, None for no instrumentation.
+            compression: Request body compression and response encoding negotiation, None to send bodies as they are.
+            hedging: Hedging of slow requests to idempotent read endpoints, None to send a single copy of every
+                request. Every hedged copy the service answers is charged to the query budget.
+            session: HTTP session sending the requests, for example, a StdlibSession for processes making few calls,
+                which then do not import requests, a requests session with a pool of given size if not given.
+        """
+        self.base_url = base_url
+        self.api_url = base_url + "/api/" + API_VERSION
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self.cache = cache
+        self.resilience = resilience
+        self.compression = compression
+        self.hedging = hedging
+        self.budget = budget
+        if budget is not None:
+            budget.bind(self)
+        self.hooks: List["RequestHook"] = []
+        for hook in hooks or []:
+            self.add_hook(hook)
+
+        # share one session, hence one connection pool, between all calls of this client
+        if session is None:
+            from requests import Session
+            from requests.adapters import HTTPAdapter
+            session = Session()
+            self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                       pool_block=pool_block)
+            session.mount("https://", self.adapter)
+            session.mount("http://", self.adapter)
+        else:
+            self.adapter = None
+        self.session = session
+
+        if warm_up > 0:
+            self.warm_up(connections=warm_up)
+
+    def __enter__(self) -> "AeiClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes all pooled connections of the client."""
+        self.session.close()
+
+    def add_hook(self, hook: "RequestHook"):
+        """
+        Adds a hook called around every request of the client.
+
+        Args:
+            hook: Request hook.
+        """
+        hook.on_attach(self)
+        self.hooks = self.hooks + [hook]
+
+    def remove_hook(self, hook: "RequestHook"):
+        """
+        Removes a hook added to the client.
+
+        Args:
+            hook: Request hook.
+        """
+        self.hooks = [h for h in self.hooks if h is not hook]
+
+    def pool_stats(self) -> Dict[Text, int]:
+        """
+        Gets the connection usage of the client's pool.
+
+        Returns:
+            Number of host pools, of connections opened and of idle pooled connections, and the maximum number of
+            pooled connections per host.
+
+        Raises:
+            TypeError: If the client was given a session of its own, whose pool it does not manage.
+        """
+        if self.adapter is None:
+            raise TypeError("Pool stats are only kept for the client's own requests session.")
+        pools = self.adapter.poolmanager.pools
+        opened = idle = 0
+        hosts = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            hosts += 1
+            opened += pool.num_connections
+            # free slots of the pool queue are None until a connection is returned to it
+            idle += sum(1 for connection in list(pool.pool.queue) if connection is not None) if pool.pool else 0
+        return {"hosts": hosts, "connections_opened": opened, "connections_idle": idle,
+                "pool_maxsize": self.pool_maxsize}
+
+    def warm_up(self, connections: int = 1):
+        """
+        Opens given number of connections to the aEi.ai service, so that the first API calls
+        do not pay for the TCP and TLS handshakes.
+
+        Args:
+            connections: Number of connections to open, capped by the pool size.
+        """
+        connections = max(1, min(connections, self.pool_maxsize))
+        from concurrent.futures import ThreadPoolExecutor
+        # concurrent requests are needed, otherwise the session would reuse a single connection
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            for _ in range(connections):
+                executor.submit(self._warm_up_connection)
+
+    def _warm_up_connection(self):
+        try:
+            self.session.head(self.base_url, timeout=self.timeout)
+        except OSError:
+            # warm-up is best effort, requests exceptions being OS errors too, the actual call will surface any
+            # connection error
+            pass
+
+    def _request(self, method: Text, endpoint: Text, url: Text, queries: int = 1, **kwargs) -> "Response":
+        """
+        Makes an HTTP request through the pooled session.
+
+        Args:
+            method: HTTP method.
+            endpoint: Name of the called API endpoint.
+            url: Request URL.
+            queries: Number of queries the call is billed for, when the endpoint is billable.
+            **kwargs: Arguments passed to the session request, such as data and headers.
+
+        Returns:
+            Response to the request.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        if self.budget is not None:
+            self.budget.before_call(endpoint)
+        if self.compression is not None:
+            self.compression.prepare(endpoint, kwargs)
+
+        if self.hooks:
+            response = self._send_with_hooks(method, endpoint, url, kwargs)
+        else:
+            response = self._send(method, endpoint, url, kwargs)
+
+        # copies of hedged calls are recorded one by one as they are answered
+        if self.budget is not None and response.status_code < 400 and not self._is_hedged(method, endpoint):
+            self.budget.record(endpoint, queries=queries)
+        return response
+
+    def _is_hedged(self, method: Text, endpoint: Text) -> bool:
+        return self.hedging is not None and method == "GET" and endpoint in self.hedging.endpoints
+
+    def _send(self, method: Text, endpoint: Text, url: Text, kwargs: Dict, on_retry=None, on_hedge=None) -> "Response":
+        if self._is_hedged(method, endpoint):
+            # every copy goes through resilience on its own
+            return self.hedging.execute(endpoint, lambda: self._send_once(method, endpoint, url, kwargs, on_retry),
+                                        on_hedge=on_hedge,
+                                        on_response=self._on_hedged_response if self.budget is not None else None)
+        return self._send_once(method, endpoint, url, kwargs, on_retry)
+
+    def _send_once(self, method: Text, endpoint: Text, url: Text, kwargs: Dict, on_retry=None) -> "Response":
+        if self.resilience is None:
+            return self.session.request(method=method, url=url, **kwargs)
+        return self.resilience.execute(method, endpoint, kwargs.get("headers"),
+                                       lambda: self.session.request(method=method, url=url, **kwargs),
+                                       on_retry=on_retry)
+
+    def _send_with_hooks(self, method: Text, endpoint: Text, url: Text, kwargs: Dict) -> "Response":
+        from api.instrumentation import body_size
+        hooks = self.hooks
+        # measured as prepared, the session or transport keeping no request on its response
+        request_bytes = body_size(kwargs.get("data"))
+        for hook in hooks:
+            hook.before_request(endpoint, method)
+        start = perf_counter()
+        try:
+            response = self._send(method, endpoint, url, kwargs, on_retry=self._on_retry, on_hedge=self._on_hedge)
+        except BaseException as e:
+            elapsed = perf_counter() - start
+            for hook in hooks:
+                hook.after_request(endpoint, method, elapsed, None, e, request_bytes)
+            raise
+        elapsed = perf_counter() - start
+        for hook in hooks:
+            hook.after_request(endpoint, method, elapsed, response, None, request_bytes)
+        return response
+
+    def _on_retry(self, endpoint: Text, attempt: int):
+        for hook in self.hooks:
+            hook.on_retry(endpoint, attempt)
+
+    def _on_hedge(self, endpoint: Text, won: bool):
+        for hook in self.hooks:
+            hook.on_hedge(endpoint, won)
+
+    def _on_hedged_response(self, endpoint: Text, response: "Response"):
+        # the service bills every copy it answers, whichever copy won
+        if response.status_code < 400:
+            self.budget.record(endpoint)
+
+    def _on_inputs(self, endpoint: Text, response: "Response", sources: List[Tuple[Text, Optional[Text]]]):
+        if response.status_code != 200:
+            return
+        for hook in self.hooks:
+            hook.on_inputs(endpoint, sources)
+
+    def _get_user_facet(self, endpoint: Text, facet: Text, user_id: Text, url: Text, access_token: Text,
+                        etag: Text = None) -> "Response":
+        """
+        Gets a user model facet, from the cache when the client has a fresh response for it.
+
+        Args:
+            endpoint: Name of the called API endpoint.
+            facet: User model facet, for example, emotion.
+            user_id: Given user ID.
+            url: Request URL.
+            access_token: Client's access token.
+            etag: Entity tag of a previous response, to make a conditional request bypassing the cache.
+
+        Returns:
+            Response to getting the user model facet.
+        """
+        headers = auth_headers(access_token)
+        if etag is not None:
+            headers["If-None-Match"] = etag
+            return self._request("GET", endpoint, url=url, headers=headers)
+        if self.cache is None:
+            return self._request("GET", endpoint, url=url, headers=headers)
+
+        response = self.cache.get(access_token, user_id, facet)
+        if response is not None:
+            return response
+
+        generation = self.cache.generation(user_id)
+        response = self._request("GET", endpoint, url=url, headers=headers)
+        if response.status_code == 200:
+            self.cache.put(access_token, user_id, facet, response, generation)
+        return response
+
+    def _invalidate_users(self, user_ids: Iterable[Text]):
+        """
+        Drops cached responses of given users, after their inputs were sent.
+
+        Args:
+            user_ids: IDs of users who sent inputs.
+        """
+        if self.cache is None:
+            return
+        for user_id in user_ids:
+            self.cache.invalidate_user(user_id)
+
+    def register(self, username: Text, email: Text, password: Text, agreed: bool) -> "Response":
+        """
+        Registers a new client to the aEi.ai service with given client username, email, and password.
+
+        Args:
+            username: Client's username.
+            email: Client's email.
+            password: Client's password.
+            agreed: True if client agreed to the statement of use and privacy policy.
+
+        Returns:
+            Response to registration request.
+        """
+        # prepare URL
+        url = self.base_url + "/register"
+
+        # prepare headers
+        headers = {
+            "username": username,
+            "email": email,
+            "password": password,
+            "agreed": agreed
+        }
+
+        # make an API call to the aEi.ai service to register
+        return self._request("POST", "register", url=url, headers=headers)
+
+    def login(self, username: Text, password: Text) -> "Response":
+        """
+        Logs in to the aEi.ai service with given client username and password.
+
+        Args:
+            username: Client's username.
+            password: Client's password.
+
+        Returns:
+            Response to the login request.
+        """
+        # prepare URL
+        url = self.base_url + "/oauth/token"
+
+        # prepare params
+        params = {
+            "grant_type": "client_credentials"
+        }
+
+        # prepare headers
+        credentials = username + ':' + password
+        credentials = credentials.encode("ascii")
+        headers = {
+            'Authorization': 'Basic ' + b64encode(credentials).decode("ascii"),
+            'Content-Type': 'application/x-www-form-urlencoded'
+        }
+
+        # make an API call to the aEi.ai service to get access token
+        return self._request("POST", "login", url=url, data=params, headers=headers)
+
+    def create_new_user(self, access_token: Text, attributes: Dict[Text, Text] = None) -> "Response":
+        """
+        Creates a new user with given username in aEi.ai service.
+
+        Args:
+            attributes: User custom attributes as string key-value pairs.
+            access_token: Client's access token.
+
+        Returns:
+            Response to the new user creation request.
+        """
+        # prepare URL
+        url = self.api_url + "/users"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # prepare body
+        body = codec.dumps_bytes(attributes) if attributes else None
+
+        # make an API call to the aEi.ai service to create a new user for user
+        return self._request("POST", "create_new_user", url=url, data=body, headers=headers)
+
+    def create_new_interaction(self, user_ids: List[Text], access_token: Text) -> "Response":
+        """
+        Creates a new aEi.ai interaction for given list of user IDs.
+
+        Args:
+            user_ids: List of user IDs in new interaction.
+            access_token: Client's access token.
+
+        Returns:
+            Response to the new interaction request.
+        """
+        # prepare URL
+        url = self.api_url + "/interactions"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # prepare parameters
+        params = [("user_id", user_id) for user_id in user_ids]
+
+        # make an API call to the aEi.ai service to create a new interaction for given user IDs
+        return self._request("POST", "create_new_interaction", url=url, data=params, headers=headers)
+
+    def get_interaction(self, interaction_id: Text, access_token: Text) -> "Response":
+        """
+        Gets an interaction with given interaction ID.
+
+        Args:
+            interaction_id: Target interaction ID.
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting the interaction.
+        """
+        # prepare URL
+        url = self.api_url + "/interactions/" + interaction_id
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get an interaction with given ID
+        return self._request("GET", "get_interaction", url=url, headers=headers)
+
+    def get_interaction_list(self, access_token: Text) -> "Response":
+        """
+        Gets list of all interactions of the client.
+
+        Args:
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting list of all the interactions of the client.
+        """
+        # prepare URL
+        url = self.api_url + "/interactions"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get an interaction with given ID
+        return self._request("GET", "get_interaction_list", url=url, headers=headers)
+
+    def add_users_to_interaction(self, interaction_id: Text, user_ids: List[Text], access_token: Text) -> "Response":
+        """
+        Adds given user to the given interaction in aEi.ai service.
+
+        Args:
+            interaction_id: Given interaction ID.
+            user_ids: List of user IDs to add to the interaction.
+            access_token: Client's access token.
+
+        Returns:
+            Response to adding users to interaction request.
+        """
+        # prepare URL
+        url = self.api_url + "/interactions/" + interaction_id + "/users"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # prepare parameters
+        params = [("user_id", user_id) for user_id in user_ids]
+
+        # make an API call to the aEi.ai service to add users to an interaction
+        return self._request("PUT", "add_users_to_interaction", url=url, data=params, headers=headers)
+
+    def send_text(self, user_id: Text, interaction_id: Text, text: Text, access_token: Text,
+                  idempotency_key: Text = None) -> "Response":
+        """
+        Sends given user's text to given interaction.
+
+        Args:
+            user_id: Source user ID.
+            interaction_id: Target interaction ID.
+            text: User's utterance.
+            access_token: Client's access token.
+            idempotency_key: Key identifying this input, so that the service drops duplicates of it and
+                the request can be safely retried, None for no key.
+
+        Returns:
+            Response to sending a new text input to an interaction.
+        """
+        # prepare URL
+        url = self.api_url + "/inputs/text"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+        if idempotency_key is not None:
+            from api.resilience import IDEMPOTENCY_KEY_HEADER
+            headers[IDEMPOTENCY_KEY_HEADER] = idempotency_key
+
+        # prepare parameters
+        url = url + params_2_string(params={
+            "user_id": user_id,
+            "interaction_id": interaction_id
+        })
+
+        # make an API call to the aEi.ai service to send the new user utterance to the interaction
+        response = self._request("POST", "send_text", url=url, data=text, headers=headers)
+
+        # the user model changes with the new input
+        self._invalidate_users([user_id])
+        self._on_inputs("send_text", response, [(user_id, interaction_id)])
+        return response
+
+    def send_image(self, user_id: Text, interaction_id: Text, image: ImageSource, access_token: Text,
+                   idempotency_key: Text = None) -> "Response":
+        """
+        Sends given user's image input to given interaction.
+
+        Images given by file path or file-like object are streamed with chunked transfer encoding, files being
+        memory-mapped rather than read into memory.
+
+        Args:
+            user_id: Source user ID.
+            interaction_id: Target interaction ID.
+            image: User's input image URL, file path, bytes, memoryview or binary file-like object.
+            access_token: Client's access token.
+            idempotency_key: Key identifying this input, so that the service drops duplicates of it and
+                the request can be safely retried, None for no key.
+
+        Returns:
+            Response to sending a new image input to an interaction.
+        """
+        # prepare URL
+        url = self.api_url + "/inputs/image"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+        if idempotency_key is not None:
+            from api.resilience import IDEMPOTENCY_KEY_HEADER
+            headers[IDEMPOTENCY_KEY_HEADER] = idempotency_key
+
+        # prepare parameters
+        url = url + params_2_string(params={
+            "user_id": user_id,
+            "interaction_id": interaction_id
+        })
+
+        # prepare body, images not given by URL are sent as is, streamed unless already in memory
+        data = image
+        if not is_image_url(image):
+            body = ImageBody(image)
+            headers["Content-Type"] = body.content_type
+            if not is_buffer(image):
+                data = body
+
+        # make an API call to the aEi.ai service to send the new user utterance to the interaction
+        response = self._request("POST", "send_image", url=url, data=data, headers=headers)
+
+        # the user model changes with the new input
+        self._invalidate_users([user_id])
+        self._on_inputs("send_image", response, [(user_id, interaction_id)])
+        return response
+
+    def send_inputs(self, inputs: Union[Text, List[Dict[Text, Any]]], access_token: Text,
+                    idempotency_key: Text = None) -> "Response":
+        """
+        Analyzes multiple inputs passed as JSON.
+
+        Args:
+            inputs: Inputs as JSON string, or input entries built by text_input or image_input, whose images
+                given by content are streamed as base64 data URLs.
+            access_token: Client's access token.
+            idempotency_key: Key identifying these inputs, so that the service drops duplicates of them and
+                the request can be safely retried, None for no key.
+
+        Returns:
+            Response to analyzing given inputs.
+        """
+        # prepare URL
+        url = self.api_url + "/inputs"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+        if idempotency_key is not None:
+            from api.resilience import IDEMPOTENCY_KEY_HEADER
+            headers[IDEMPOTENCY_KEY_HEADER] = idempotency_key
+
+        # prepare number of billed queries, one per input
+        queries = input_count(inputs) if self.budget is not None else 1
+
+        # prepare body
+        data = inputs
+        if isinstance(inputs, list):
+            data = inputs_body(inputs)
+            headers["Content-Type"] = "application/json"
+
+        # make an API call to the aEi.ai service to send the new user utterance to the interaction
+        response = self._request("POST", "send_inputs", url=url, queries=queries, data=data, headers=headers)
+
+        # the user models change with the new inputs, whose sources are read from the request
+        if self.cache is not None or self.hooks:
+            sources = input_sources(inputs)
+            self._invalidate_users({user_id for user_id, _ in sources})
+            self._on_inputs("send_inputs", response, sources)
+        return response
+
+    def get_user(self, user_id: Text, access_token: Text) -> "Response":
+        """
+        Gets aEi.ai user with given user ID.
+
+        Args:
+            user_id: Given user ID.
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting the aEi.ai user.
+        """
+        # prepare URL
+        url = self.api_url + "/users/" + user_id
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get user
+        return self._request("GET", "get_user", url=url, headers=headers)
+
+    def get_user_emotion(self, user_id: Text, access_token: Text, etag: Text = None) -> "Response":
+        """
+        Gets user's emotion with given user ID.
+
+        Args:
+            user_id: Given user ID.
+            access_token: Client's access token.
+            etag: ETag header of the last response received, so that the service answers 304 Not Modified
+                without a body if the emotion did not change, None for an unconditional request.
+
+        Returns:
+            Response to getting the user's emotion.
+        """
+        # prepare URL
+        url = self.api_url + "/users/" + user_id + "/emotion"
+
+        # make an API call to the aEi.ai service to get user's emotion, unless it is cached
+        return self._get_user_facet("get_user_emotion", "emotion", user_id=user_id, url=url, access_token=access_token,
+                                    etag=etag)
+
+    def get_user_mood(self, user_id: Text, access_token: Text, etag: Text = None) -> "Response":
+        """
+        Gets user's mood with given user ID.
+
+        Args:
+            user_id: Given user ID.
+            access_token: Client's access token.
+            etag: ETag header of the last response received, so that the service answers 304 Not Modified
+                without a body if the mood did not change, None for an unconditional request.
+
+        Returns:
+            Response to getting the user's mood.
+        """
+        # prepare URL
+        url = self.api_url + "/users/" + user_id + "/mood"
+
+        # make an API call to the aEi.ai service to get user's mood, unless it is cached
+        return self._get_user_facet("get_user_mood", "mood", user_id=user_id, url=url, access_token=access_token,
+                                    etag=etag)
+
+    def get_user_personality(self, user_id: Text, access_token: Text) -> "Response":
+        """
+        Gets user's personality with given user ID.
+
+        Args:
+            user_id: Given user ID.
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting the user's personality.
+        """
+        # prepare URL
+        url = self.api_url + "/users/" + user_id + "/personality"
+
+        # make an API call to the aEi.ai service to get user's personality, unless it is cached
+        return self._get_user_facet("get_user_personality", "personality", user_id=user_id, url=url,
+                                    access_token=access_token)
+
+    def get_user_satisfaction(self, user_id: Text, access_token: Text) -> "Response":
+        """
+        Gets user's satisfaction with given user ID.
+
+        Args:
+            user_id: Given user ID.
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting the user's satisfaction.
+        """
+        # prepare URL
+        url = self.api_url + "/users/" + user_id + "/satisfaction"
+
+        # make an API call to the aEi.ai service to get user's satisfaction, unless it is cached
+        return self._get_user_facet("get_user_satisfaction", "satisfaction", user_id=user_id, url=url,
+                                    access_token=access_token)
+
+    def get_user_social_perception(self, user_id: Text, access_token: Text) -> "Response":
+        """
+        Gets user's social perception with given user ID.
+
+        Args:
+            user_id: Given user ID.
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting the user's social perception.
+        """
+        # prepare URL
+        url = self.api_url + "/users/" + user_id + "/social-perception"
+
+        # make an API call to the aEi.ai service to get user's social perception, unless it is cached
+        return self._get_user_facet("get_user_social_perception", "social_perception", user_id=user_id, url=url,
+                                    access_token=access_token)
+
+    def get_user_empathy(self, user_id: Text, target_user_ids: List[Text], access_token: Text) -> "Response":
+        """
+        Gets user's empathy towards given user IDs.
+
+        Args:
+            user_id: Given user ID.
+            target_user_ids: Target user IDs.
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting the user's empathy.
+        """
+        # prepare URL
+        url = self.api_url + "/users/" + user_id + "/empathy"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # prepare parameters
+        url = url + params_2_string(name=TARGET_PARAMETER, values=target_user_ids)
+
+        # make an API call to the aEi.ai service to get user's empathy
+        return self._request("GET", "get_user_empathy", url=url, headers=headers)
+
+    def get_user_list(self, access_token: Text) -> "Response":
+        """
+        Gets list of all aEi.ai users of the client.
+
+        Args:
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting the aEi.ai users.
+        """
+        # prepare URL
+        url = self.api_url + "/users/"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get list of all client users
+        return self._request("GET", "get_user_list", url=url, headers=headers)
+
+    def get_used_free_queries(self, access_token: Text) -> "Response":
+        """
+        Gets number of  aEi.ai used free queries of the currently signed in client.
+
+        Args:
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting number of used free queries to the aEi.ai API.
+        """
+        # prepare URL
+        url = self.api_url + "/metrics/queries/used"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get the number of free queries to the the aEi.ai API
+        return self._request("GET", "get_used_free_queries", url=url, headers=headers)
+
+    def get_used_paid_queries(self, access_token: Text) -> "Response":
+        """
+        Gets number of aEi.ai used paid queries (in current month) of the currently signed in client.
+
+        Args:
+            access_token: Client's access token.
+        Returns:
+            Response to getting number of used paid queries to the aEi.ai API.
+        """
+        # prepare URL
+        url = self.api_url + "/metrics/queries"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get the number of paid queries to the the aEi.ai API
+        return self._request("GET", "get_used_paid_queries", url=url, headers=headers)
+
+    def get_payment_sources(self, access_token: Text) -> "Response":
+        """
+        Gets the payment method information from Stripe for a given customer.
+
+        Args:
+            access_token: Client's access token.
+        Retruns:
+            Response to getting payment methods.
+        """
+        # prepare URL
+        url = self.api_url + "/sources"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get payment methods information
+        return self._request("GET", "get_payment_sources", url=url, headers=headers)
+
+    def get_payment_source(self, source_id: Text, access_token: Text) -> "Response":
+        """
+        Gets the payment method information from Stripe for a given customer and source Id.
+
+        Args:
+            source_id: Target payment source ID.
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting a specific payment method information.
+        """
+        # prepare URL
+        url = self.api_url + "/sources/" + source_id
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get a payment method given its ID
+        return self._request("GET", "get_payment_source", url=url, headers=headers)
+
+    def add_payment_source(self, source_id: Text, access_token: Text) -> "Response":
+        """
+        Adds a payment source ID (previously generated via Stripe API) to the client account.
+
+        Args:
+            access_token: Client's access token.
+            source_id: Payment source ID.
+
+        Returns:
+            Response to adding a payment source ID to client account.
+        """
+        # prepare URL
+        url = self.api_url + "/sources/" + source_id
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to add a payment source to client's account
+        return self._request("POST", "add_payment_source", url=url, headers=headers)
+
+    def get_subscription(self, access_token: Text) -> "Response":
+        """
+        Get the subscription information for given customer.
+
+        Args:
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting subscription information.
+        """
+        # prepare URL
+        url = self.api_url + "/subscriptions"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get subscription information
+        return self._request("GET", "get_subscription", url=url, headers=headers)
+
+    def update_subscription(self, subscription_type: Text, access_token: Text) -> "Response":
+        """
+        Updates subscription to the given type.
+
+        Args:
+            access_token: Client's access token.
+            subscription_type: Given new subscription type.
+
+        Returns:
+            Response to updating subscription.
+        """
+        # prepare URL
+        url = self.api_url + "/subscriptions"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # prepare parameters
+        params = {"subscription_type": subscription_type}
+
+        # make an API call to the aEi.ai service to update the subscription type
+        return self._request("PUT", "update_subscription", url=url, data=params, headers=headers)
+
+    def delete_source(self, source_id: Text, access_token: Text) -> "Response":
+        """
+        Deletes a source from Stripe and aEi.ai account given the source ID.
+
+        Args:
+            source_id: Given source ID.
+            access_token: Client's access token.
+
+        Returns:
+            Response to deleting the payment source with given ID.
+        """
+        # prepare URL
+        url = self.api_url + "/sources/" + source_id
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to delete a payment method
+        return self._request("DELETE", "delete_source", url=url, headers=headers)
+
+    def update_source(self, source_id: Text, update_params: Dict[Text, Text], access_token: Text) -> "Response":
+        """
+        Updates a source in Stripe and aEi.ai account given the source ID and parameters to update.
+
+        Args:
+            source_id: Given source ID to update.
+            update_params: Key-value params to update as request body.
+            access_token: Client's access token.
+
+        Returns:
+            Response to updating the payment source.
+        """
+        # prepare URL
+        url = self.api_url + "/sources/" + source_id
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # prepare body
+        body = codec.dumps_bytes(update_params) if update_params else None
+
+        # make an API call to the aEi.ai service to update a payment source
+        return self._request("PUT", "update_source", url=url, data=body, headers=headers)
+
+    def change_password(self, password: Text, access_token: Text) -> "Response":
+        """
+        Changes aEi.ai account password to the given new password, when use has a valid access token.
+
+        Args:
+            password: Given new password.
+            access_token: Client's access token.
+
+        Returns:
+            Response to changing the password to the given new password.
+        """
+        # prepare URL
+        url = self.api_url + "/clients/password"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+        headers["password"] = password
+
+        # make an API call to the aEi.ai service to change password
+        return self._request("PUT", "change_password", url=url, headers=headers)
+
+    def reset_password(self, email: Text) -> "Response":
+        """
+        Resets aEi.ai account password by sending an email to the client.
+
+        Args:
+            email: Client's email.
+
+        Returns:
+            Response to sending a password reset email.
+        """
+        # prepare URL
+        url = self.base_url + "/reset-password"
+
+        # prepare params
+        params = {"email": email}
+
+        # make an API call to the aEi.ai service to send reset password email
+        return self._request("POST", "reset_password", url=url, data=params)
+
+    def update_password(self, username: Text, password_reset_token: Text, new_password: Text) -> "Response":
+        """
+        Updates aEi.ai account password for the given username and password-reset token.
+
+        Args:
+            username: Client's username.
+            password_reset_token: Password-reset token provided by server.
+            new_password: Client's new password.
+
+        Returns:
+            Response to updating client's password.
+        """
+        # prepare URL
+        url = self.base_url + "/update-password"
+
+        # prepare headers
+        headers = {
+            "username": username,
+            "token": password_reset_token,
+            "password": new_password
+        }
+
+        # make an API call to the aEi.ai service to change password
+        return self._request("PUT", "update_password", url=url, headers=headers)
+
+
+_default_client = None
+_default_client_lock = Lock()
+
+
+def default_client() -> AeiClient:
+    """
+    Gets the client used by the module-level API functions, creating it on first use.
+
+    Returns:
+        Default aEi.ai API client.
+    """
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = AeiClient()
+    return _default_client
+
+
+def set_default_client(client: AeiClient):
+    """
+    Sets the client used by the module-level API functions.
+
+    Args:
+        client: aEi.ai API client to use by default.
+    """
+    global _default_client
+    with _default_client_lock:
+        _default_client = client
+
+
+def register(username: Text, email: Text, password: Text, agreed: bool) -> "Response":
     """
     Registers a new client to the aEi.ai service with given client username, email, and password.
 
@@ -113,22 +1379,10 @@ def register(username: Text, email: Text, password: Text, agreed: bool) -> Respo
     Returns:
         Response to registration request.
     """
-    # prepare URL
-    url = AEI_AI_URL + "/register"
+    return default_client().register(username=username, email=email, password=password, agreed=agreed)
 
-    # prepare headers
-    headers = {
-        "username": username,
-        "email": email,
-        "password": password,
-        "agreed": agreed
-    }
 
-    # make an API call to the aEi.ai service to register
-    return post(url=url, headers=headers)
-
-
-def login(username: Text, password: Text) -> Response:
+def login(username: Text, password: Text) -> "Response":
     """
     Logs in to the aEi.ai service with given client username and password.
 
@@ -139,27 +1393,10 @@ def login(username: Text, password: Text) -> Response:
     Returns:
         Response to the login request.
     """
-    # prepare URL
-    url = AEI_AI_URL + "/oauth/token"
-
-    # prepare params
-    params = {
-        "grant_type": "client_credentials"
-    }
-
-    # prepare headers
-    credentials = username + ':' + password
-    credentials = credentials.encode("ascii")
-    headers = {
-        'Authorization': 'Basic ' + b64encode(credentials).decode("ascii"),
-        'Content-Type': 'application/x-www-form-urlencoded'
-    }
+    return default_client().login(username=username, password=password)
 
-    # make an API call to the aEi.ai service to get access token
-    return post(url=url, data=params, headers=headers)
 
-
-def create_new_user(access_token: Text, attributes: Dict[Text, Text] = None) -> Response:
+def create_new_user(access_token: Text, attributes: Dict[Text, Text] = None) -> "Response":
     """
     Creates a new user with given username in aEi.ai service.
 
@@ -170,20 +1407,10 @@ def create_new_user(access_token: Text, attributes: Dict[Text, Text] = None) ->
     Returns:
         Response to the new user creation request.
     """
-    # prepare URL
-    url = API_URL + "/users"
-
-    # prepare headers
-    headers = auth_headers(access_token)
-
-    # prepare body
-    body = json.dumps(attributes) if attributes else None
+    return default_client().create_new_user(access_token=access_token, attributes=attributes)
 
-    # make an API call to the aEi.ai service to create a new user for user
-    return post(url=url, data=body, headers=headers)
 
-
-def create_new_interaction(user_ids: List[Text], access_token: Text) -> Response:
+def create_new_interaction(user_ids: List[Text], access_token: Text) -> "Response":
     """
     Creates a new aEi.ai interaction for given list of user IDs.
 
@@ -194,20 +1421,10 @@ def create_new_interaction(user_ids: List[Text], access_token: Text) -> Response
     Returns:
         Response to the new interaction request.
     """
-    # prepare URL
-    url = API_URL + "/interactions"
-
-    # prepare headers
-    headers = auth_headers(access_token)
-
-    # prepare parameters
-    params = [("user_id", user_id) for user_id in user_ids]
-
-    # make an API call to the aEi.ai service to create a new interaction for given user IDs
-    return post(url=url, data=params, headers=headers)
+    return default_client().create_new_interaction(user_ids=user_ids, access_token=access_token)
 
 
-def get_interaction(interaction_id: Text, access_token: Text) -> Response:
+def get_interaction(interaction_id: Text, access_token: Text) -> "Response":
     """
     Gets an interaction with given interaction ID.
 
@@ -218,17 +1435,10 @@ def get_interaction(interaction_id: Text, access_token: Text) -> Response:
     Returns:
         Response to getting the interaction.
     """
-    # prepare URL
-    url = API_URL + "/interactions/" + interaction_id
+    return default_client().get_interaction(interaction_id=interaction_id, access_token=access_token)
 
-    # prepare headers
-    headers = auth_headers(access_token)
 
-    # make an API call to the aEi.ai service to get an interaction with given ID
-    return get(url=url, headers=headers)
-
-
-def get_interaction_list(access_token: Text) -> Response:
+def get_interaction_list(access_token: Text) -> "Response":
     """
     Gets list of all interactions of the client.
 
@@ -238,17 +1448,10 @@ def get_interaction_list(access_token: Text) -> Response:
     Returns:
         Response to getting list of all the interactions of the client.
     """
-    # prepare URL
-    url = API_URL + "/interactions"
-
-    # prepare headers
-    headers = auth_headers(access_token)
+    return default_client().get_interaction_list(access_token=access_token)
 
-    # make an API call to the aEi.ai service to get an interaction with given ID
-    return get(url=url, headers=headers)
 
-
-def add_users_to_interaction(interaction_id: Text, user_ids: List[Text], access_token: Text) -> Response:
+def add_users_to_interaction(interaction_id: Text, user_ids: List[Text], access_token: Text) -> "Response":
     """
     Adds given user to the given interaction in aEi.ai service.
 
@@ -260,20 +1463,12 @@ def add_users_to_interaction(interaction_id: Text, user_ids: List[Text], access_
     Returns:
         Response to adding users to interaction request.
     """
-    # prepare URL
-    url = API_URL + "/interactions/" + interaction_id + "/users"
-
-    # prepare headers
-    headers = auth_headers(access_token)
-
-    # prepare parameters
-    params = [("user_id", user_id) for user_id in user_ids]
-
-    # make an API call to the aEi.ai service to add users to an interaction
-    return put(url=url, data=params, headers=headers)
+    return default_client().add_users_to_interaction(interaction_id=interaction_id, user_ids=user_ids,
+                                                     access_token=access_token)
 
 
-def send_text(user_id: Text, interaction_id: Text, text: Text, access_token: Text) -> Response:
+def send_text(user_id: Text, interaction_id: Text, text: Text, access_token: Text,
+              idempotency_key: Text = None) -> "Response":
     """
     Sends given user's text to given interaction.
 
@@ -282,77 +1477,58 @@ def send_text(user_id: Text, interaction_id: Text, text: Text, access_token: Tex
         interaction_id: Target interaction ID.
         text: User's utterance.
         access_token: Client's access token.
+        idempotency_key: Key identifying this input, so that the service drops duplicates of it and
+            the request can be safely retried, None for no key.
 
     Returns:
         Response to sending a new text input to an interaction.
     """
-    # prepare URL
-    url = API_URL + "/inputs/text"
-
-    # prepare headers
-    headers = auth_headers(access_token)
-
-    # prepare parameters
-    url = url + params_2_string(params={
-        "user_id": user_id,
-        "interaction_id": interaction_id
-    })
-
-    # make an API call to the aEi.ai service to send the new user utterance to the interaction
-    return post(url=url, data=text, headers=headers)
+    return default_client().send_text(user_id=user_id, interaction_id=interaction_id, text=text,
+                                      access_token=access_token, idempotency_key=idempotency_key)
 
 
-def send_image(user_id: Text, interaction_id: Text, image: Text, access_token: Text) -> Response:
+def send_image(user_id: Text, interaction_id: Text, image: ImageSource, access_token: Text,
+               idempotency_key: Text = None) -> "Response":
     """
     Sends given user's image input to given interaction.
 
+    Images given by file path or file-like object are streamed with chunked transfer encoding, files being
+    memory-mapped rather than read into memory.
+
     Args:
         user_id: Source user ID.
         interaction_id: Target interaction ID.
-        image: User's input image URL.
+        image: User's input image URL, file path, bytes, memoryview or binary file-like object.
         access_token: Client's access token.
+        idempotency_key: Key identifying this input, so that the service drops duplicates of it and
+            the request can be safely retried, None for no key.
 
     Returns:
         Response to sending a new image input to an interaction.
     """
-    # prepare URL
-    url = API_URL + "/inputs/image"
-
-    # prepare headers
-    headers = auth_headers(access_token)
-
-    # prepare parameters
-    url = url + params_2_string(params={
-        "user_id": user_id,
-        "interaction_id": interaction_id
-    })
-
-    # make an API call to the aEi.ai service to send the new user utterance to the interaction
-    return post(url=url, data=image, headers=headers)
+    return default_client().send_image(user_id=user_id, interaction_id=interaction_id, image=image,
+                                       access_token=access_token, idempotency_key=idempotency_key)
 
 
-def send_inputs(inputs: Text, access_token: Text) -> Response:
+def send_inputs(inputs: Union[Text, List[Dict[Text, Any]]], access_token: Text,
+                idempotency_key: Text = None) -> "Response":
     """
     Analyzes multiple inputs passed as JSON.
 
     Args:
-        inputs: Inputs as JSON string.
+        inputs: Inputs as JSON string, or input entries built by text_input or image_input, whose images
+            given by content are streamed as base64 data URLs.
         access_token: Client's access token.
+        idempotency_key: Key identifying these inputs, so that the service drops duplicates of them and
+            the request can be safely retried, None for no key.
 
     Returns:
         Response to analyzing given inputs.
     """
-    # prepare URL
-    url = API_URL + "/inputs"
+    return default_client().send_inputs(inputs=inputs, access_token=access_token, idempotency_key=idempotency_key)
 
-    # prepare headers
-    headers = auth_headers(access_token)
 
-    # make an API call to the aEi.ai service to send the new user utterance to the interaction
-    return post(url=url, data=inputs, headers=headers)
-
-
-def get_user(user_id: Text, access_token: Text) -> Response:
+def get_user(user_id: Text, access_token: Text) -> "Response":
     """
     Gets aEi.ai user with given user ID.
 
@@ -363,59 +1539,42 @@ def get_user(user_id: Text, access_token: Text) -> Response:
     Returns:
         Response to getting the aEi.ai user.
     """
-    # prepare URL
-    url = API_URL + "/users/" + user_id
-
-    # prepare headers
-    headers = auth_headers(access_token)
+    return default_client().get_user(user_id=user_id, access_token=access_token)
 
-    # make an API call to the aEi.ai service to get user
-    return get(url=url, headers=headers)
 
-
-def get_user_emotion(user_id: Text, access_token: Text) -> Response:
+def get_user_emotion(user_id: Text, access_token: Text, etag: Text = None) -> "Response":
     """
     Gets user's emotion with given user ID.
 
     Args:
         user_id: Given user ID.
         access_token: Client's access token.
+        etag: ETag header of the last response received, so that the service answers 304 Not Modified
+            without a body if the emotion did not change, None for an unconditional request.
 
     Returns:
         Response to getting the user's emotion.
     """
-    # prepare URL
-    url = API_URL + "/users/" + user_id + "/emotion"
-
-    # prepare headers
-    headers = auth_headers(access_token)
+    return default_client().get_user_emotion(user_id=user_id, access_token=access_token, etag=etag)
 
-    # make an API call to the aEi.ai service to get user's emotion
-    return get(url=url, headers=headers)
 
-
-def get_user_mood(user_id: Text, access_token: Text) -> Response:
+def get_user_mood(user_id: Text, access_token: Text, etag: Text = None) -> "Response":
     """
     Gets user's mood with given user ID.
 
     Args:
         user_id: Given user ID.
         access_token: Client's access token.
+        etag: ETag header of the last response received, so that the service answers 304 Not Modified
+            without a body if the mood did not change, None for an unconditional request.
 
     Returns:
         Response to getting the user's mood.
     """
-    # prepare URL
-    url = API_URL + "/users/" + user_id + "/mood"
-
-    # prepare headers
-    headers = auth_headers(access_token)
+    return default_client().get_user_mood(user_id=user_id, access_token=access_token, etag=etag)
 
-    # make an API call to the aEi.ai service to get user's mood
-    return get(url=url, headers=headers)
 
-
-def get_user_personality(user_id: Text, access_token: Text) -> Response:
+def get_user_personality(user_id: Text, access_token: Text) -> "Response":
     """
     Gets user's personality with given user ID.
 
@@ -426,17 +1585,10 @@ def get_user_personality(user_id: Text, access_token: Text) -> Response:
     Returns:
         Response to getting the user's personality.
     """
-    # prepare URL
-    url = API_URL + "/users/" + user_id + "/personality"
-
-    # prepare headers
-    headers = auth_headers(access_token)
-
-    # make an API call to the aEi.ai service to get user's personality
-    return get(url=url, headers=headers)
+    return default_client().get_user_personality(user_id=user_id, access_token=access_token)
 
 
-def get_user_satisfaction(user_id: Text, access_token: Text) -> Response:
+def get_user_satisfaction(user_id: Text, access_token: Text) -> "Response":
     """
     Gets user's satisfaction with given user ID.
 
@@ -447,17 +1599,10 @@ def get_user_satisfaction(user_id: Text, access_token: Text) -> Response:
     Returns:
         Response to getting the user's satisfaction.
     """
-    # prepare URL
-    url = API_URL + "/users/" + user_id + "/satisfaction"
+    return default_client().get_user_satisfaction(user_id=user_id, access_token=access_token)
 
-    # prepare headers
-    headers = auth_headers(access_token)
 
-    # make an API call to the aEi.ai service to get user's satisfaction
-    return get(url=url, headers=headers)
-
-
-def get_user_social_perception(user_id: Text, access_token: Text) -> Response:
+def get_user_social_perception(user_id: Text, access_token: Text) -> "Response":
     """
     Gets user's social perception with given user ID.
 
@@ -468,17 +1613,10 @@ def get_user_social_perception(user_id: Text, access_token: Text) -> Response:
     Returns:
         Response to getting the user's social perception.
     """
-    # prepare URL
-    url = API_URL + "/users/" + user_id + "/social-perception"
-
-    # prepare headers
-    headers = auth_headers(access_token)
-
-    # make an API call to the aEi.ai service to get user's social perception
-    return get(url=url, headers=headers)
+    return default_client().get_user_social_perception(user_id=user_id, access_token=access_token)
 
 
-def get_user_empathy(user_id: Text, target_user_ids: List[Text], access_token: Text) -> Response:
+def get_user_empathy(user_id: Text, target_user_ids: List[Text], access_token: Text) -> "Response":
     """
     Gets user's empathy towards given user IDs.
 
@@ -490,20 +1628,11 @@ def get_user_empathy(user_id: Text, target_user_ids: List[Text], access_token: T
     Returns:
         Response to getting the user's empathy.
     """
-    # prepare URL
-    url = API_URL + "/users/" + user_id + "/empathy"
-
-    # prepare headers
-    headers = auth_headers(access_token)
-
-    # prepare parameters
-    url = url + params_2_string(name="target_user_id", values=target_user_ids)
-
-    # make an API call to the aEi.ai service to get user's empathy
-    return get(url=url, headers=headers)
+    return default_client().get_user_empathy(user_id=user_id, target_user_ids=target_user_ids,
+                                             access_token=access_token)
 
 
-def get_user_list(access_token: Text) -> Response:
+def get_user_list(access_token: Text) -> "Response":
     """
     Gets list of all aEi.ai users of the client.
 
@@ -513,17 +1642,10 @@ def get_user_list(access_token: Text) -> Response:
     Returns:
         Response to getting the aEi.ai users.
     """
-    # prepare URL
-    url = API_URL + "/users/"
+    return default_client().get_user_list(access_token=access_token)
 
-    # prepare headers
-    headers = auth_headers(access_token)
 
-    # make an API call to the aEi.ai service to get list of all client users
-    return get(url=url, headers=headers)
-
-
-def get_used_free_queries(access_token: Text) -> Response:
+def get_used_free_queries(access_token: Text) -> "Response":
     """
     Gets number of  aEi.ai used free queries of the currently signed in client.
 
@@ -533,17 +1655,10 @@ def get_used_free_queries(access_token: Text) -> Response:
     Returns:
         Response to getting number of used free queries to the aEi.ai API.
     """
-    # prepare URL
-    url = API_URL + "/metrics/queries/used"
-
-    # prepare headers
-    headers = auth_headers(access_token)
-
-    # make an API call to the aEi.ai service to get the number of free queries to the the aEi.ai API
-    return get(url=url, headers=headers)
+    return default_client().get_used_free_queries(access_token=access_token)
 
 
-def get_used_paid_queries(access_token: Text) -> Response:
+def get_used_paid_queries(access_token: Text) -> "Response":
     """
     Gets number of aEi.ai used paid queries (in current month) of the currently signed in client.
 
@@ -552,17 +1667,10 @@ def get_used_paid_queries(access_token: Text) -> Response:
     Returns:
         Response to getting number of used paid queries to the aEi.ai API.
     """
-    # prepare URL
-    url = API_URL + "/metrics/queries"
+    return default_client().get_used_paid_queries(access_token=access_token)
 
-    # prepare headers
-    headers = auth_headers(access_token)
 
-    # make an API call to the aEi.ai service to get the number of paid queries to the the aEi.ai API
-    return get(url=url, headers=headers)
-
-
-def get_payment_sources(access_token: Text) -> Response:
+def get_payment_sources(access_token: Text) -> "Response":
     """
     Gets the payment method information from Stripe for a given customer.
 
@@ -571,17 +1679,10 @@ def get_payment_sources(access_token: Text) -> Response:
     Retruns:
         Response to getting payment methods.
     """
-    # prepare URL
-    url = API_URL + "/sources"
-
-    # prepare headers
-    headers = auth_headers(access_token)
+    return default_client().get_payment_sources(access_token=access_token)
 
-    # make an API call to the aEi.ai service to get payment methods information
-    return get(url=url, headers=headers)
 
-
-def get_payment_source(source_id: Text, access_token: Text) -> Response:
+def get_payment_source(source_id: Text, access_token: Text) -> "Response":
     """
     Gets the payment method information from Stripe for a given customer and source Id.
 
@@ -592,17 +1693,10 @@ def get_payment_source(source_id: Text, access_token: Text) -> Response:
     Returns:
         Response to getting a specific payment method information.
     """
-    # prepare URL
-    url = API_URL + "/sources/" + source_id
-
-    # prepare headers
-    headers = auth_headers(access_token)
+    return default_client().get_payment_source(source_id=source_id, access_token=access_token)
 
-    # make an API call to the aEi.ai service to get a payment method given its ID
-    return get(url=url, headers=headers)
 
-
-def add_payment_source(source_id: Text, access_token: Text) -> Response:
+def add_payment_source(source_id: Text, access_token: Text) -> "Response":
     """
     Adds a payment source ID (previously generated via Stripe API) to the client account.
 
@@ -613,17 +1707,10 @@ def add_payment_source(source_id: Text, access_token: Text) -> Response:
     Returns:
         Response to adding a payment source ID to client account.
     """
-    # prepare URL
-    url = API_URL + "/sources/" + source_id
-
-    # prepare headers
-    headers = auth_headers(access_token)
+    return default_client().add_payment_source(source_id=source_id, access_token=access_token)
 
-    # make an API call to the aEi.ai service to add a payment source to client's account
-    return post(url=url, headers=headers)
 
-
-def get_subscription(access_token: Text) -> Response:
+def get_subscription(access_token: Text) -> "Response":
     """
     Get the subscription information for given customer.
 
@@ -633,17 +1720,10 @@ def get_subscription(access_token: Text) -> Response:
     Returns:
         Response to getting subscription information.
     """
-    # prepare URL
-    url = API_URL + "/subscriptions"
-
-    # prepare headers
-    headers = auth_headers(access_token)
-
-    # make an API call to the aEi.ai service to get subscription information
-    return get(url=url, headers=headers)
+    return default_client().get_subscription(access_token=access_token)
 
 
-def update_subscription(subscription_type: Text, access_token: Text) -> Response:
+def update_subscription(subscription_type: Text, access_token: Text) -> "Response":
     """
     Updates subscription to the given type.
 
@@ -654,20 +1734,10 @@ def update_subscription(subscription_type: Text, access_token: Text) -> Response
     Returns:
         Response to updating subscription.
     """
-    # prepare URL
-    url = API_URL + "/subscriptions"
+    return default_client().update_subscription(subscription_type=subscription_type, access_token=access_token)
 
-    # prepare headers
-    headers = auth_headers(access_token)
 
-    # prepare parameters
-    params = {"subscription_type": subscription_type}
-
-    # make an API call to the aEi.ai service to update the subscription type
-    return put(url=url, data=params, headers=headers)
-
-
-def delete_source(source_id: Text, access_token: Text) -> Response:
+def delete_source(source_id: Text, access_token: Text) -> "Response":
     """
     Deletes a source from Stripe and aEi.ai account given the source ID.
 
@@ -678,17 +1748,10 @@ def delete_source(source_id: Text, access_token: Text) -> Response:
     Returns:
         Response to deleting the payment source with given ID.
     """
-    # prepare URL
-    url = API_URL + "/sources/" + source_id
-
-    # prepare headers
-    headers = auth_headers(access_token)
+    return default_client().delete_source(source_id=source_id, access_token=access_token)
 
-    # make an API call to the aEi.ai service to delete a payment method
-    return delete(url=url, headers=headers)
 
-
-def update_source(source_id: Text, update_params: Dict[Text, Text], access_token: Text) -> Response:
+def update_source(source_id: Text, update_params: Dict[Text, Text], access_token: Text) -> "Response":
     """
     Updates a source in Stripe and aEi.ai account given the source ID and parameters to update.
 
@@ -700,20 +1763,10 @@ def update_source(source_id: Text, update_params: Dict[Text, Text], access_token
     Returns:
         Response to updating the payment source.
     """
-    # prepare URL
-    url = API_URL + "/sources/" + source_id
-
-    # prepare headers
-    headers = auth_headers(access_token)
-
-    # prepare body
-    body = json.dumps(update_params) if update_params else None
+    return default_client().update_source(source_id=source_id, update_params=update_params, access_token=access_token)
 
-    # make an API call to the aEi.ai service to update a payment source
-    return put(url=url, data=body, headers=headers)
 
-
-def change_password(password: Text, access_token: Text) -> Response:
+def change_password(password: Text, access_token: Text) -> "Response":
     """
     Changes aEi.ai account password to the given new password, when use has a valid access token.
 
@@ -724,18 +1777,10 @@ def change_password(password: Text, access_token: Text) -> Response:
     Returns:
         Response to changing the password to the given new password.
     """
-    # prepare URL
-    url = API_URL + "/clients/password"
-
-    # prepare headers
-    headers = auth_headers(access_token)
-    headers["password"] = password
+    return default_client().change_password(password=password, access_token=access_token)
 
-    # make an API call to the aEi.ai service to change password
-    return put(url=url, headers=headers)
 
-
-def reset_password(email: Text) -> Response:
+def reset_password(email: Text) -> "Response":
     """
     Resets aEi.ai account password by sending an email to the client.
 
@@ -745,17 +1790,10 @@ def reset_password(email: Text) -> Response:
     Returns:
         Response to sending a password reset email.
     """
-    # prepare URL
-    url = AEI_AI_URL + "/reset-password"
-
-    # prepare params
-    params = {"email": email}
+    return default_client().reset_password(email=email)
 
-    # make an API call to the aEi.ai service to send reset password email
-    return post(url=url, data=params)
 
-
-def update_password(username: Text, password_reset_token: Text, new_password: Text) -> Response:
+def update_password(username: Text, password_reset_token: Text, new_password: Text) -> "Response":
     """
     Updates aEi.ai account password for the given username and password-reset token.
 
@@ -767,15 +1805,5 @@ def update_password(username: Text, password_reset_token: Text, new_password: Te
     Returns:
         Response to updating client's password.
     """
-    # prepare URL
-    url = AEI_AI_URL + "/update-password"
-
-    # prepare headers
-    headers = {
-        "username": username,
-        "token": password_reset_token,
-        "password": new_password
-    }
-
-    # make an API call to the aEi.ai service to change password
-    return put(url=url, headers=headers)
+    return default_client().update_password(username=username, password_reset_token=password_reset_token,
+                                            new_password=new_password)
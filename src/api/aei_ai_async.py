@@ -0,0 +1,832 @@
+"""
+aEi.ai asynchronous Python API, which needs aiohttp.
+
+Requests may go through the same resilience layer as the synchronous client, rate limiting, retrying and circuit
+breaking without blocking the event loop. The other layers of the synchronous client, which are response caching,
+query budgets, request hooks and metrics, hedging and request compression, are not supported.
+"""
+
+import json
+from asyncio import Semaphore, TimeoutError as AsyncTimeoutError, get_running_loop
+from aiohttp import ClientConnectionError, ClientError, ClientSession, ClientTimeout, TCPConnector
+from base64 import b64encode
+from typing import Any, AsyncIterator, Text, Dict, Iterable, List, Mapping, Union
+
+from api import codec
+from api.aei_ai import AEI_AI_URL, API_VERSION, auth_headers, params_2_string
+from api.resilience import IDEMPOTENCY_KEY_HEADER, Resilience
+from api.uploads import ImageBody, ImageSource, InputsBody, inputs_body, is_buffer, is_image_url
+
+DEFAULT_CONNECTION_LIMIT = 1000
+DEFAULT_CONNECTION_LIMIT_PER_HOST = 0
+DEFAULT_CONCURRENCY = 1000
+DEFAULT_TIMEOUT = 30
+
+# errors raised when the request may not have reached the service
+TRANSIENT_ERRORS = (ClientConnectionError, AsyncTimeoutError)
+
+
+class AsyncResponse:
+    """Fully read HTTP response of an asynchronous API call."""
+    def __init__(self, status_code: int, headers: Mapping[Text, Text], content: bytes):
+        """
+        Constructs an asynchronous API call response.
+
+        Args:
+            status_code: HTTP response status code.
+            headers: HTTP response headers.
+            content: HTTP response body.
+        """
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self) -> Text:
+        """Response body decoded as UTF-8 text."""
+        return self.content.decode("utf-8")
+
+    def json(self, **kwargs) -> Any:
+        """
+        Decodes the response body as JSON, with the API's JSON codec unless decoder arguments are given.
+
+        Args:
+            **kwargs: Arguments passed to the standard library JSON decoder.
+
+        Returns:
+            Decoded response body.
+        """
+        if kwargs:
+            return json.loads(self.content, **kwargs)
+        return codec.loads(self.content)
+
+
+class AsyncAeiClient:
+    """Asynchronous aEi.ai API client with a shared connection pool and bounded concurrency."""
+    def __init__(self, base_url: Text = AEI_AI_URL, limit: int = DEFAULT_CONNECTION_LIMIT,
+                 limit_per_host: int = DEFAULT_CONNECTION_LIMIT_PER_HOST, concurrency: int = DEFAULT_CONCURRENCY,
+                 timeout: float = DEFAULT_TIMEOUT, resilience: Resilience = None):
+        """
+        Constructs an asynchronous aEi.ai API client.
+
+        Args:
+            base_url: Base URL of the aEi.ai service.
+            limit: Maximum number of pooled connections, 0 for no limit.
+            limit_per_host: Maximum number of pooled connections per host, 0 for no limit.
+            concurrency: Maximum number of requests in flight at once.
+            timeout: Total timeout of each request in seconds.
+            resilience: Rate limiting, retry and circuit breaking layer all requests go through, None to send
+                requests once as they come.
+        """
+        self.base_url = base_url
+        self.api_url = base_url + "/api/" + API_VERSION
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = ClientTimeout(total=timeout)
+        self.semaphore = Semaphore(concurrency)
+        self.resilience = resilience
+        self.session = None
+
+    async def __aenter__(self) -> "AsyncAeiClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Closes all pooled connections of the client."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _get_session(self) -> ClientSession:
+        # the session must be created inside the running event loop, hence lazily
+        if self.session is None or self.session.closed:
+            connector = TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+            self.session = ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    async def _request(self, method: Text, endpoint: Text, url: Text, **kwargs) -> AsyncResponse:
+        """
+        Makes an HTTP request through the shared connection pool and the resilience layer, if any.
+
+        Args:
+            method: HTTP method.
+            endpoint: Name of the called API endpoint.
+            url: Request URL.
+            **kwargs: Arguments passed to the session request, such as data and headers.
+
+        Returns:
+            Response to the request.
+        """
+        if self.resilience is None:
+            return await self._send(method, url, **kwargs)
+        return await self.resilience.execute_async(method, endpoint, kwargs.get("headers"),
+                                                   lambda: self._send(method, url, **kwargs),
+                                                   transient_errors=TRANSIENT_ERRORS, request_errors=(ClientError,))
+
+    async def _send(self, method: Text, url: Text, data: Any = None, **kwargs) -> AsyncResponse:
+        """Sends an HTTP request once, waiting for a free concurrency slot first."""
+        # streamed bodies are read from a thread, so that file reads do not block the event loop
+        if isinstance(data, (ImageBody, InputsBody)):
+            data = _read_chunks(data)
+        async with self.semaphore:
+            async with self._get_session().request(method=method, url=url, data=data, **kwargs) as response:
+                content = await response.read()
+                return AsyncResponse(status_code=response.status, headers=response.headers, content=content)
+
+    async def register(self, username: Text, email: Text, password: Text, agreed: bool) -> AsyncResponse:
+        """
+        Registers a new client to the aEi.ai service with given client username, email, and password.
+
+        Args:
+            username: Client's username.
+            email: Client's email.
+            password: Client's password.
+            agreed: True if client agreed to the statement of use and privacy policy.
+
+        Returns:
+            Response to registration request.
+        """
+        # prepare URL
+        url = self.base_url + "/register"
+
+        # prepare headers
+        headers = {
+            "username": username,
+            "email": email,
+            "password": password,
+            "agreed": agreed
+        }
+
+        # make an API call to the aEi.ai service to register
+        return await self._request("POST", "register", url=url, headers=headers)
+
+    async def login(self, username: Text, password: Text) -> AsyncResponse:
+        """
+        Logs in to the aEi.ai service with given client username and password.
+
+        Args:
+            username: Client's username.
+            password: Client's password.
+
+        Returns:
+            Response to the login request.
+        """
+        # prepare URL
+        url = self.base_url + "/oauth/token"
+
+        # prepare params
+        params = {
+            "grant_type": "client_credentials"
+        }
+
+        # prepare headers
+        credentials = username + ':' + password
+        credentials = credentials.encode("ascii")
+        headers = {
+            'Authorization': 'Basic ' + b64encode(credentials).decode("ascii"),
+            'Content-Type': 'application/x-www-form-urlencoded'
+        }
+
+        # make an API call to the aEi.ai service to get access token
+        return await self._request("POST", "login", url=url, data=params, headers=headers)
+
+    async def create_new_user(self, access_token: Text, attributes: Dict[Text, Text] = None) -> AsyncResponse:
+        """
+        Creates a new user with given username in aEi.ai service.
+
+        Args:
+            attributes: User custom attributes as string key-value pairs.
+            access_token: Client's access token.
+
+        Returns:
+            Response to the new user creation request.
+        """
+        # prepare URL
+        url = self.api_url + "/users"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # prepare body
+        body = codec.dumps_bytes(attributes) if attributes else None
+
+        # make an API call to the aEi.ai service to create a new user for user
+        return await self._request("POST", "create_new_user", url=url, data=body, headers=headers)
+
+    async def create_new_interaction(self, user_ids: List[Text], access_token: Text) -> AsyncResponse:
+        """
+        Creates a new aEi.ai interaction for given list of user IDs.
+
+        Args:
+            user_ids: List of user IDs in new interaction.
+            access_token: Client's access token.
+
+        Returns:
+            Response to the new interaction request.
+        """
+        # prepare URL
+        url = self.api_url + "/interactions"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # prepare parameters
+        params = [("user_id", user_id) for user_id in user_ids]
+
+        # make an API call to the aEi.ai service to create a new interaction for given user IDs
+        return await self._request("POST", "create_new_interaction", url=url, data=params, headers=headers)
+
+    async def get_interaction(self, interaction_id: Text, access_token: Text) -> AsyncResponse:
+        """
+        Gets an interaction with given interaction ID.
+
+        Args:
+            interaction_id: Target interaction ID.
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting the interaction.
+        """
+        # prepare URL
+        url = self.api_url + "/interactions/" + interaction_id
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get an interaction with given ID
+        return await self._request("GET", "get_interaction", url=url, headers=headers)
+
+    async def get_interaction_list(self, access_token: Text) -> AsyncResponse:
+        """
+        Gets list of all interactions of the client.
+
+        Args:
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting list of all the interactions of the client.
+        """
+        # prepare URL
+        url = self.api_url + "/interactions"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get an interaction with given ID
+        return await self._request("GET", "get_interaction_list", url=url, headers=headers)
+
+    async def add_users_to_interaction(self, interaction_id: Text, user_ids: List[Text],
+                                       access_token: Text) -> AsyncResponse:
+        """
+        Adds given user to the given interaction in aEi.ai service.
+
+        Args:
+            interaction_id: Given interaction ID.
+            user_ids: List of user IDs to add to the interaction.
+            access_token: Client's access token.
+
+        Returns:
+            Response to adding users to interaction request.
+        """
+        # prepare URL
+        url = self.api_url + "/interactions/" + interaction_id + "/users"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # prepare parameters
+        params = [("user_id", user_id) for user_id in user_ids]
+
+        # make an API call to the aEi.ai service to add users to an interaction
+        return await self._request("PUT", "add_users_to_interaction", url=url, data=params, headers=headers)
+
+    async def send_text(self, user_id: Text, interaction_id: Text, text: Text, access_token: Text,
+                        idempotency_key: Text = None) -> AsyncResponse:
+        """
+        Sends given user's text to given interaction.
+
+        Args:
+            user_id: Source user ID.
+            interaction_id: Target interaction ID.
+            text: User's utterance.
+            access_token: Client's access token.
+            idempotency_key: Key identifying this input, so that the service drops duplicates of it and
+                the request can be safely retried, None for no key.
+
+        Returns:
+            Response to sending a new text input to an interaction.
+        """
+        # prepare URL
+        url = self.api_url + "/inputs/text"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+        if idempotency_key is not None:
+            headers[IDEMPOTENCY_KEY_HEADER] = idempotency_key
+
+        # prepare parameters
+        url = url + params_2_string(params={
+            "user_id": user_id,
+            "interaction_id": interaction_id
+        })
+
+        # make an API call to the aEi.ai service to send the new user utterance to the interaction
+        return await self._request("POST", "send_text", url=url, data=text, headers=headers)
+
+    async def send_image(self, user_id: Text, interaction_id: Text, image: ImageSource, access_token: Text,
+                         idempotency_key: Text = None) -> AsyncResponse:
+        """
+        Sends given user's image input to given interaction.
+
+        Images given by file path or file-like object are streamed with chunked transfer encoding, their chunks
+        being read from a thread.
+
+        Args:
+            user_id: Source user ID.
+            interaction_id: Target interaction ID.
+            image: User's input image URL, file path, bytes, memoryview or binary file-like object.
+            access_token: Client's access token.
+            idempotency_key: Key identifying this input, so that the service drops duplicates of it and
+                the request can be safely retried, None for no key.
+
+        Returns:
+            Response to sending a new image input to an interaction.
+        """
+        # prepare URL
+        url = self.api_url + "/inputs/image"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+        if idempotency_key is not None:
+            headers[IDEMPOTENCY_KEY_HEADER] = idempotency_key
+
+        # prepare parameters
+        url = url + params_2_string(params={
+            "user_id": user_id,
+            "interaction_id": interaction_id
+        })
+
+        # prepare body, images not given by URL are sent as is, streamed unless already in memory
+        data = image
+        if not is_image_url(image):
+            body = ImageBody(image)
+            headers["Content-Type"] = body.content_type
+            data = bytes(image) if is_buffer(image) else body
+
+        # make an API call to the aEi.ai service to send the new user utterance to the interaction
+        return await self._request("POST", "send_image", url=url, data=data, headers=headers)
+
+    async def send_inputs(self, inputs: Union[Text, List[Dict[Text, Any]]], access_token: Text,
+                          idempotency_key: Text = None) -> AsyncResponse:
+        """
+        Analyzes multiple inputs passed as JSON.
+
+        Args:
+            inputs: Inputs as JSON string, or input entries built by text_input or image_input, whose images
+                given by content are streamed as base64 data URLs.
+            access_token: Client's access token.
+            idempotency_key: Key identifying these inputs, so that the service drops duplicates of them and
+                the request can be safely retried, None for no key.
+
+        Returns:
+            Response to analyzing given inputs.
+        """
+        # prepare URL
+        url = self.api_url + "/inputs"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+        if idempotency_key is not None:
+            headers[IDEMPOTENCY_KEY_HEADER] = idempotency_key
+
+        # prepare body
+        data = inputs
+        if isinstance(inputs, list):
+            data = inputs_body(inputs)
+            headers["Content-Type"] = "application/json"
+
+        # make an API call to the aEi.ai service to send the new user utterance to the interaction
+        return await self._request("POST", "send_inputs", url=url, data=data, headers=headers)
+
+    async def get_user(self, user_id: Text, access_token: Text) -> AsyncResponse:
+        """
+        Gets aEi.ai user with given user ID.
+
+        Args:
+            user_id: Given user ID.
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting the aEi.ai user.
+        """
+        # prepare URL
+        url = self.api_url + "/users/" + user_id
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get user
+        return await self._request("GET", "get_user", url=url, headers=headers)
+
+    async def get_user_emotion(self, user_id: Text, access_token: Text) -> AsyncResponse:
+        """
+        Gets user's emotion with given user ID.
+
+        Args:
+            user_id: Given user ID.
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting the user's emotion.
+        """
+        # prepare URL
+        url = self.api_url + "/users/" + user_id + "/emotion"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get user's emotion
+        return await self._request("GET", "get_user_emotion", url=url, headers=headers)
+
+    async def get_user_mood(self, user_id: Text, access_token: Text) -> AsyncResponse:
+        """
+        Gets user's mood with given user ID.
+
+        Args:
+            user_id: Given user ID.
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting the user's mood.
+        """
+        # prepare URL
+        url = self.api_url + "/users/" + user_id + "/mood"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get user's mood
+        return await self._request("GET", "get_user_mood", url=url, headers=headers)
+
+    async def get_user_personality(self, user_id: Text, access_token: Text) -> AsyncResponse:
+        """
+        Gets user's personality with given user ID.
+
+        Args:
+            user_id: Given user ID.
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting the user's personality.
+        """
+        # prepare URL
+        url = self.api_url + "/users/" + user_id + "/personality"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get user's personality
+        return await self._request("GET", "get_user_personality", url=url, headers=headers)
+
+    async def get_user_satisfaction(self, user_id: Text, access_token: Text) -> AsyncResponse:
+        """
+        Gets user's satisfaction with given user ID.
+
+        Args:
+            user_id: Given user ID.
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting the user's satisfaction.
+        """
+        # prepare URL
+        url = self.api_url + "/users/" + user_id + "/satisfaction"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get user's satisfaction
+        return await self._request("GET", "get_user_satisfaction", url=url, headers=headers)
+
+    async def get_user_social_perception(self, user_id: Text, access_token: Text) -> AsyncResponse:
+        """
+        Gets user's social perception with given user ID.
+
+        Args:
+            user_id: Given user ID.
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting the user's social perception.
+        """
+        # prepare URL
+        url = self.api_url + "/users/" + user_id + "/social-perception"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get user's social perception
+        return await self._request("GET", "get_user_social_perception", url=url, headers=headers)
+
+    async def get_user_empathy(self, user_id: Text, target_user_ids: List[Text], access_token: Text) -> AsyncResponse:
+        """
+        Gets user's empathy towards given user IDs.
+
+        Args:
+            user_id: Given user ID.
+            target_user_ids: Target user IDs.
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting the user's empathy.
+        """
+        # prepare URL
+        url = self.api_url + "/users/" + user_id + "/empathy"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # prepare parameters
+        url = url + params_2_string(name="target_user_id", values=target_user_ids)
+
+        # make an API call to the aEi.ai service to get user's empathy
+        return await self._request("GET", "get_user_empathy", url=url, headers=headers)
+
+    async def get_user_list(self, access_token: Text) -> AsyncResponse:
+        """
+        Gets list of all aEi.ai users of the client.
+
+        Args:
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting the aEi.ai users.
+        """
+        # prepare URL
+        url = self.api_url + "/users/"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get list of all client users
+        return await self._request("GET", "get_user_list", url=url, headers=headers)
+
+    async def get_used_free_queries(self, access_token: Text) -> AsyncResponse:
+        """
+        Gets number of  aEi.ai used free queries of the currently signed in client.
+
+        Args:
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting number of used free queries to the aEi.ai API.
+        """
+        # prepare URL
+        url = self.api_url + "/metrics/queries/used"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get the number of free queries to the the aEi.ai API
+        return await self._request("GET", "get_used_free_queries", url=url, headers=headers)
+
+    async def get_used_paid_queries(self, access_token: Text) -> AsyncResponse:
+        """
+        Gets number of aEi.ai used paid queries (in current month) of the currently signed in client.
+
+        Args:
+            access_token: Client's access token.
+        Returns:
+            Response to getting number of used paid queries to the aEi.ai API.
+        """
+        # prepare URL
+        url = self.api_url + "/metrics/queries"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get the number of paid queries to the the aEi.ai API
+        return await self._request("GET", "get_used_paid_queries", url=url, headers=headers)
+
+    async def get_payment_sources(self, access_token: Text) -> AsyncResponse:
+        """
+        Gets the payment method information from Stripe for a given customer.
+
+        Args:
+            access_token: Client's access token.
+        Retruns:
+            Response to getting payment methods.
+        """
+        # prepare URL
+        url = self.api_url + "/sources"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get payment methods information
+        return await self._request("GET", "get_payment_sources", url=url, headers=headers)
+
+    async def get_payment_source(self, source_id: Text, access_token: Text) -> AsyncResponse:
+        """
+        Gets the payment method information from Stripe for a given customer and source Id.
+
+        Args:
+            source_id: Target payment source ID.
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting a specific payment method information.
+        """
+        # prepare URL
+        url = self.api_url + "/sources/" + source_id
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get a payment method given its ID
+        return await self._request("GET", "get_payment_source", url=url, headers=headers)
+
+    async def add_payment_source(self, source_id: Text, access_token: Text) -> AsyncResponse:
+        """
+        Adds a payment source ID (previously generated via Stripe API) to the client account.
+
+        Args:
+            access_token: Client's access token.
+            source_id: Payment source ID.
+
+        Returns:
+            Response to adding a payment source ID to client account.
+        """
+        # prepare URL
+        url = self.api_url + "/sources/" + source_id
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to add a payment source to client's account
+        return await self._request("POST", "add_payment_source", url=url, headers=headers)
+
+    async def get_subscription(self, access_token: Text) -> AsyncResponse:
+        """
+        Get the subscription information for given customer.
+
+        Args:
+            access_token: Client's access token.
+
+        Returns:
+            Response to getting subscription information.
+        """
+        # prepare URL
+        url = self.api_url + "/subscriptions"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to get subscription information
+        return await self._request("GET", "get_subscription", url=url, headers=headers)
+
+    async def update_subscription(self, subscription_type: Text, access_token: Text) -> AsyncResponse:
+        """
+        Updates subscription to the given type.
+
+        Args:
+            access_token: Client's access token.
+            subscription_type: Given new subscription type.
+
+        Returns:
+            Response to updating subscription.
+        """
+        # prepare URL
+        url = self.api_url + "/subscriptions"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # prepare parameters
+        params = {"subscription_type": subscription_type}
+
+        # make an API call to the aEi.ai service to update the subscription type
+        return await self._request("PUT", "update_subscription", url=url, data=params, headers=headers)
+
+    async def delete_source(self, source_id: Text, access_token: Text) -> AsyncResponse:
+        """
+        Deletes a source from Stripe and aEi.ai account given the source ID.
+
+        Args:
+            source_id: Given source ID.
+            access_token: Client's access token.
+
+        Returns:
+            Response to deleting the payment source with given ID.
+        """
+        # prepare URL
+        url = self.api_url + "/sources/" + source_id
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # make an API call to the aEi.ai service to delete a payment method
+        return await self._request("DELETE", "delete_source", url=url, headers=headers)
+
+    async def update_source(self, source_id: Text, update_params: Dict[Text, Text],
+                            access_token: Text) -> AsyncResponse:
+        """
+        Updates a source in Stripe and aEi.ai account given the source ID and parameters to update.
+
+        Args:
+            source_id: Given source ID to update.
+            update_params: Key-value params to update as request body.
+            access_token: Client's access token.
+
+        Returns:
+            Response to updating the payment source.
+        """
+        # prepare URL
+        url = self.api_url + "/sources/" + source_id
+
+        # prepare headers
+        headers = auth_headers(access_token)
+
+        # prepare body
+        body = codec.dumps_bytes(update_params) if update_params else None
+
+        # make an API call to the aEi.ai service to update a payment source
+        return await self._request("PUT", "update_source", url=url, data=body, headers=headers)
+
+    async def change_password(self, password: Text, access_token: Text) -> AsyncResponse:
+        """
+        Changes aEi.ai account password to the given new password, when use has a valid access token.
+
+        Args:
+            password: Given new password.
+            access_token: Client's access token.
+
+        Returns:
+            Response to changing the password to the given new password.
+        """
+        # prepare URL
+        url = self.api_url + "/clients/password"
+
+        # prepare headers
+        headers = auth_headers(access_token)
+        headers["password"] = password
+
+        # make an API call to the aEi.ai service to change password
+        return await self._request("PUT", "change_password", url=url, headers=headers)
+
+    async def reset_password(self, email: Text) -> AsyncResponse:
+        """
+        Resets aEi.ai account password by sending an email to the client.
+
+        Args:
+            email: Client's email.
+
+        Returns:
+            Response to sending a password reset email.
+        """
+        # prepare URL
+        url = self.base_url + "/reset-password"
+
+        # prepare params
+        params = {"email": email}
+
+        # make an API call to the aEi.ai service to send reset password email
+        return await self._request("POST", "reset_password", url=url, data=params)
+
+    async def update_password(self, username: Text, password_reset_token: Text, new_password: Text) -> AsyncResponse:
+        """
+        Updates aEi.ai account password for the given username and password-reset token.
+
+        Args:
+            username: Client's username.
+            password_reset_token: Password-reset token provided by server.
+            new_password: Client's new password.
+
+        Returns:
+            Response to updating client's password.
+        """
+        # prepare URL
+        url = self.base_url + "/update-password"
+
+        # prepare headers
+        headers = {
+            "username": username,
+            "token": password_reset_token,
+            "password": new_password
+        }
+
+        # make an API call to the aEi.ai service to change password
+        return await self._request("PUT", "update_password", url=url, headers=headers)
+
+
+async def _read_chunks(body: Iterable[bytes]) -> AsyncIterator[bytes]:
+    """Reads the chunks of a streamed body from a thread of the default executor."""
+    loop = get_running_loop()
+    chunks = iter(body)
+    while True:
+        chunk = await loop.run_in_executor(None, next, chunks, None)
+        if chunk is None:
+            return
+        yield bytes(chunk)
@@ -0,0 +1,93 @@
+"""
+Affect scores of aEi.ai user models, read the same way by every module.
+
+Missing scores are read as NaN. This module only depends on the standard library, so that modules reading scores
+without analyzing them do not import NumPy.
+"""
+
+import math
+from typing import Any, Dict, Text, Tuple
+
+from api.models import Model
+
+PAD_KEYS = ("pleasure", "arousal", "dominance")
+PERSONALITY_KEYS = ("openness", "conscientiousness", "extraversion", "agreeableness", "neuroticism")
+FACETS = ("emotion", "mood")
+
+
+def score(value: Any) -> float:
+    """
+    Reads one score.
+
+    Args:
+        value: Decoded JSON score, None if missing.
+
+    Returns:
+        Score, NaN if missing.
+    """
+    return math.nan if value is None else float(value)
+
+
+def as_dict(value: Any) -> Dict[Text, Any]:
+    """
+    Gets a decoded JSON object or a model as key-value pairs.
+
+    Args:
+        value: Decoded JSON object or model.
+
+    Returns:
+        Key-value pairs of the value, empty if it is neither an object nor a model.
+    """
+    if isinstance(value, Model):
+        return value.to_dict()
+    return value if isinstance(value, dict) else {}
+
+
+def pad_scores(value: Any) -> Tuple[float, float, float]:
+    """
+    Reads the PAD scores of an emotion or a mood.
+
+    Args:
+        value: Emotion or mood, as decoded JSON object or model.
+
+    Returns:
+        (pleasure, arousal, dominance) scores, NaN for missing scores, or for all of them if the value has no PAD.
+    """
+    pad = as_dict(as_dict(value).get("pad"))
+    return tuple(score(pad.get(key)) for key in PAD_KEYS)
+
+
+def personality_scores(value: Any) -> Tuple[float, ...]:
+    """
+    Reads the personality traits of a user.
+
+    Args:
+        value: Personality, as decoded JSON object or model.
+
+    Returns:
+        Trait scores ordered as PERSONALITY_KEYS, NaN for missing scores.
+    """
+    traits = as_dict(value)
+    return tuple(score(traits.get(key)) for key in PERSONALITY_KEYS)
+
+
+def pad_distance(a: Tuple[float, float, float], b: Tuple[float, float, float]) -> float:
+    """
+    Gets the Euclidean distance between PAD scores, a missing NaN score being equal to another missing score only.
+
+    Args:
+        a: PAD scores.
+        b: Other PAD scores.
+
+    Returns:
+        Distance between the scores known in both, infinite if a score is known in only one of them.
+    """
+    total = 0.0
+    for x, y in zip(a, b):
+        x_missing, y_missing = math.isnan(x), math.isnan(y)
+        if x_missing or y_missing:
+            if x_missing != y_missing:
+                return math.inf
+            continue
+        total += (x - y) ** 2
+    return math.sqrt(total)
@@ -0,0 +1,224 @@
+"""
+Columnar NumPy export and vectorized analysis of aEi.ai user models.
+
+Missing scores are read as NaN, by the helpers of api.affect.
+"""
+
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Text, Tuple, Union
+
+import numpy as np
+
+from api.affect import PAD_KEYS, PERSONALITY_KEYS, as_dict, pad_scores, personality_scores, score
+from api.models import PAD, Model, Personality, User
+
+
+class AffectMatrix:
+    """
+    Users' affect as contiguous columns: one row per user, aligned with the user ID index.
+
+    Missing scores are stored as NaN.
+    """
+    def __init__(self, user_ids: List[Text], emotion: np.ndarray, mood: np.ndarray, personality: np.ndarray):
+        """
+        Constructs an affect matrix.
+
+        Args:
+            user_ids: User IDs, one per row.
+            emotion: Users × 3 emotion PAD matrix.
+            mood: Users × 3 mood PAD matrix.
+            personality: Users × 5 personality matrix, with traits ordered as PERSONALITY_KEYS.
+        """
+        self.user_ids = np.asarray(user_ids, dtype=object)
+        self.emotion = np.ascontiguousarray(emotion, dtype=np.float64)
+        self.mood = np.ascontiguousarray(mood, dtype=np.float64)
+        self.personality = np.ascontiguousarray(personality, dtype=np.float64)
+        self._index = {user_id: i for i, user_id in enumerate(user_ids)}
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def index_of(self, user_id: Text) -> int:
+        """
+        Gets the row of given user.
+
+        Args:
+            user_id: Given user ID.
+
+        Returns:
+            Row index of the user.
+        """
+        return self._index[user_id]
+
+    def rows_of(self, user_ids: Iterable[Text]) -> np.ndarray:
+        """
+        Gets the rows of given users, skipping users who are not in the matrix.
+
+        Args:
+            user_ids: Given user IDs.
+
+        Returns:
+            Row indexes of the users.
+        """
+        index = self._index
+        return np.fromiter((index[u] for u in user_ids if u in index), dtype=np.intp)
+
+    def interaction_stats(self,
+                          interactions: Mapping[Text, Iterable[Text]]) -> Dict[Text, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Computes mean and variance of emotion PAD of the users of each interaction.
+
+        Args:
+            interactions: User IDs of each interaction ID.
+
+        Returns:
+            (mean, variance) PAD vectors of each interaction ID, NaN for interactions without known users.
+        """
+        stats = {}
+        for interaction_id, user_ids in interactions.items():
+            rows = self.emotion[self.rows_of(user_ids)]
+            if len(rows) == 0:
+                nan = np.full(3, np.nan)
+                stats[interaction_id] = (nan, nan.copy())
+                continue
+            stats[interaction_id] = (np.nanmean(rows, axis=0), np.nanvar(rows, axis=0))
+        return stats
+
+    def nearest(self, user_id: Text, k: int = 10, space: Text = "emotion") -> List[Tuple[Text, float]]:
+        """
+        Finds the users closest to given user in PAD space.
+
+        Args:
+            user_id: Given user ID.
+            k: Number of neighbours to find.
+            space: PAD space to search, emotion or mood.
+
+        Returns:
+            (user ID, Euclidean distance) of the nearest users, closest first, excluding the user itself.
+        """
+        matrix = self._pad_space(space)
+        row = self.index_of(user_id)
+        distances = np.sqrt(np.sum((matrix - matrix[row]) ** 2, axis=1))
+        distances[row] = np.inf
+        # users with missing scores never qualify as neighbours
+        distances[np.isnan(distances)] = np.inf
+
+        k = min(k, len(distances) - 1)
+        if k <= 0:
+            return []
+        candidates = np.argpartition(distances, k - 1)[:k]
+        candidates = candidates[np.argsort(distances[candidates])]
+        return [(self.user_ids[i], float(distances[i])) for i in candidates if np.isfinite(distances[i])]
+
+    def z_scores(self, space: Text = "emotion") -> np.ndarray:
+        """
+        Computes per-dimension z-scores of all users.
+
+        Args:
+            space: PAD space to score, emotion or mood.
+
+        Returns:
+            Users × 3 z-score matrix.
+        """
+        matrix = self._pad_space(space)
+        std = np.nanstd(matrix, axis=0)
+        std[std == 0] = 1.0
+        return (matrix - np.nanmean(matrix, axis=0)) / std
+
+    def outliers(self, threshold: float = 3.0, space: Text = "emotion") -> np.ndarray:
+        """
+        Flags users whose PAD scores are far from the population in any dimension.
+
+        Args:
+            threshold: Absolute z-score above which a user is an outlier.
+            space: PAD space to score, emotion or mood.
+
+        Returns:
+            Boolean mask with one entry per user.
+        """
+        return np.any(np.abs(self.z_scores(space)) > threshold, axis=1)
+
+    def _pad_space(self, space: Text) -> np.ndarray:
+        if space == "emotion":
+            return self.emotion
+        if space == "mood":
+            return self.mood
+        raise ValueError("Unknown PAD space: " + space)
+
+
+def from_users(users: Iterable[Union[Dict[Text, Any], Model]]) -> AffectMatrix:
+    """
+    Exports users, as listed by get_user_list, to an affect matrix.
+
+    Args:
+        users: Users as decoded JSON objects or User models.
+
+    Returns:
+        Affect matrix of the users.
+    """
+    user_ids, emotion, mood, personality = [], [], [], []
+    for user in users:
+        if isinstance(user, User):
+            # typed users are read attribute by attribute, never converted back to dicts
+            user_ids.append(user.user_id)
+            affect = user.affect
+            emotion.append(_model_pad(affect.emotion if affect is not None else None))
+            mood.append(_model_pad(affect.mood if affect is not None else None))
+            personality.append(_model_personality(affect.personality if affect is not None else None))
+            continue
+        user = as_dict(user)
+        affect = as_dict(user.get("affect"))
+        user_ids.append(user.get("userId"))
+        emotion.append(pad_scores(affect.get("emotion")))
+        mood.append(pad_scores(affect.get("mood")))
+        personality.append(personality_scores(affect.get("personality")))
+    return _build(user_ids, emotion, mood, personality)
+
+
+def from_profiles(profiles: Iterable[Any]) -> AffectMatrix:
+    """
+    Exports per-user facet responses, as returned by get_user_profiles, to an affect matrix.
+
+    Args:
+        profiles: User profiles with decoded emotion, mood and personality responses.
+
+    Returns:
+        Affect matrix of the users.
+    """
+    user_ids, emotion, mood, personality = [], [], [], []
+    for profile in profiles:
+        user_ids.append(profile.user_id)
+        emotion.append(pad_scores(_facet(profile.emotion, "emotion")))
+        mood.append(pad_scores(_facet(profile.mood, "mood")))
+        personality.append(personality_scores(_facet(profile.personality, "personality")))
+    return _build(user_ids, emotion, mood, personality)
+
+
+def _build(user_ids: List[Text], emotion: List[Tuple], mood: List[Tuple], personality: List[Tuple]) -> AffectMatrix:
+    n = len(user_ids)
+    return AffectMatrix(
+        user_ids=user_ids,
+        emotion=np.array(emotion, dtype=np.float64).reshape(n, len(PAD_KEYS)),
+        mood=np.array(mood, dtype=np.float64).reshape(n, len(PAD_KEYS)),
+        personality=np.array(personality, dtype=np.float64).reshape(n, len(PERSONALITY_KEYS)))
+
+
+def _facet(body: Any, key: Text) -> Dict[Text, Any]:
+    """Unwraps a facet from its response body, which may carry it under the facet name."""
+    body = as_dict(body)
+    return body.get(key, body)
+
+
+def _model_pad(value: Any) -> Tuple[float, float, float]:
+    """Reads the PAD scores of an emotion or mood model, NaN for missing ones."""
+    pad = value.pad if value is not None else None
+    if not isinstance(pad, PAD):
+        return pad_scores(None)
+    return score(pad.pleasure), score(pad.arousal), score(pad.dominance)
+
+
+def _model_personality(value: Optional[Personality]) -> Tuple[float, ...]:
+    """Reads the traits of a personality model, NaN for missing ones."""
+    if value is None:
+        return personality_scores(None)
+    return (score(value.openness), score(value.conscientiousness), score(value.extraversion),
+            score(value.agreeableness), score(value.neuroticism))
@@ -0,0 +1,181 @@
+"""
+Micro-batching of aEi.ai text and image inputs.
+"""
+
+from collections import deque
+from concurrent.futures import Future
+from threading import Condition, Thread
+from time import monotonic
+from typing import Any, Deque, Dict, List, Optional, Text, Tuple
+
+from api import codec
+from api.aei_ai import AeiClient, default_client, image_input, text_input
+from api.uploads import ImageSource
+
+DEFAULT_MAX_BATCH_SIZE = 100
+DEFAULT_MAX_DELAY = 0.05
+
+
+class BatchingSender:
+    """
+    Collects text and image inputs and sends them in batches through the multi-input endpoint.
+
+    Inputs are sent in the order they were submitted, by a single background thread, so the
+    order of inputs of each (user_id, interaction_id) pair is preserved across batches.
+    """
+    def __init__(self, access_token: Text, client: AeiClient = None, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_delay: float = DEFAULT_MAX_DELAY):
+        """
+        Constructs a batching sender and starts its background thread.
+
+        Args:
+            access_token: Client's access token.
+            client: aEi.ai API client to send batches through, the default client if not given.
+            max_batch_size: Number of pending inputs that triggers sending a batch.
+            max_delay: Maximum time in seconds an input waits for its batch to fill up.
+        """
+        self.access_token = access_token
+        self.client = client if client is not None else default_client()
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+
+        # entries with their futures and the time they were queued at
+        self._pending: Deque[Tuple[Dict[Text, Any], Future, float]] = deque()
+        self._flush_requested = False
+        self._closed = False
+        self._condition = Condition()
+        self._thread = Thread(target=self._run, name="aei-batching-sender", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "BatchingSender":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def send_text(self, user_id: Text, interaction_id: Text, text: Text) -> Future:
+        """
+        Queues given user's text to be sent to given interaction.
+
+        Args:
+            user_id: Source user ID.
+            interaction_id: Target interaction ID.
+            text: User's utterance.
+
+        Returns:
+            Future resolving to the analysis result of this input, or failing with the error of its batch, such
+            as requests' HTTPError if the service rejected it.
+        """
+        return self._submit(text_input(user_id=user_id, interaction_id=interaction_id, text=text))
+
+    def send_image(self, user_id: Text, interaction_id: Text, image: ImageSource) -> Future:
+        """
+        Queues given user's image input to be sent to given interaction.
+
+        Images given by content are read only when their batch is sent, so files must not change until then.
+
+        Args:
+            user_id: Source user ID.
+            interaction_id: Target interaction ID.
+            image: User's input image URL, file path, bytes, memoryview or binary file-like object.
+
+        Returns:
+            Future resolving to the analysis result of this input, or failing with the error of its batch, such
+            as requests' HTTPError if the service rejected it.
+        """
+        return self._submit(image_input(user_id=user_id, interaction_id=interaction_id, image=image))
+
+    def flush(self):
+        """Sends all queued inputs without waiting for the batch to fill up."""
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+
+    def close(self):
+        """Sends all queued inputs and stops the background thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _submit(self, entry: Dict[Text, Any]) -> Future:
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Cannot send inputs through a closed batching sender.")
+            self._pending.append((entry, future, monotonic()))
+            # the sending thread waits without deadline while the queue is empty
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch_size:
+                self._condition.notify_all()
+        return future
+
+    def _next_batch(self) -> Optional[List[Tuple[Dict[Text, Any], Future, float]]]:
+        """Waits until a batch is due and takes it from the queue, returns None once closed and drained."""
+        with self._condition:
+            while True:
+                if self._pending:
+                    # the oldest queued input sets the deadline, however long ago a batch was sent
+                    due = self._pending[0][2] + self.max_delay
+                    if self._closed or self._flush_requested or len(self._pending) >= self.max_batch_size \
+                            or monotonic() >= due:
+                        break
+                    self._condition.wait(timeout=due - monotonic())
+                elif self._closed:
+                    return None
+                else:
+                    self._flush_requested = False
+                    self._condition.wait()
+
+            size = min(len(self._pending), self.max_batch_size)
+            batch = [self._pending.popleft() for _ in range(size)]
+            if not self._pending:
+                self._flush_requested = False
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._send(batch)
+
+    def _send(self, batch: List[Tuple[Dict[Text, Any], Future, float]]):
+        # skip inputs whose callers cancelled them while queued
+        entries, futures = [], []
+        for entry, future, _ in batch:
+            if future.set_running_or_notify_cancel():
+                entries.append(entry)
+                futures.append(future)
+        if not entries:
+            return
+
+        try:
+            response = self.client.send_inputs(inputs=entries, access_token=self.access_token)
+            # a rejected batch fails every future, rather than resolving them to the error body
+            response.raise_for_status()
+            results = _split_results(codec.response_json(response), len(entries))
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        for future, result in zip(futures, results):
+            future.set_result(result)
+
+
+def _split_results(body: Any, size: int) -> List[Any]:
+    """
+    Splits the multi-input response into one result per input.
+
+    Args:
+        body: Decoded multi-input response.
+        size: Number of inputs sent.
+
+    Returns:
+        Per-input results aligned with the sent inputs, each with its own status, or the whole response for every
+        input when it does not carry per-input results.
+    """
+    results = body.get("inputs") if isinstance(body, dict) else None
+    if isinstance(results, list) and len(results) == size:
+        return results
+    return [body] * size
@@ -0,0 +1,255 @@
+"""
+Local accounting of billable aEi.ai queries.
+"""
+
+import logging
+from threading import Lock, Thread
+from time import monotonic, sleep
+from typing import Any, Callable, Dict, FrozenSet, Optional, Text, Union
+
+from api import codec
+
+logger = logging.getLogger(__name__)
+
+BILLABLE_ENDPOINTS = frozenset([
+    "send_text",
+    "send_image",
+    "send_inputs",
+    "get_user",
+    "get_user_emotion",
+    "get_user_mood",
+    "get_user_personality",
+    "get_user_satisfaction",
+    "get_user_social_perception",
+    "get_user_empathy"
+])
+
+DEFAULT_SYNC_INTERVAL = 300.0
+DEFAULT_SYNC_EVERY = 1000
+
+
+class BudgetExceededError(Exception):
+    """Raised instead of making a billable call once the query quota is used up."""
+
+
+class BudgetSyncError(Exception):
+    """Raised when the service's query metrics cannot be read."""
+
+
+class QueryBudget:
+    """
+    Thread-safe query budget that counts billable calls locally and only occasionally syncs with the
+    service's query metrics, correcting the local count for drift.
+
+    Syncs that become due are made in the background, so that no call waits for them. Call sync before a large job
+    to start it from the service's figures.
+    """
+    def __init__(self, access_token: Union[Text, Callable[[], Text], Any], quota: int = None,
+                 plan_quotas: Dict[Text, int] = None, billable_endpoints: FrozenSet[Text] = BILLABLE_ENDPOINTS,
+                 sync_interval: float = DEFAULT_SYNC_INTERVAL, sync_every: int = DEFAULT_SYNC_EVERY,
+                 refuse: bool = False, slow_down_below: int = None, slow_down_delay: float = 0.1):
+        """
+        Constructs a query budget.
+
+        Args:
+            access_token: Client's access token used to read query metrics, or a function returning a valid one, or
+                a TokenProvider, so that syncs keep working after the token expires.
+            quota: Number of queries allowed by the client's subscription, None to read it from the subscription at
+                every sync, the budget having no limit until then, or if the subscription has no known quota.
+            plan_quotas: Number of queries allowed by each subscription type, for subscriptions without a quota.
+            billable_endpoints: Names of the API endpoints counted as queries.
+            sync_interval: Maximum number of seconds between syncs with the service's query metrics.
+            sync_every: Maximum number of billable calls between syncs with the service's query metrics.
+            refuse: True to raise BudgetExceededError instead of making a billable call once the quota is used up.
+            slow_down_below: Number of remaining queries below which billable calls are delayed, None to never delay.
+            slow_down_delay: Number of seconds each billable call is delayed by when slowing down.
+        """
+        self.access_token = access_token
+        self.quota = quota
+        self.plan_quotas = plan_quotas or {}
+        self.billable_endpoints = billable_endpoints
+        self.sync_interval = sync_interval
+        self.sync_every = sync_every
+        self.refuse = refuse
+        self.slow_down_below = slow_down_below
+        self.slow_down_delay = slow_down_delay
+        self.client = None
+
+        self.synced_used = 0
+        self.drift = 0
+        self._local = 0
+        self._counts: Dict[Text, int] = {}
+        self._since_sync = 0
+        self._sync_attempted_at = None
+        self._quota_from_subscription = quota is None
+        self._syncing = False
+        self._lock = Lock()
+        self._sync_lock = Lock()
+
+    def bind(self, client):
+        """
+        Binds the budget to the client whose calls it counts, which is also used to sync query metrics.
+
+        Args:
+            client: aEi.ai API client.
+        """
+        self.client = client
+
+    def used(self) -> int:
+        """
+        Estimates the number of queries used, without calling the service.
+
+        Returns:
+            Number of queries used at last sync, plus billable calls made since.
+        """
+        with self._lock:
+            return self.synced_used + self._local
+
+    def remaining_budget(self) -> Optional[int]:
+        """
+        Estimates the number of queries left, without calling the service.
+
+        Returns:
+            Number of queries left in the quota, None if there is no quota.
+        """
+        if self.quota is None:
+            return None
+        return self.quota - self.used()
+
+    def counts(self) -> Dict[Text, int]:
+        """
+        Gets the number of billable calls made through the client, per endpoint.
+
+        Returns:
+            Number of billable calls of each endpoint name.
+        """
+        with self._lock:
+            return dict(self._counts)
+
+    def before_call(self, endpoint: Text):
+        """
+        Applies the quota to a call about to be made, starting a background sync with the service if it is due.
+
+        The call is checked against the local estimate, never waiting for the sync. A failed sync is logged and the
+        local estimate kept, the sync being tried again once it is due again.
+
+        Args:
+            endpoint: Name of the called API endpoint.
+
+        Raises:
+            BudgetExceededError: If the quota is used up and the budget refuses further calls.
+        """
+        if endpoint not in self.billable_endpoints:
+            return
+        if self._is_sync_due():
+            self._sync_in_background()
+
+        remaining = self.remaining_budget()
+        if remaining is None:
+            return
+        if remaining <= 0 and self.refuse:
+            raise BudgetExceededError("Query quota of %d is used up." % self.quota)
+        if self.slow_down_below is not None and remaining < self.slow_down_below:
+            sleep(self.slow_down_delay)
+
+    def record(self, endpoint: Text, queries: int = 1):
+        """
+        Records billable calls that went through.
+
+        Args:
+            endpoint: Name of the called API endpoint.
+            queries: Number of queries the call was billed for.
+        """
+        if endpoint not in self.billable_endpoints:
+            return
+        with self._lock:
+            self._local += queries
+            self._since_sync += queries
+            self._counts[endpoint] = self._counts.get(endpoint, 0) + queries
+
+    def sync(self) -> bool:
+        """
+        Replaces the local estimate by the service's query metrics, unless another thread is already syncing.
+
+        When the budget was not given a quota, it is also read from the client's subscription.
+
+        Returns:
+            True if the budget was synced, false if another sync was in progress.
+
+        Raises:
+            BudgetSyncError: If the query metrics could not be read, the local estimate being left unchanged.
+        """
+        if self.client is None:
+            raise RuntimeError("Query budget is not bound to a client.")
+        if not self._sync_lock.acquire(blocking=False):
+            return False
+        try:
+            with self._lock:
+                local_before = self._local
+                # a failed sync is not retried before it is due again
+                self._since_sync = 0
+                self._sync_attempted_at = monotonic()
+            access_token = self._access_token()
+            quota = self._subscription_quota(access_token) if self._quota_from_subscription else self.quota
+            used = 0
+            for response in (self.client.get_used_free_queries(access_token=access_token),
+                             self.client.get_used_paid_queries(access_token=access_token)):
+                if response.status_code != 200:
+                    raise BudgetSyncError("Reading query metrics failed with status %d." % response.status_code)
+                try:
+                    used += int(codec.response_json(response)["queries"])
+                except (ValueError, TypeError, KeyError) as e:
+                    raise BudgetSyncError("Query metrics response is invalid.") from e
+            with self._lock:
+                # calls made while syncing may or may not be included in the metrics, keep counting them locally
+                self.drift = used - (self.synced_used + local_before)
+                self.synced_used = used
+                self._local -= local_before
+                self.quota = quota
+            return True
+        finally:
+            self._sync_lock.release()
+
+    def _subscription_quota(self, access_token: Text) -> Optional[int]:
+        """Reads the quota of the client's subscription, None if it has none the budget knows of."""
+        response = self.client.get_subscription(access_token=access_token)
+        if response.status_code != 200:
+            raise BudgetSyncError("Reading the subscription failed with status %d." % response.status_code)
+        try:
+            subscription = codec.response_json(response)["subscription"]
+            if subscription.get("quota") is not None:
+                return int(subscription["quota"])
+            return self.plan_quotas.get(subscription.get("type"))
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            raise BudgetSyncError("Subscription response is invalid.") from e
+
+    def _sync_in_background(self):
+        """Starts a sync in a thread of its own, unless one is already running."""
+        with self._lock:
+            if self._syncing:
+                return
+            self._syncing = True
+        Thread(target=self._background_sync, name="aei-budget-sync", daemon=True).start()
+
+    def _background_sync(self):
+        try:
+            self.sync()
+        except Exception as e:
+            logger.warning("Syncing the query budget failed, keeping the local estimate: %s", e)
+        finally:
+            with self._lock:
+                self._syncing = False
+
+    def _access_token(self) -> Text:
+        if hasattr(self.access_token, "get_token"):
+            return self.access_token.get_token()
+        if callable(self.access_token):
+            return self.access_token()
+        return self.access_token
+
+    def _is_sync_due(self) -> bool:
+        if self.client is None:
+            return False
+        with self._lock:
+            return self._sync_attempted_at is None or self._since_sync >= self.sync_every \
+                or monotonic() - self._sync_attempted_at >= self.sync_interval
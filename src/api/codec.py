@@ -0,0 +1,179 @@
+"""
+Pluggable JSON codec of the aEi.ai Python API.
+
+The fastest installed backend among orjson, msgspec and ujson is used, falling back to the standard library.
+Set the AEI_JSON_CODEC environment variable, or call set_codec, to choose one explicitly.
+"""
+
+import json
+import os
+from typing import TYPE_CHECKING, Any, Callable, Optional, Text, Union
+
+if TYPE_CHECKING:
+    from requests.models import Response
+
+BACKENDS = ("orjson", "msgspec", "ujson", "json")
+
+
+class JsonCodec:
+    """JSON encoder and decoder of one backend."""
+    def __init__(self, name: Text, dumps: Callable[[Any], Text], dumps_bytes: Callable[[Any], bytes],
+                 loads: Callable[[Union[bytes, Text]], Any]):
+        """
+        Constructs a JSON codec.
+
+        Args:
+            name: Name of the backend.
+            dumps: Function encoding an object to a JSON string.
+            dumps_bytes: Function encoding an object to UTF-8 JSON bytes.
+            loads: Function decoding JSON bytes or string, raising ValueError on invalid JSON.
+        """
+        self.name = name
+        self.dumps = dumps
+        self.dumps_bytes = dumps_bytes
+        self.loads = loads
+
+    def __repr__(self) -> Text:
+        return "JsonCodec(%r)" % self.name
+
+
+def load_codec(name: Text) -> JsonCodec:
+    """
+    Builds the codec of given backend.
+
+    Args:
+        name: Name of the backend, one of orjson, msgspec, ujson and json.
+
+    Returns:
+        JSON codec.
+
+    Raises:
+        ImportError: If the backend is not installed.
+        ValueError: If the backend is unknown.
+    """
+    if name == "orjson":
+        import orjson
+        return JsonCodec(name, dumps=lambda obj: orjson.dumps(obj).decode("utf-8"), dumps_bytes=orjson.dumps,
+                         loads=orjson.loads)
+    if name == "msgspec":
+        import msgspec
+        encoder, decoder = msgspec.json.Encoder(), msgspec.json.Decoder()
+
+        def loads(data: Union[bytes, Text]) -> Any:
+            try:
+                return decoder.decode(data)
+            except msgspec.DecodeError as e:
+                # callers expect the ValueError raised by the other backends
+                raise ValueError(str(e)) from e
+
+        return JsonCodec(name, dumps=lambda obj: encoder.encode(obj).decode("utf-8"), dumps_bytes=encoder.encode,
+                         loads=loads)
+    if name == "ujson":
+        import ujson
+
+        def dumps(obj: Any) -> Text:
+            return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False)
+
+        return JsonCodec(name, dumps=dumps, dumps_bytes=lambda obj: dumps(obj).encode("utf-8"), loads=ujson.loads)
+    if name == "json":
+        return JsonCodec(name, dumps=json.dumps, dumps_bytes=lambda obj: json.dumps(obj).encode("utf-8"),
+                         loads=json.loads)
+    raise ValueError("Unknown JSON codec %s, use one of %s." % (name, ", ".join(BACKENDS)))
+
+
+def _default_codec() -> JsonCodec:
+    name = os.environ.get("AEI_JSON_CODEC")
+    if name:
+        return load_codec(name)
+    for name in BACKENDS:
+        try:
+            return load_codec(name)
+        except ImportError:
+            continue
+
+
+_codec = _default_codec()
+
+
+def get_codec() -> JsonCodec:
+    """
+    Gets the codec used by the API.
+
+    Returns:
+        Current JSON codec.
+    """
+    return _codec
+
+
+def set_codec(codec: Union[Text, JsonCodec]) -> Optional[JsonCodec]:
+    """
+    Replaces the codec used by the API.
+
+    Args:
+        codec: JSON codec, or name of its backend.
+
+    Returns:
+        Previous JSON codec.
+    """
+    global _codec
+    previous = _codec
+    _codec = load_codec(codec) if isinstance(codec, str) else codec
+    return previous
+
+
+def dumps(obj: Any) -> Text:
+    """
+    Encodes an object with the current codec.
+
+    Args:
+        obj: JSON-serializable object.
+
+    Returns:
+        JSON string.
+    """
+    return _codec.dumps(obj)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """
+    Encodes an object with the current codec, to be sent as a request body.
+
+    Args:
+        obj: JSON-serializable object.
+
+    Returns:
+        UTF-8 JSON bytes.
+    """
+    return _codec.dumps_bytes(obj)
+
+
+def loads(data: Union[bytes, bytearray, memoryview, Text]) -> Any:
+    """
+    Decodes JSON with the current codec.
+
+    Args:
+        data: JSON bytes or string.
+
+    Returns:
+        Decoded object.
+
+    Raises:
+        ValueError: If the data is not valid JSON.
+    """
+    return _codec.loads(data)
+
+
+def response_json(response: "Response") -> Any:
+    """
+    Decodes a response body with the current codec, straight from its bytes.
+
+    Args:
+        response: API response.
+
+    Returns:
+        Decoded response body.
+
+    Raises:
+        ValueError: If the body is not valid JSON.
+    """
+    return _codec.loads(response.content)
@@ -0,0 +1,141 @@
+"""
+Request body compression and response encoding negotiation for aEi.ai API calls.
+"""
+
+import gzip
+from typing import Any, Dict, FrozenSet, Optional, Text
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP = "gzip"
+ZSTD = "zstd"
+DEFAULT_THRESHOLD = 1024
+DEFAULT_LEVELS = {GZIP: 6, ZSTD: 3}
+LIST_ENDPOINTS = frozenset(["get_user_list", "get_interaction_list"])
+JSON_ENDPOINTS = frozenset(["create_new_user", "send_inputs", "update_source"])
+
+
+def accept_encoding() -> Text:
+    """
+    Gets the response encodings the client can decode, preferred first.
+
+    Returns:
+        Accept-Encoding header value, with zstd only if the zstandard package is installed.
+    """
+    return "zstd, gzip" if zstandard is not None else "gzip"
+
+
+class Compression:
+    """
+    Compresses JSON request bodies above a size threshold, and asks for compressed responses of list endpoints,
+    which requests decodes transparently.
+    """
+    def __init__(self, algorithm: Text = GZIP, threshold: int = DEFAULT_THRESHOLD, level: int = None,
+                 list_endpoints: FrozenSet[Text] = LIST_ENDPOINTS, json_endpoints: FrozenSet[Text] = JSON_ENDPOINTS):
+        """
+        Constructs a request compression policy.
+
+        Args:
+            algorithm: Either gzip or zstd, zstd requiring the zstandard package.
+            threshold: Minimum size in bytes of the request bodies to compress, as small bodies gain nothing.
+            level: Compression level, a default balancing speed and ratio for the algorithm if not given.
+            list_endpoints: Names of the API endpoints to ask compressed responses of.
+            json_endpoints: Names of the API endpoints whose JSON request bodies are compressed.
+        """
+        if algorithm not in DEFAULT_LEVELS:
+            raise ValueError("Unknown compression algorithm %s, use gzip or zstd." % algorithm)
+        if algorithm == ZSTD and zstandard is None:
+            raise ImportError("zstd compression requires the zstandard package.")
+        self.algorithm = algorithm
+        self.threshold = threshold
+        self.level = level if level is not None else DEFAULT_LEVELS[algorithm]
+        self.list_endpoints = list_endpoints
+        self.json_endpoints = json_endpoints
+        self.accept_encoding = accept_encoding()
+
+    def compress(self, data: bytes) -> bytes:
+        """
+        Compresses a request body.
+
+        Args:
+            data: Request body.
+
+        Returns:
+            Compressed body.
+        """
+        return compress(data, self.algorithm, self.level)
+
+    def prepare(self, endpoint: Text, kwargs: Dict[Text, Any]):
+        """
+        Compresses the body of a request about to be sent, and negotiates the encoding of its response.
+
+        Only JSON bodies are compressed: text inputs, images, which gzip cannot shrink, and form bodies are sent as
+        they are, as are streamed bodies.
+
+        Args:
+            endpoint: Name of the called API endpoint.
+            kwargs: Arguments of the session request, updated in place.
+        """
+        headers = kwargs.get("headers")
+        if headers is None:
+            headers = kwargs["headers"] = {}
+        if endpoint in self.list_endpoints:
+            headers.setdefault("Accept-Encoding", self.accept_encoding)
+
+        if endpoint not in self.json_endpoints or "json" not in headers.get("Content-Type", "application/json"):
+            return
+        data = kwargs.get("data")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        elif not isinstance(data, (bytes, bytearray, memoryview)):
+            return
+        if len(data) < self.threshold or "Content-Encoding" in headers:
+            return
+        kwargs["data"] = self.compress(data)
+        headers["Content-Encoding"] = self.algorithm
+
+
+def compress(data: bytes, encoding: Text, level: int = None) -> bytes:
+    """
+    Encodes a body.
+
+    Args:
+        data: Body to encode.
+        encoding: Either gzip or zstd.
+        level: Compression level, the algorithm's default if not given.
+
+    Returns:
+        Encoded body.
+    """
+    level = level if level is not None else DEFAULT_LEVELS[encoding]
+    if encoding == ZSTD:
+        # compressors are not thread-safe, so each call gets its own
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def decompress(data: bytes, encoding: Optional[Text]) -> bytes:
+    """
+    Decodes a body according to its Content-Encoding.
+
+    Args:
+        data: Encoded body.
+        encoding: Content-Encoding header value, None or identity for uncompressed bodies.
+
+    Returns:
+        Decoded body.
+
+    Raises:
+        ValueError: If the encoding is not supported.
+    """
+    if not encoding or encoding == "identity":
+        return data
+    if encoding == GZIP:
+        return gzip.decompress(data)
+    if encoding == ZSTD and zstandard is not None:
+        # streamed frames do not record their content size, which decompress requires
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    raise ValueError("Unsupported content encoding %s." % encoding)
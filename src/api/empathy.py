@@ -0,0 +1,205 @@
+"""
+Concurrent retrieval of the empathy of aEi.ai users towards each other, as a NumPy matrix.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, List, Optional, Text, Union
+
+import numpy as np
+from requests.models import Response
+
+from api import codec
+from api.aei_ai import DEFAULT_MAX_URL_LENGTH, AeiClient, default_client, split_targets
+
+
+class EmpathyMatrix:
+    """
+    Empathy of users towards each other: the value at row i and column j is the empathy of user i towards user j,
+    both aligned with the user ID index.
+
+    The diagonal, and scores the service did not return, are stored as NaN.
+    """
+    def __init__(self, user_ids: List[Text], values: np.ndarray = None):
+        """
+        Constructs an empathy matrix.
+
+        Args:
+            user_ids: User IDs, one per row and column.
+            values: N × N empathy matrix, all NaN if not given.
+        """
+        self.user_ids = list(user_ids)
+        self._index = {user_id: i for i, user_id in enumerate(self.user_ids)}
+        if len(self._index) != len(self.user_ids):
+            raise ValueError("User IDs of an empathy matrix must be unique.")
+        n = len(self.user_ids)
+        self.values = np.full((n, n), np.nan) if values is None else np.array(values, dtype=np.float64)
+        if self.values.shape != (n, n):
+            raise ValueError("Empathy matrix of %d users must be %d × %d." % (n, n, n))
+        self.errors: Dict[Text, Union[Response, Exception]] = {}
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def index_of(self, user_id: Text) -> int:
+        """
+        Gets the row and column of given user.
+
+        Args:
+            user_id: Given user ID.
+
+        Returns:
+            Index of the user.
+        """
+        return self._index[user_id]
+
+    def get(self, user_id: Text, target_user_id: Text) -> float:
+        """
+        Gets the empathy of a user towards another.
+
+        Args:
+            user_id: Given user ID.
+            target_user_id: Target user ID.
+
+        Returns:
+            Empathy score, NaN if unknown.
+        """
+        return float(self.values[self._index[user_id], self._index[target_user_id]])
+
+    def is_complete(self) -> bool:
+        """
+        Asserts if all requested empathy scores were retrieved.
+
+        Returns:
+            True if no request failed, false otherwise.
+        """
+        return not self.errors
+
+    def update(self, changed_user_ids: Iterable[Text], access_token: Text, client: AeiClient = None,
+               max_workers: int = None, max_url_length: int = DEFAULT_MAX_URL_LENGTH) -> "EmpathyMatrix":
+        """
+        Refreshes the scores involving users who changed since the last call, leaving the others as they are.
+
+        The rows of changed users are requested in full, and the other rows only for the columns of changed users.
+        Changed users who are not in the matrix yet are added to it.
+
+        Args:
+            changed_user_ids: IDs of the users whose affect changed.
+            access_token: Client's access token.
+            client: aEi.ai API client to call, the default client if not given.
+            max_workers: Maximum number of requests in flight, the client's connection pool size if not given.
+            max_url_length: Maximum length of request URLs, target lists being split to fit.
+
+        Returns:
+            This matrix, updated in place.
+        """
+        changed = list(dict.fromkeys(changed_user_ids))
+        self._add(u for u in changed if u not in self._index)
+        changed_set = set(changed)
+        requests = {}
+        for user_id in self.user_ids:
+            targets = self.user_ids if user_id in changed_set else changed
+            requests[user_id] = [t for t in targets if t != user_id]
+        self._fetch(requests, access_token, client, max_workers, max_url_length)
+        return self
+
+    def _add(self, user_ids: Iterable[Text]):
+        """
+        Grows the matrix with unknown scores of new users.
+
+        Args:
+            user_ids: IDs of users not in the matrix.
+        """
+        for user_id in user_ids:
+            self._index[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+        n, m = len(self.user_ids), len(self.values)
+        if n > m:
+            values = np.full((n, n), np.nan)
+            values[:m, :m] = self.values
+            self.values = values
+
+    def _fetch(self, requests: Dict[Text, List[Text]], access_token: Text, client: AeiClient, max_workers: int,
+               max_url_length: int):
+        """
+        Requests the empathy of users towards their targets concurrently, and stores the scores.
+
+        Args:
+            requests: Target user IDs of each user ID.
+            access_token: Client's access token.
+            client: aEi.ai API client to call, the default client if not given.
+            max_workers: Maximum number of requests in flight, the client's connection pool size if not given.
+            max_url_length: Maximum length of request URLs.
+        """
+        client = client if client is not None else default_client()
+        max_workers = max_workers if max_workers is not None else client.pool_maxsize
+        for user_id in requests:
+            self.errors.pop(user_id, None)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for user_id, targets in requests.items():
+                base_length = len(client.api_url + "/users/" + user_id + "/empathy")
+                for chunk in split_targets(targets, base_length, max_url_length):
+                    future = executor.submit(client.get_user_empathy, user_id=user_id, target_user_ids=chunk,
+                                             access_token=access_token)
+                    futures[future] = (user_id, chunk)
+
+            # scores are stored from this thread only, as responses complete
+            for future in as_completed(futures):
+                user_id, chunk = futures[future]
+                row = self._index[user_id]
+                columns = [self._index[t] for t in chunk]
+                self.values[row, columns] = np.nan
+                try:
+                    response = future.result()
+                    scores = _scores(codec.response_json(response)) if response.status_code == 200 else None
+                except Exception as e:
+                    self.errors[user_id] = e
+                    continue
+                if scores is None:
+                    self.errors[user_id] = response
+                    continue
+                for target_id, column in zip(chunk, columns):
+                    self.values[row, column] = _score(scores.get(target_id))
+
+    def __repr__(self) -> Text:
+        return "EmpathyMatrix(users=%d, errors=%r)" % (len(self.user_ids), list(self.errors))
+
+
+def empathy_matrix(user_ids: List[Text], access_token: Text, client: AeiClient = None, max_workers: int = None,
+                   max_url_length: int = DEFAULT_MAX_URL_LENGTH) -> EmpathyMatrix:
+    """
+    Gets the empathy of every given user towards every other, requesting all users concurrently.
+
+    Target lists too long for one URL are split over several requests. Call update on the result to refresh the
+    scores of users who changed since.
+
+    Args:
+        user_ids: Given user IDs.
+        access_token: Client's access token.
+        client: aEi.ai API client to call, the default client if not given.
+        max_workers: Maximum number of requests in flight, the client's connection pool size if not given.
+        max_url_length: Maximum length of request URLs, target lists being split to fit.
+
+    Returns:
+        N × N empathy matrix of given users.
+    """
+    matrix = EmpathyMatrix(list(dict.fromkeys(user_ids)))
+    requests = {u: [t for t in matrix.user_ids if t != u] for u in matrix.user_ids}
+    matrix._fetch(requests, access_token, client, max_workers, max_url_length)
+    return matrix
+
+
+def _scores(body: Any) -> Optional[Dict[Text, Any]]:
+    """Gets the scores of an empathy response, None if the body carries none, so that the row records an error."""
+    empathy = body.get("empathy") if isinstance(body, dict) else None
+    return empathy if isinstance(empathy, dict) else None
+
+
+def _score(value: Any) -> float:
+    if isinstance(value, dict):
+        value = value.get("score")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
@@ -0,0 +1,241 @@
+"""
+Hedged requests for idempotent aEi.ai read endpoints, cutting the tail latency caused by occasional slow responses.
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, TimeoutError, wait
+from threading import BoundedSemaphore, Lock
+from time import perf_counter
+from typing import Callable, Deque, Dict, FrozenSet, Optional, Text
+
+from requests.models import Response
+
+HEDGED_ENDPOINTS = frozenset(["get_user", "get_user_emotion", "get_user_mood", "get_user_personality",
+                              "get_user_satisfaction", "get_user_social_perception", "get_user_empathy",
+                              "get_interaction"])
+DEFAULT_PERCENTILE = 95.0
+DEFAULT_MAX_EXTRA_LOAD = 0.05
+DEFAULT_MIN_DELAY = 0.002
+DEFAULT_WINDOW = 1000
+DEFAULT_MIN_SAMPLES = 50
+DEFAULT_MAX_WORKERS = 32
+# the hedging delay is recomputed after this many new latency samples
+_RECOMPUTE_EVERY = 32
+
+
+class _EndpointLatency:
+    """Recent latencies and hedge counts of one endpoint, updated while holding the hedging lock."""
+    __slots__ = ("samples", "new_samples", "delay", "requests", "hedges", "hedges_won")
+
+    def __init__(self, window: int):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.new_samples = 0
+        self.delay: Optional[float] = None
+        self.requests = 0
+        self.hedges = 0
+        self.hedges_won = 0
+
+
+class Hedging:
+    """
+    Sends a second copy of a read request that has not been answered by an adaptive deadline, and returns whichever
+    copy answers first.
+
+    The deadline of each endpoint is a percentile of its recent latencies, so that only the slowest requests are
+    hedged. Extra requests are capped to a fraction of all requests: every request earns that fraction of a credit,
+    and a hedge spends a whole one. The slower copy is cancelled if it has not been sent yet, otherwise its response
+    is discarded as soon as it arrives, releasing its connection.
+
+    Once an endpoint is hedged, both copies are sent from a bounded pool of threads, leaving the calling thread free
+    to take whichever answer comes first. Copies are never queued: when the pool is busy, the first copy is sent from
+    the calling thread without hedging, and no hedge is sent.
+    """
+    def __init__(self, endpoints: FrozenSet[Text] = HEDGED_ENDPOINTS, percentile: float = DEFAULT_PERCENTILE,
+                 max_extra_load: float = DEFAULT_MAX_EXTRA_LOAD, min_delay: float = DEFAULT_MIN_DELAY,
+                 window: int = DEFAULT_WINDOW, min_samples: int = DEFAULT_MIN_SAMPLES,
+                 max_workers: int = DEFAULT_MAX_WORKERS):
+        """
+        Constructs a hedging policy.
+
+        Args:
+            endpoints: Names of the API endpoints to hedge, which must be idempotent GET endpoints.
+            percentile: Percentile of recent latencies after which a request is hedged.
+            max_extra_load: Maximum number of hedged copies per request, for example, 0.05 for 5% extra requests.
+            min_delay: Minimum number of seconds to wait before hedging.
+            window: Number of recent latencies per endpoint the percentile is computed over.
+            min_samples: Number of latencies an endpoint must have before its requests are hedged.
+            max_workers: Maximum number of copies, first and hedged, in flight from the pool of threads.
+        """
+        self.endpoints = endpoints
+        self.percentile = percentile
+        self.max_extra_load = max_extra_load
+        self.min_delay = min_delay
+        self.window = window
+        self.min_samples = min_samples
+        self.max_workers = max_workers
+
+        self._endpoints: Dict[Text, _EndpointLatency] = {}
+        # a small burst lets the first slow requests be hedged without waiting for credit
+        self._credit = 1.0
+        self._max_credit = max(1.0, max_extra_load * 100)
+        self._lock = Lock()
+        self._executor: ThreadPoolExecutor = None
+        # pool threads free to send a copy right away
+        self._slots = BoundedSemaphore(max_workers)
+
+    def execute(self, endpoint: Text, send: Callable[[], Response],
+                on_hedge: Callable[[Text, bool], None] = None,
+                on_response: Callable[[Text, Response], None] = None) -> Response:
+        """
+        Sends a request, hedging it if it is not answered by the endpoint's deadline.
+
+        Args:
+            endpoint: Name of the called API endpoint.
+            send: Function sending one copy of the request.
+            on_hedge: Function called with the endpoint and whether the hedged copy won, when one was sent.
+            on_response: Function called with the endpoint and the response of every copy answered, first or hedged,
+                whether or not it won, for example, to account for billed calls. Copies losing the race may be
+                answered after this method returns.
+
+        Returns:
+            Response of the copy answering first, or of the other copy if the first one raised.
+        """
+        with self._lock:
+            latency = self._get(endpoint)
+            latency.requests += 1
+            self._credit = min(self._max_credit, self._credit + self.max_extra_load)
+            delay = latency.delay
+            executor = self._executor
+            if executor is None and delay is not None:
+                executor = self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                               thread_name_prefix="aei-hedging")
+
+        start = perf_counter()
+        primary = self._submit(executor, send) if delay is not None else None
+        if primary is None:
+            # too few latencies to hedge yet, or a busy pool, sent from the calling thread
+            response = send()
+            self._record(endpoint, None, perf_counter() - start)
+            if on_response is not None:
+                on_response(endpoint, response)
+            return response
+
+        # latencies of first copies only, whether or not they win, so that hedging does not skew the percentile
+        primary.add_done_callback(lambda future: self._record(endpoint, future, perf_counter() - start))
+        if on_response is not None:
+            primary.add_done_callback(lambda future: _answered(future) and on_response(endpoint, future.result()))
+        try:
+            return primary.result(timeout=delay)
+        except TimeoutError:
+            pass
+
+        with self._lock:
+            if self._credit < 1.0:
+                return primary.result()
+            self._credit -= 1.0
+        hedge = self._submit(executor, send)
+        if hedge is None:
+            with self._lock:
+                self._credit += 1.0
+            return primary.result()
+        if on_response is not None:
+            hedge.add_done_callback(lambda future: _answered(future) and on_response(endpoint, future.result()))
+
+        done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+        winner, loser = (primary, hedge) if primary in done else (hedge, primary)
+        if winner.exception() is not None:
+            # the other copy may still succeed
+            wait([loser])
+            if loser.exception() is None:
+                winner, loser = loser, winner
+        if not loser.cancel():
+            loser.add_done_callback(_discard)
+
+        won = winner is hedge
+        with self._lock:
+            latency.hedges += 1
+            latency.hedges_won += won
+        if on_hedge is not None:
+            on_hedge(endpoint, won)
+        return winner.result()
+
+    def delay(self, endpoint: Text) -> Optional[float]:
+        """
+        Gets the current hedging deadline of an endpoint.
+
+        Args:
+            endpoint: Name of the API endpoint.
+
+        Returns:
+            Number of seconds after which requests are hedged, None while there are too few latencies.
+        """
+        with self._lock:
+            latency = self._endpoints.get(endpoint)
+            return latency.delay if latency is not None else None
+
+    def stats(self) -> Dict[Text, Dict[Text, float]]:
+        """
+        Gets the hedging counts of every endpoint.
+
+        Returns:
+            Number of requests, of hedged copies sent and of hedged copies answering first, and current deadline
+            per endpoint name.
+        """
+        with self._lock:
+            return {endpoint: {"requests": latency.requests, "hedges": latency.hedges,
+                               "hedges_won": latency.hedges_won, "delay": latency.delay}
+                    for endpoint, latency in self._endpoints.items()}
+
+    def close(self):
+        """Stops the threads sending request copies, once the copies in flight are answered."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _submit(self, executor: ThreadPoolExecutor, send: Callable[[], Response]) -> Optional[Future]:
+        """Sends a copy from the pool, unless all its threads are busy, in which case None is returned."""
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = executor.submit(send)
+        except RuntimeError:
+            # closed meanwhile
+            self._slots.release()
+            return None
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _record(self, endpoint: Text, future: Optional[Future], elapsed: float):
+        if future is not None and (future.cancelled() or future.exception() is not None):
+            return
+        with self._lock:
+            latency = self._get(endpoint)
+            latency.samples.append(elapsed)
+            latency.new_samples += 1
+            if len(latency.samples) >= self.min_samples and (latency.delay is None
+                                                             or latency.new_samples >= _RECOMPUTE_EVERY):
+                latency.delay = max(self.min_delay, _percentile(latency.samples, self.percentile))
+                latency.new_samples = 0
+
+    def _get(self, endpoint: Text) -> _EndpointLatency:
+        """Gets the latencies of an endpoint, must be called while holding the lock."""
+        latency = self._endpoints.get(endpoint)
+        if latency is None:
+            latency = self._endpoints[endpoint] = _EndpointLatency(self.window)
+        return latency
+
+
+def _percentile(samples: Deque[float], percentile: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+def _answered(future: Future) -> bool:
+    return not future.cancelled() and future.exception() is None
+
+
+def _discard(future: Future):
+    """Closes the response of a losing copy, releasing its connection to the pool."""
+    if _answered(future):
+        future.result().close()
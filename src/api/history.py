@@ -0,0 +1,431 @@
+"""
+Persistent local history of aEi.ai users' affect, stored as append-only memory-mapped columns.
+
+A store is a directory holding one file per column, one file per list of IDs the rows refer to, and a JSON
+file with the number of committed rows and IDs:
+
+    time.f8          timestamps of the snapshots, in seconds since the epoch, never decreasing
+    user.i4          index of the user of each snapshot
+    interaction.i4   index of the interaction of the user's last input, -1 if unknown
+    facet.u1         index of the facet of each snapshot in FACETS
+    pad.f8           pleasure, arousal and dominance of each snapshot
+    users.ids        user IDs, one JSON string per line
+    interactions.ids interaction IDs, one JSON string per line
+
+Columns and IDs are appended then synced to disk before their counts are committed, so that rows and IDs written
+by an interrupted sync are ignored and truncated when the store is opened again.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Text, Tuple
+
+import numpy as np
+
+from api import codec
+from api.aei_ai import AeiClient, default_client
+from api.affect import FACETS, PAD_KEYS, pad_distance, pad_scores
+from api.instrumentation import InputTracker
+
+META_FILE = "store.json"
+COLUMNS = (("time", np.float64, ()), ("user", np.int32, ()), ("interaction", np.int32, ()),
+           ("facet", np.uint8, ()), ("pad", np.float64, (len(PAD_KEYS),)))
+_FILE_NAMES = {"time": "time.f8", "user": "user.i4", "interaction": "interaction.i4", "facet": "facet.u1",
+               "pad": "pad.f8"}
+ID_LISTS = ("users", "interactions")
+_ID_FILE_NAMES = {"users": "users.ids", "interactions": "interactions.ids"}
+
+
+class AffectStore:
+    """
+    Timestamped emotion and mood snapshots of users, synced incrementally from the aEi.ai service.
+
+    Add the store's input tracker to the client sending inputs, so that sync only fetches the users whose inputs
+    were sent since the previous sync:
+
+        store = AffectStore("affect-history")
+        client.add_hook(store.inputs)
+        ...
+        store.sync(access_token, client=client)
+        times, pad = store.series(user_id, "emotion", start=time.time() - 3600)
+
+    Queries read memory-mapped columns and never call the API.
+    """
+    def __init__(self, path: Text):
+        """
+        Opens a store, creating it if it does not exist.
+
+        Args:
+            path: Path of the store directory.
+        """
+        self.path = path
+        self.inputs = InputTracker()
+        self._lock = Lock()
+        os.makedirs(path, exist_ok=True)
+
+        meta_path = os.path.join(path, META_FILE)
+        meta = {"version": 1, "rows": 0, "users": 0, "interactions": 0}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+        self.rows: int = meta["rows"]
+
+        ids = {name: _read_ids(os.path.join(path, _ID_FILE_NAMES[name]), meta[name]) for name in ID_LISTS}
+        self._id_files = {name: open(os.path.join(path, _ID_FILE_NAMES[name]), "ab") for name in ID_LISTS}
+        self.user_ids: List[Text] = ids["users"]
+        self.interaction_ids: List[Text] = ids["interactions"]
+        self._user_index = {user_id: i for i, user_id in enumerate(self.user_ids)}
+        self._interaction_index = {interaction_id: i for i, interaction_id in enumerate(self.interaction_ids)}
+
+        # drop rows appended by an interrupted sync, then append after the committed ones
+        self._files = {}
+        for name, dtype, shape in COLUMNS:
+            column_path = os.path.join(path, _FILE_NAMES[name])
+            f = open(column_path, "ab")
+            f.truncate(self.rows * np.dtype(dtype).itemsize * int(np.prod(shape, dtype=np.int64)))
+            self._files[name] = f
+        self._columns: Dict[Text, np.ndarray] = None
+        self._latest = self._load_latest()
+
+    def close(self):
+        """Closes the store's files."""
+        for f in list(self._files.values()) + list(self._id_files.values()):
+            f.close()
+        self._columns = None
+
+    def __enter__(self) -> "AffectStore":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def append(self, snapshots: Iterable[Tuple[Text, Text, Tuple[float, float, float], Optional[Text]]],
+               timestamp: float = None) -> int:
+        """
+        Records snapshots taken at the same time, skipping those equal to the latest one of their user and facet.
+
+        Args:
+            snapshots: (user ID, facet, (pleasure, arousal, dominance), interaction ID or None) tuples.
+            timestamp: Time of the snapshots in seconds since the epoch, now if not given, or the time of the latest
+                recorded snapshot if the clock was set back since.
+
+        Returns:
+            Number of recorded snapshots.
+
+        Raises:
+            ValueError: If a facet or a score is invalid, or the given time is earlier than the latest recorded
+                snapshot, no snapshot being recorded then.
+        """
+        with self._lock:
+            columns = self._mapped()
+            last = float(columns["time"][-1]) if self.rows else None
+            if timestamp is None:
+                timestamp = time.time() if last is None else max(time.time(), last)
+            elif last is not None and timestamp < last:
+                raise ValueError("Snapshots must be recorded in time order.")
+            checked = []
+            for user_id, facet, pad, interaction_id in snapshots:
+                if facet not in FACETS:
+                    raise ValueError("Unknown affect store facet: " + facet)
+                checked.append((user_id, FACETS.index(facet), tuple(float(score) for score in pad), interaction_id))
+
+            # the store is only changed once the rows are committed
+            users, interactions, facets, pads = [], [], [], []
+            new_user_ids, new_interaction_ids, latest = {}, {}, {}
+            for user_id, facet, pad, interaction_id in checked:
+                user = self._code(user_id, self._user_index, new_user_ids)
+                previous = latest.get((user, facet), self._latest.get((user, facet)))
+                if previous is not None and pad_distance(previous, pad) == 0.0:
+                    continue
+                latest[(user, facet)] = pad
+                users.append(user)
+                interactions.append(-1 if interaction_id is None else
+                                    self._code(interaction_id, self._interaction_index, new_interaction_ids))
+                facets.append(facet)
+                pads.append(pad)
+            if not users:
+                return 0
+
+            n = len(users)
+            sizes = self._sizes()
+            try:
+                self._write({
+                    "time": np.full(n, timestamp, dtype=np.float64),
+                    "user": np.array(users, dtype=np.int32),
+                    "interaction": np.array(interactions, dtype=np.int32),
+                    "facet": np.array(facets, dtype=np.uint8),
+                    "pad": np.array(pads, dtype=np.float64).reshape(n, len(PAD_KEYS)),
+                }, {"users": list(new_user_ids), "interactions": list(new_interaction_ids)})
+                self._save_meta(self.rows + n, len(self.user_ids) + len(new_user_ids),
+                                len(self.interaction_ids) + len(new_interaction_ids))
+            except BaseException:
+                # rows left after the committed ones would be misaligned with the next appended rows
+                self._truncate(sizes)
+                raise
+            self.rows += n
+            self.user_ids.extend(new_user_ids)
+            self.interaction_ids.extend(new_interaction_ids)
+            self._user_index.update(new_user_ids)
+            self._interaction_index.update(new_interaction_ids)
+            self._latest.update(latest)
+            self._columns = None
+            return n
+
+    def sync(self, access_token: Text, client: AeiClient = None, user_ids: Iterable[Text] = None,
+             facets: Iterable[Text] = FACETS, max_workers: int = None) -> int:
+        """
+        Records new snapshots of the users whose inputs were sent since the previous sync, requesting the facets of
+        all users concurrently.
+
+        Users whose requests fail, or whose responses are invalid, are synced again by the next call, as are all
+        users if the sync raises.
+
+        Args:
+            access_token: Client's access token.
+            client: aEi.ai API client to call, the default client if not given.
+            user_ids: IDs of users to sync even if no input of theirs was tracked, for example on the first sync.
+            facets: Facets to record, emotion and/or mood.
+            max_workers: Maximum number of requests in flight, the client's connection pool size if not given.
+
+        Returns:
+            Number of recorded snapshots, snapshots equal to the latest recorded ones being skipped.
+        """
+        client = client if client is not None else default_client()
+        facets = list(facets)
+        for facet in facets:
+            if facet not in FACETS:
+                raise ValueError("Unknown affect store facet: " + facet)
+        max_workers = max_workers if max_workers is not None else client.pool_maxsize
+
+        changed = self.inputs.pop_changed()
+        for user_id in user_ids or []:
+            changed.setdefault(user_id, None)
+        if not changed:
+            return 0
+
+        try:
+            snapshots, failed = [], {}
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = []
+                for user_id in changed:
+                    for facet in facets:
+                        future = executor.submit(getattr(client, "get_user_" + facet), user_id=user_id,
+                                                 access_token=access_token)
+                        futures.append((user_id, facet, future))
+
+                for user_id, facet, future in futures:
+                    try:
+                        response = future.result()
+                        if response.status_code != 200:
+                            raise ValueError("Getting %s failed with status %d." % (facet, response.status_code))
+                        body = codec.response_json(response)
+                        pad = pad_scores(body.get(facet, body) if isinstance(body, dict) else None)
+                    except Exception:
+                        failed[user_id] = changed[user_id]
+                        continue
+                    snapshots.append((user_id, facet, pad, changed[user_id]))
+            recorded = self.append(snapshots)
+        except BaseException:
+            # the popped users would otherwise never be synced again
+            self.inputs.restore_changed(changed)
+            raise
+
+        self.inputs.restore_changed(failed)
+        return recorded
+
+    def latest(self, user_id: Text, facet: Text = "emotion") -> Optional[Tuple[float, float, float]]:
+        """
+        Gets the latest recorded snapshot of a user.
+
+        Args:
+            user_id: Given user ID.
+            facet: Either emotion or mood.
+
+        Returns:
+            (pleasure, arousal, dominance) scores, None if no snapshot was recorded.
+        """
+        user = self._user_index.get(user_id)
+        return None if user is None else self._latest.get((user, FACETS.index(facet)))
+
+    def series(self, user_id: Text, facet: Text = "emotion", start: float = None,
+               end: float = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Gets the snapshots of a user within a time range.
+
+        Args:
+            user_id: Given user ID.
+            facet: Either emotion or mood.
+            start: Start of the range in seconds since the epoch, inclusive, the first snapshot if not given.
+            end: End of the range in seconds since the epoch, exclusive, after the last snapshot if not given.
+
+        Returns:
+            Times of the snapshots, and snapshots × 3 PAD matrix.
+        """
+        columns, rows = self._range(start, end)
+        user = self._user_index.get(user_id)
+        if user is None:
+            return np.empty(0), np.empty((0, len(PAD_KEYS)))
+        mask = (columns["user"][rows] == user) & (columns["facet"][rows] == FACETS.index(facet))
+        return columns["time"][rows][mask], columns["pad"][rows][mask]
+
+    def interaction_series(self, interaction_id: Text, facet: Text = "emotion", start: float = None,
+                           end: float = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Gets the snapshots of the users of an interaction within a time range, taken after their inputs to it.
+
+        Args:
+            interaction_id: Given interaction ID.
+            facet: Either emotion or mood.
+            start: Start of the range in seconds since the epoch, inclusive, the first snapshot if not given.
+            end: End of the range in seconds since the epoch, exclusive, after the last snapshot if not given.
+
+        Returns:
+            Times of the snapshots, user ID of each snapshot, and snapshots × 3 PAD matrix.
+        """
+        columns, rows = self._range(start, end)
+        interaction = self._interaction_index.get(interaction_id)
+        if interaction is None:
+            return np.empty(0), np.empty(0, dtype=object), np.empty((0, len(PAD_KEYS)))
+        mask = (columns["interaction"][rows] == interaction) & (columns["facet"][rows] == FACETS.index(facet))
+        user_ids = np.asarray(self.user_ids, dtype=object)[columns["user"][rows][mask]]
+        return columns["time"][rows][mask], user_ids, columns["pad"][rows][mask]
+
+    def downsample(self, user_id: Text, facet: Text = "emotion", interval: float = 60.0, start: float = None,
+                   end: float = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Gets the mean snapshot of a user over consecutive time intervals, skipping intervals without snapshots.
+
+        Args:
+            user_id: Given user ID.
+            facet: Either emotion or mood.
+            interval: Length of the intervals in seconds.
+            start: Start of the first interval in seconds since the epoch, the first snapshot if not given.
+            end: End of the range in seconds since the epoch, exclusive, after the last snapshot if not given.
+
+        Returns:
+            Start times of the intervals, and intervals × 3 matrix of mean PAD, NaN scores being ignored.
+        """
+        times, pad = self.series(user_id, facet, start=start, end=end)
+        if len(times) == 0:
+            return times, pad
+        origin = start if start is not None else times[0]
+        bins, inverse = np.unique(((times - origin) // interval).astype(np.int64), return_inverse=True)
+        known = ~np.isnan(pad)
+        sums = np.zeros((len(bins), pad.shape[1]))
+        counts = np.zeros((len(bins), pad.shape[1]))
+        np.add.at(sums, inverse, np.where(known, pad, 0.0))
+        np.add.at(counts, inverse, known)
+        with np.errstate(invalid="ignore"):
+            return origin + bins * interval, sums / counts
+
+    def _range(self, start: Optional[float], end: Optional[float]) -> Tuple[Dict[Text, np.ndarray], slice]:
+        """Gets the columns, and the rows within a time range found by binary search of the sorted times."""
+        columns = self._mapped()
+        times = columns["time"]
+        lo = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+        hi = len(times) if end is None else int(np.searchsorted(times, end, side="left"))
+        return columns, slice(lo, hi)
+
+    def _mapped(self) -> Dict[Text, np.ndarray]:
+        """Maps the committed rows of every column, mapping them again only after rows were appended."""
+        columns = self._columns
+        if columns is not None:
+            return columns
+        columns = {}
+        for name, dtype, shape in COLUMNS:
+            if self.rows == 0:
+                columns[name] = np.empty((0,) + shape, dtype=dtype)
+            else:
+                columns[name] = np.memmap(os.path.join(self.path, _FILE_NAMES[name]), dtype=dtype, mode="r",
+                                          shape=(self.rows,) + shape)
+        self._columns = columns
+        return columns
+
+    def _write(self, values: Dict[Text, np.ndarray], ids: Dict[Text, List[Text]]):
+        """Appends rows to every column and new IDs to their lists, and syncs them to disk."""
+        for name, f in self._files.items():
+            f.write(values[name].tobytes())
+        for name, f in self._id_files.items():
+            if ids[name]:
+                f.write(_encode_ids(ids[name]))
+        self._sync_files(list(self._files.values()) + list(self._id_files.values()))
+
+    def _paths(self) -> Dict[Text, Tuple[Dict, Text]]:
+        """Gets the open files of the store by path, with the dict holding each of them under the given key."""
+        paths = {os.path.join(self.path, _FILE_NAMES[name]): (self._files, name) for name in self._files}
+        paths.update({os.path.join(self.path, _ID_FILE_NAMES[name]): (self._id_files, name)
+                      for name in self._id_files})
+        return paths
+
+    def _sizes(self) -> Dict[Text, int]:
+        """Gets the committed size of every file, all of them being synced after each append."""
+        return {path: files[name].tell() for path, (files, name) in self._paths().items()}
+
+    def _truncate(self, sizes: Dict[Text, int]):
+        """Truncates every file back to given sizes, reopening it to drop the bytes left in its buffer."""
+        for path, (files, name) in self._paths().items():
+            try:
+                files[name].close()
+            except OSError:
+                pass
+            os.truncate(path, sizes[path])
+            files[name] = open(path, "ab")
+
+    @staticmethod
+    def _sync_files(files: Iterable):
+        for f in files:
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _save_meta(self, rows: int, users: int, interactions: int):
+        """Commits the row and ID counts, replacing the metadata file atomically."""
+        path = os.path.join(self.path, META_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": 1, "rows": rows, "users": users, "interactions": interactions}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _load_latest(self) -> Dict[Tuple[int, int], Tuple[float, float, float]]:
+        """Finds the latest snapshot of each user and facet."""
+        columns = self._mapped()
+        if self.rows == 0:
+            return {}
+        keys = columns["user"].astype(np.int64) * len(FACETS) + columns["facet"]
+        _, last = np.unique(keys[::-1], return_index=True)
+        last = self.rows - 1 - last
+        latest = {}
+        for row in last:
+            key = (int(columns["user"][row]), int(columns["facet"][row]))
+            latest[key] = tuple(float(score) for score in columns["pad"][row])
+        return latest
+
+    @staticmethod
+    def _code(value: Text, index: Dict[Text, int], new: Dict[Text, int]) -> int:
+        """Gets the index of an ID, numbering it after the known and new IDs if it is new."""
+        code = index.get(value)
+        if code is None:
+            code = new.setdefault(value, len(index) + len(new))
+        return code
+
+
+def _encode_ids(ids: List[Text]) -> bytes:
+    return "".join(json.dumps(value) + "\n" for value in ids).encode("utf-8")
+
+
+def _read_ids(path: Text, count: int) -> List[Text]:
+    """Reads the committed IDs of a list, truncating the IDs appended by an interrupted sync."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb+") as f:
+        lines = f.read().split(b"\n")[:count]
+        f.truncate(sum(len(line) + 1 for line in lines))
+    return [json.loads(line) for line in lines]
+
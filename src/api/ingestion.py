@@ -0,0 +1,483 @@
+"""
+Resumable bulk ingestion of JSONL utterance logs into aEi.ai.
+
+Each line of a log is a record {"user_id": ..., "interaction_id": ..., "text": ...} or, for images, with
+"image" instead of "text". User and interaction IDs of the log are the log's own: matching aEi.ai users and
+interactions are created on first sight, and the mapping is persisted next to the checkpoint.
+"""
+
+import hashlib
+import json
+import os
+import uuid
+from collections import OrderedDict
+from queue import Queue
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Text, Tuple
+
+from api import codec
+from api.aei_ai import AeiClient, image_input, text_input
+from api.sharding import stable_shard
+from api.tokens import TokenProvider
+
+DEFAULT_WORKERS = 8
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_CHECKPOINT_INTERVAL = 5.0
+DEFAULT_REPORT_INTERVAL = 10.0
+
+
+class IngestionError(Exception):
+    """Raised when records cannot be ingested, after the progress made so far was checkpointed."""
+
+
+class Record:
+    """One utterance of a log."""
+    __slots__ = ("line", "user_id", "interaction_id", "text", "image")
+
+    def __init__(self, line: int, user_id: Text, interaction_id: Text, text: Text = None, image: Text = None):
+        """
+        Constructs a log record.
+
+        Args:
+            line: Line number of the record in the log, starting from 0.
+            user_id: Source user ID in the log.
+            interaction_id: Target interaction ID in the log.
+            text: User's utterance, None for image records.
+            image: User's input image URL or file path, None for text records.
+        """
+        self.line = line
+        self.user_id = user_id
+        self.interaction_id = interaction_id
+        self.text = text
+        self.image = image
+
+
+class IngestionStats:
+    """Counts of an ingestion run, updated by the workers."""
+    def __init__(self, started: float):
+        """
+        Constructs empty counts.
+
+        Args:
+            started: Monotonic time the run started at.
+        """
+        self.started = started
+        self.sent = 0
+        self.failed = 0
+        self.invalid = 0
+        self.skipped = 0
+        self.users_created = 0
+        self.interactions_created = 0
+
+    def records_per_second(self) -> float:
+        """
+        Computes the throughput of the run so far.
+
+        Returns:
+            Number of records sent per second.
+        """
+        return self.sent / max(monotonic() - self.started, 1e-9)
+
+    def to_dict(self) -> Dict[Text, Any]:
+        """
+        Converts the counts to key-value pairs.
+
+        Returns:
+            Counts and throughput of the run.
+        """
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "invalid": self.invalid,
+            "skipped": self.skipped,
+            "users_created": self.users_created,
+            "interactions_created": self.interactions_created,
+            "elapsed": monotonic() - self.started,
+            "records_per_second": self.records_per_second()
+        }
+
+
+class Checkpoint:
+    """
+    Progress of an ingestion run, persisted atomically.
+
+    Records are acknowledged out of order across interactions, so progress is the position of the first
+    unacknowledged record, plus the line numbers of the records already acknowledged after it. The number of workers
+    and the batch size are kept too, as they decide how records are batched, and so is a random ID of the ingestion,
+    which idempotency keys are derived from.
+    """
+    def __init__(self, path: Text, source: Text):
+        """
+        Constructs the checkpoint of given log, loading the persisted progress if any.
+
+        Args:
+            path: Path of the checkpoint file; the ID mapping is persisted to the same path suffixed by .ids.
+            source: Path of the ingested log.
+
+        Raises:
+            IngestionError: If the checkpoint belongs to another log.
+        """
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.offset = 0
+        self.line = 0
+        self.done: Set[int] = set()
+        self.workers: Optional[int] = None
+        self.batch_size: Optional[int] = None
+        self.ids: Dict[Tuple[Text, Text], Text] = {}
+        # a new ingestion of the log, after its checkpoint was deleted, is not a resend of the previous one
+        self.ingestion_id = uuid.uuid4().hex
+
+        if os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved["source"] != self.source:
+                raise IngestionError("Checkpoint %s belongs to %s, not %s." % (path, saved["source"], self.source))
+            self.offset = saved["offset"]
+            self.line = saved["line"]
+            self.done = set(saved["done"])
+            self.workers = saved.get("workers")
+            self.batch_size = saved.get("batch_size")
+            self.ingestion_id = saved.get("ingestion_id", self.ingestion_id)
+        if os.path.exists(path + ".ids"):
+            with open(path + ".ids") as f:
+                for line in f:
+                    # the last line may be partial if the process died while writing it
+                    try:
+                        kind, source_id, aei_id = codec.loads(line)
+                    except ValueError:
+                        continue
+                    self.ids[(kind, source_id)] = aei_id
+        self._ids_file = open(path + ".ids", "a")
+
+    def add_id(self, kind: Text, source_id: Text, aei_id: Text):
+        """
+        Records the aEi.ai ID created for a log ID.
+
+        Args:
+            kind: Either user or interaction.
+            source_id: ID in the log.
+            aei_id: ID in aEi.ai.
+        """
+        self.ids[(kind, source_id)] = aei_id
+        self._ids_file.write(codec.dumps([kind, source_id, aei_id]) + "\n")
+        self._ids_file.flush()
+
+    def save(self, offset: int, line: int, done: Set[int]):
+        """
+        Persists progress, after the ID mapping it depends on.
+
+        Args:
+            offset: Byte offset of the first unacknowledged record.
+            line: Line number of the first unacknowledged record.
+            done: Line numbers of the records acknowledged after it.
+        """
+        os.fsync(self._ids_file.fileno())
+        saved = {"source": self.source, "offset": offset, "line": line, "done": sorted(done), "workers": self.workers,
+                 "batch_size": self.batch_size, "ingestion_id": self.ingestion_id}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(saved, f)
+            f.flush()
+            os.fsync(f.fileno())
+        # replace atomically, so that a crash never leaves a partial checkpoint
+        os.replace(tmp_path, self.path)
+        self.offset, self.line, self.done = offset, line, set(done)
+
+    def close(self):
+        """Closes the ID mapping file."""
+        self._ids_file.close()
+
+
+def iter_log(path: Text, offset: int = 0, line: int = 0) -> Iterator[Tuple[int, int, int, Optional[Record]]]:
+    """
+    Reads the records of a JSONL log.
+
+    Args:
+        path: Path of the log.
+        offset: Byte offset to start reading from, which must be the start of a line.
+        line: Line number of the line at given offset.
+
+    Returns:
+        Iterator of (line number, byte offset, byte offset of the next line, record), the record being None
+        for blank or invalid lines.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            next_offset = offset + len(raw)
+            yield line, offset, next_offset, _parse_record(line, raw)
+            offset = next_offset
+            line += 1
+
+
+def _parse_record(line: int, raw: bytes) -> Optional[Record]:
+    try:
+        entry = codec.loads(raw)
+        text, image = entry.get("text"), entry.get("image")
+        if (text is None) == (image is None):
+            return None
+        return Record(line, str(entry["user_id"]), str(entry["interaction_id"]), text=text, image=image)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+class Ingestor:
+    """
+    Ingests a JSONL log through the multi-input endpoint with a pool of worker threads.
+
+    Records are routed to workers by interaction ID, and every worker sends its records in log order,
+    so the order of records within each interaction is preserved while interactions are sent concurrently.
+
+    A worker batches its records of each aligned block of batch size lines, so that batches, and the idempotency
+    keys derived from them, are the same in every run resuming an ingestion of the log. A resumed run keeps the
+    number of workers and the batch size of the run it resumes.
+    """
+    def __init__(self, tokens: TokenProvider, client: AeiClient = None, workers: int = DEFAULT_WORKERS,
+                 batch_size: int = DEFAULT_BATCH_SIZE, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+                 report_interval: float = DEFAULT_REPORT_INTERVAL,
+                 on_report: Callable[[IngestionStats], None] = None):
+        """
+        Constructs an ingestor.
+
+        Args:
+            tokens: Provider of the client's access token.
+            client: aEi.ai API client to send records through, which should have a pool of at least as many
+                connections as workers, a client of that size if not given.
+            workers: Number of worker threads, unless resuming a run made with another number.
+            batch_size: Number of log lines whose records a worker sends in one call, unless resuming a run made with
+                another size.
+            queue_size: Maximum number of records queued per worker.
+            checkpoint_interval: Number of seconds between checkpoints.
+            report_interval: Number of seconds between progress reports.
+            on_report: Function called with the counts of the run at every report, None for no reports.
+        """
+        self.tokens = tokens
+        self.client = client if client is not None else AeiClient(pool_maxsize=workers)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.checkpoint_interval = checkpoint_interval
+        self.report_interval = report_interval
+        self.on_report = on_report
+
+        self.stats = None
+        self._checkpoint = None
+        self._ids_lock = Lock()
+        self._creating: Dict[Tuple[Text, Text], Event] = {}
+        self._members: Dict[Text, Set[Text]] = {}
+        self._progress_lock = Lock()
+        self._pending: "OrderedDict[int, int]" = OrderedDict()
+        self._done: Set[int] = set()
+        self._error = None
+        self._batch_size = batch_size
+
+    def run(self, source: Text, checkpoint_path: Text = None) -> IngestionStats:
+        """
+        Ingests a log, resuming from its checkpoint if there is one.
+
+        Args:
+            source: Path of the JSONL log.
+            checkpoint_path: Path of the checkpoint file, the log path suffixed by .checkpoint if not given.
+
+        Returns:
+            Counts of the run.
+
+        Raises:
+            IngestionError: If a batch could not be sent; progress is checkpointed first, so that the run
+                can be resumed.
+        """
+        checkpoint = self._checkpoint = Checkpoint(checkpoint_path or source + ".checkpoint", source)
+        if checkpoint.workers is None:
+            checkpoint.workers, checkpoint.batch_size = self.workers, self.batch_size
+        workers, self._batch_size = checkpoint.workers, checkpoint.batch_size or self.batch_size
+        stats = self.stats = IngestionStats(started=monotonic())
+        self._pending.clear()
+        self._done = set(checkpoint.done)
+        self._members.clear()
+        self._error = None
+        # persist the ingestion ID before any batch is sent under it
+        checkpoint.save(checkpoint.offset, checkpoint.line, checkpoint.done)
+
+        queues = [Queue(maxsize=self.queue_size) for _ in range(workers)]
+        threads = [Thread(target=self._work, args=(queue,), name="aei-ingestion-%d" % i, daemon=True)
+                   for i, queue in enumerate(queues)]
+        for thread in threads:
+            thread.start()
+
+        offset, line = checkpoint.offset, checkpoint.line
+        last_checkpoint = last_report = monotonic()
+        try:
+            for number, start, end, record in iter_log(source, checkpoint.offset, checkpoint.line):
+                if self._error is not None:
+                    break
+                with self._progress_lock:
+                    if number in self._done:
+                        stats.skipped += 1
+                        record = None
+                    elif record is None:
+                        stats.invalid += 1
+                        self._done.add(number)
+                    else:
+                        self._pending[number] = start
+                if record is not None:
+                    # blocks while the worker is behind, which bounds memory
+                    queues[stable_shard(record.interaction_id, workers)].put(record)
+                offset, line = end, number + 1
+
+                now = monotonic()
+                if now - last_checkpoint >= self.checkpoint_interval:
+                    self._save(offset, line)
+                    last_checkpoint = now
+                if self.on_report is not None and now - last_report >= self.report_interval:
+                    self.on_report(stats)
+                    last_report = now
+        finally:
+            for queue in queues:
+                queue.put(None)
+            for thread in threads:
+                thread.join()
+            self._save(offset, line)
+            checkpoint.close()
+
+        if self.on_report is not None:
+            self.on_report(stats)
+        if self._error is not None:
+            raise IngestionError("Ingestion stopped, rerun to resume: %s" % self._error) from self._error
+        return stats
+
+    def _save(self, offset: int, line: int):
+        """Checkpoints progress, offset and line being those after the last record read."""
+        with self._progress_lock:
+            if self._pending:
+                line, offset = next(iter(self._pending.items()))
+            # acknowledged records before the first pending one are covered by its position
+            self._done = {done for done in self._done if done >= line}
+            done = set(self._done)
+        self._checkpoint.save(offset, line, done)
+
+    def _work(self, queue: Queue):
+        batch = []
+        while True:
+            record = queue.get()
+            # records arrive in log order, so a record of the next block completes the batch
+            if batch and (record is None or record.line // self._batch_size != batch[0].line // self._batch_size):
+                if self._error is None:
+                    try:
+                        self._send(batch)
+                    except Exception as e:
+                        # leave the batch unacknowledged, the run resumes from it
+                        self._error = e
+                batch = []
+            if record is None:
+                return
+            batch.append(record)
+
+    def _send(self, batch: List[Record]):
+        inputs = []
+        for record in batch:
+            user_id = self._resolve("user", record.user_id, record.interaction_id)
+            interaction_id = self._resolve("interaction", record.interaction_id, user_id)
+            self._join(interaction_id, user_id)
+            if record.text is not None:
+                inputs.append(text_input(user_id=user_id, interaction_id=interaction_id, text=record.text))
+            else:
+                inputs.append(image_input(user_id=user_id, interaction_id=interaction_id, image=record.image))
+
+        # batches are the same in every run, and acknowledged as a whole, so a batch sent again after a crash gets
+        # the same key and the service drops it; records of a replaced log at the same lines get other keys
+        content = [[record.line, record.user_id, record.interaction_id, record.text, record.image] for record in batch]
+        key = hashlib.sha1((self._checkpoint.ingestion_id + ":" + json.dumps(content, separators=(",", ":")))
+                           .encode("utf-8")).hexdigest()
+        response = self.tokens.call(self.client.send_inputs, inputs=inputs, idempotency_key=key)
+        if response.status_code >= 400:
+            raise IngestionError("Sending inputs failed with status %d: %s" % (response.status_code, response.text))
+
+        results = codec.response_json(response).get("inputs")
+        failed = 0
+        if isinstance(results, list):
+            failed = sum(1 for result in results
+                         if isinstance(result, dict) and result.get("status", {}).get("code", 200) >= 400)
+        with self._progress_lock:
+            for record in batch:
+                del self._pending[record.line]
+                self._done.add(record.line)
+            self.stats.sent += len(batch) - failed
+            self.stats.failed += failed
+
+    def _resolve(self, kind: Text, source_id: Text, related_id: Text) -> Text:
+        """
+        Gets the aEi.ai ID of a log user or interaction, creating it once if it does not exist yet.
+
+        Args:
+            kind: Either user or interaction.
+            source_id: ID in the log.
+            related_id: Interaction ID in the log for users, aEi.ai user ID for interactions.
+
+        Returns:
+            ID in aEi.ai.
+        """
+        key = (kind, source_id)
+        while True:
+            with self._ids_lock:
+                aei_id = self._checkpoint.ids.get(key)
+                if aei_id is not None:
+                    return aei_id
+                creating = self._creating.get(key)
+                if creating is None:
+                    creating = self._creating[key] = Event()
+                    break
+            # another worker is creating it
+            creating.wait()
+
+        try:
+            if kind == "user":
+                response = self.tokens.call(self.client.create_new_user, attributes={"sourceId": source_id})
+                field = "user"
+            else:
+                response = self.tokens.call(self.client.create_new_interaction, user_ids=[related_id])
+                field = "interaction"
+            if response.status_code >= 400:
+                raise IngestionError("Creating %s %s failed with status %d: %s"
+                                     % (kind, source_id, response.status_code, response.text))
+            aei_id = codec.response_json(response)[field][field + "Id"]
+
+            with self._ids_lock:
+                self._checkpoint.add_id(kind, source_id, aei_id)
+                if kind == "user":
+                    self.stats.users_created += 1
+                else:
+                    self.stats.interactions_created += 1
+                    self._members[aei_id] = {related_id}
+        finally:
+            with self._ids_lock:
+                del self._creating[key]
+            creating.set()
+
+        return aei_id
+
+    def _join(self, interaction_id: Text, user_id: Text):
+        """
+        Adds a user to an interaction unless it is known to be in it.
+
+        An interaction is only ever sent by one worker, so no other thread changes its members meanwhile.
+        Members are not persisted: after a resume, users are added again, which leaves interactions unchanged.
+
+        Args:
+            interaction_id: aEi.ai interaction ID.
+            user_id: aEi.ai user ID.
+        """
+        with self._ids_lock:
+            members = self._members.setdefault(interaction_id, set())
+            if user_id in members:
+                return
+        response = self.tokens.call(self.client.add_users_to_interaction, interaction_id=interaction_id,
+                                    user_ids=[user_id])
+        if response.status_code >= 400:
+            raise IngestionError("Adding user to interaction %s failed with status %d: %s"
+                                 % (interaction_id, response.status_code, response.text))
+        with self._ids_lock:
+            members.add(user_id)
@@ -0,0 +1,372 @@
+"""
+Request hooks and per-endpoint metrics of the aEi.ai Python API.
+"""
+
+import time
+from bisect import bisect_left
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Text, Tuple
+from urllib.parse import urlencode
+
+from requests.models import Response
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestHook:
+    """
+    Hook called around every request of a client, all methods doing nothing by default.
+
+    Hooks are called on the requesting thread, so they should return quickly.
+    """
+    def on_attach(self, client: Any):
+        """
+        Called when the hook is added to a client.
+
+        Args:
+            client: aEi.ai API client the hook is added to.
+        """
+
+    def before_request(self, endpoint: Text, method: Text):
+        """
+        Called before a request is sent.
+
+        Args:
+            endpoint: Name of the called API endpoint.
+            method: HTTP method.
+        """
+
+    def after_request(self, endpoint: Text, method: Text, elapsed: float, response: Optional[Response],
+                      error: Optional[BaseException], request_bytes: int = 0):
+        """
+        Called after a request completed, including its retries.
+
+        Args:
+            endpoint: Name of the called API endpoint.
+            method: HTTP method.
+            elapsed: Duration of the request in seconds.
+            response: Response to the request, None if it raised.
+            error: Error raised by the request, None if it completed.
+            request_bytes: Size of the request body as sent, compressed if it was, 0 if streamed.
+        """
+
+    def on_retry(self, endpoint: Text, attempt: int):
+        """
+        Called before a request is retried.
+
+        Args:
+            endpoint: Name of the called API endpoint.
+            attempt: Number of the retry, starting from 1.
+        """
+
+    def on_hedge(self, endpoint: Text, won: bool):
+        """
+        Called when a hedged copy of a request was sent, once either copy answered.
+
+        Args:
+            endpoint: Name of the called API endpoint.
+            won: True if the hedged copy answered first.
+        """
+
+    def on_inputs(self, endpoint: Text, sources: List[Tuple[Text, Optional[Text]]]):
+        """
+        Called after inputs sent through the client were accepted by the service.
+
+        Args:
+            endpoint: Name of the called API endpoint.
+            sources: (user ID, interaction ID) of each input, as given in the request, the interaction ID being None
+                if unknown.
+        """
+
+
+class _EndpointMetrics:
+    """Metrics of one endpoint, updated while holding the metrics lock."""
+    __slots__ = ("bucket_counts", "latency_sum", "count", "request_bytes", "response_bytes", "statuses", "errors",
+                 "retries", "hedges", "hedges_won")
+
+    def __init__(self, buckets: int):
+        self.bucket_counts = [0] * (buckets + 1)
+        self.latency_sum = 0.0
+        self.count = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.statuses: Dict[int, int] = {}
+        self.errors: Dict[Text, int] = {}
+        self.retries = 0
+        self.hedges = 0
+        self.hedges_won = 0
+
+
+class Metrics(RequestHook):
+    """Thread-safe per-endpoint request metrics, exportable as a snapshot or in Prometheus text format."""
+    def __init__(self, latency_buckets: Tuple[float, ...] = DEFAULT_LATENCY_BUCKETS, namespace: Text = "aei"):
+        """
+        Constructs empty metrics.
+
+        Args:
+            latency_buckets: Upper bounds in seconds of the latency histogram buckets, in increasing order.
+            namespace: Prefix of the Prometheus metric names.
+        """
+        self.latency_buckets = tuple(latency_buckets)
+        self.namespace = namespace
+        self.client = None
+        self._endpoints: Dict[Text, _EndpointMetrics] = {}
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._lock = Lock()
+
+    def on_attach(self, client: Any):
+        self.client = client
+
+    def before_request(self, endpoint: Text, method: Text):
+        with self._lock:
+            self._in_flight += 1
+            if self._in_flight > self._max_in_flight:
+                self._max_in_flight = self._in_flight
+
+    def after_request(self, endpoint: Text, method: Text, elapsed: float, response: Optional[Response],
+                      error: Optional[BaseException], request_bytes: int = 0):
+        response_bytes = _response_size(response) if response is not None else 0
+
+        with self._lock:
+            self._in_flight -= 1
+            metrics = self._get(endpoint)
+            metrics.bucket_counts[bisect_left(self.latency_buckets, elapsed)] += 1
+            metrics.latency_sum += elapsed
+            metrics.count += 1
+            metrics.request_bytes += request_bytes
+            metrics.response_bytes += response_bytes
+            if response is not None:
+                metrics.statuses[response.status_code] = metrics.statuses.get(response.status_code, 0) + 1
+            else:
+                name = type(error).__name__
+                metrics.errors[name] = metrics.errors.get(name, 0) + 1
+
+    def on_retry(self, endpoint: Text, attempt: int):
+        with self._lock:
+            self._get(endpoint).retries += 1
+
+    def on_hedge(self, endpoint: Text, won: bool):
+        with self._lock:
+            metrics = self._get(endpoint)
+            metrics.hedges += 1
+            metrics.hedges_won += won
+
+    def reset(self):
+        """Clears all metrics, except requests in flight."""
+        with self._lock:
+            self._endpoints.clear()
+            self._max_in_flight = self._in_flight
+
+    def snapshot(self) -> Dict[Text, Any]:
+        """
+        Gets a consistent copy of the metrics.
+
+        Returns:
+            Per-endpoint latency histogram, byte counts, status code and error tallies, retry counts and hedged
+            request counts, and connection usage of the client when it manages its pool.
+        """
+        with self._lock:
+            endpoints = {}
+            for endpoint, metrics in self._endpoints.items():
+                endpoints[endpoint] = {
+                    "count": metrics.count,
+                    "latency_sum": metrics.latency_sum,
+                    "latency_buckets": dict(zip([*map(str, self.latency_buckets), "+Inf"],
+                                                _cumulative(metrics.bucket_counts))),
+                    "request_bytes": metrics.request_bytes,
+                    "response_bytes": metrics.response_bytes,
+                    "statuses": dict(metrics.statuses),
+                    "errors": dict(metrics.errors),
+                    "retries": metrics.retries,
+                    "hedges": metrics.hedges,
+                    "hedges_won": metrics.hedges_won
+                }
+            snapshot = {
+                "endpoints": endpoints,
+                "in_flight": self._in_flight,
+                "max_in_flight": self._max_in_flight
+            }
+        # clients given a session of their own do not manage its pool
+        if self.client is not None and self.client.adapter is not None:
+            snapshot["pool"] = self.client.pool_stats()
+        return snapshot
+
+    def prometheus_text(self) -> Text:
+        """
+        Exports the metrics in Prometheus text exposition format.
+
+        Returns:
+            Metrics as Prometheus text.
+        """
+        snapshot = self.snapshot()
+        ns = self.namespace
+        lines: List[Text] = []
+
+        lines.append("# HELP %s_request_duration_seconds Duration of aEi.ai API requests." % ns)
+        lines.append("# TYPE %s_request_duration_seconds histogram" % ns)
+        for endpoint, metrics in sorted(snapshot["endpoints"].items()):
+            for bound, count in metrics["latency_buckets"].items():
+                lines.append('%s_request_duration_seconds_bucket{endpoint="%s",le="%s"} %d'
+                             % (ns, endpoint, bound, count))
+            lines.append('%s_request_duration_seconds_sum{endpoint="%s"} %r' % (ns, endpoint, metrics["latency_sum"]))
+            lines.append('%s_request_duration_seconds_count{endpoint="%s"} %d' % (ns, endpoint, metrics["count"]))
+
+        for name, key, help in [("request_bytes_total", "request_bytes", "Request body bytes sent."),
+                                ("response_bytes_total", "response_bytes", "Response body bytes received."),
+                                ("retries_total", "retries", "Retried requests."),
+                                ("hedges_total", "hedges", "Hedged copies of requests sent."),
+                                ("hedges_won_total", "hedges_won", "Hedged copies answering first.")]:
+            lines.append("# HELP %s_%s %s" % (ns, name, help))
+            lines.append("# TYPE %s_%s counter" % (ns, name))
+            for endpoint, metrics in sorted(snapshot["endpoints"].items()):
+                lines.append('%s_%s{endpoint="%s"} %d' % (ns, name, endpoint, metrics[key]))
+
+        lines.append("# HELP %s_responses_total Responses by status code." % ns)
+        lines.append("# TYPE %s_responses_total counter" % ns)
+        for endpoint, metrics in sorted(snapshot["endpoints"].items()):
+            for status, count in sorted(metrics["statuses"].items()):
+                lines.append('%s_responses_total{endpoint="%s",code="%d"} %d' % (ns, endpoint, status, count))
+
+        lines.append("# HELP %s_errors_total Requests that raised, by error type." % ns)
+        lines.append("# TYPE %s_errors_total counter" % ns)
+        for endpoint, metrics in sorted(snapshot["endpoints"].items()):
+            for error, count in sorted(metrics["errors"].items()):
+                lines.append('%s_errors_total{endpoint="%s",error="%s"} %d' % (ns, endpoint, error, count))
+
+        gauges = [("requests_in_flight", snapshot["in_flight"], "Requests in flight."),
+                  ("requests_in_flight_max", snapshot["max_in_flight"], "Maximum number of requests in flight.")]
+        pool = snapshot.get("pool")
+        if pool is not None:
+            gauges.append(("pool_connections_opened", pool["connections_opened"], "Connections opened by the pool."))
+            gauges.append(("pool_connections_idle", pool["connections_idle"], "Idle pooled connections."))
+            gauges.append(("pool_maxsize", pool["pool_maxsize"], "Maximum pooled connections per host."))
+        for name, value, help in gauges:
+            lines.append("# HELP %s_%s %s" % (ns, name, help))
+            lines.append("# TYPE %s_%s gauge" % (ns, name))
+            lines.append("%s_%s %d" % (ns, name, value))
+
+        return "\n".join(lines) + "\n"
+
+    def _get(self, endpoint: Text) -> _EndpointMetrics:
+        """Gets the metrics of an endpoint, must be called while holding the lock."""
+        metrics = self._endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self._endpoints[endpoint] = _EndpointMetrics(len(self.latency_buckets))
+        return metrics
+
+
+class InputTracker(RequestHook):
+    """
+    Records the users who sent inputs through a client, with the time and interaction of their last input.
+
+    Users are reported as changed once, until the next call to pop_changed.
+    """
+    def __init__(self, listener: Callable[[Text, Optional[Text]], None] = None):
+        """
+        Constructs an input tracker.
+
+        Args:
+            listener: Function called with the user ID and interaction ID of every recorded input, None for none.
+        """
+        self.listener = listener
+        self._lock = Lock()
+        self._last_inputs: Dict[Text, Tuple[float, Optional[Text]]] = {}
+        self._changed: Dict[Text, Optional[Text]] = {}
+
+    def on_inputs(self, endpoint: Text, sources: List[Tuple[Text, Optional[Text]]]):
+        for user_id, interaction_id in sources:
+            self.record(user_id, interaction_id)
+
+    def record(self, user_id: Text, interaction_id: Text = None, timestamp: float = None):
+        """
+        Records an input, for example one sent by another process.
+
+        Args:
+            user_id: Source user ID.
+            interaction_id: Target interaction ID, None if unknown.
+            timestamp: Time of the input in seconds since the epoch, now if not given.
+        """
+        timestamp = timestamp if timestamp is not None else time.time()
+        with self._lock:
+            self._last_inputs[user_id] = (timestamp, interaction_id)
+            self._changed[user_id] = interaction_id
+        if self.listener is not None:
+            self.listener(user_id, interaction_id)
+
+    def last_input(self, user_id: Text) -> Optional[Tuple[float, Optional[Text]]]:
+        """
+        Gets the last recorded input of a user.
+
+        Args:
+            user_id: Given user ID.
+
+        Returns:
+            Time and interaction ID of the user's last input, None if no input was recorded.
+        """
+        with self._lock:
+            return self._last_inputs.get(user_id)
+
+    def pop_changed(self) -> Dict[Text, Optional[Text]]:
+        """
+        Gets the users who sent inputs since the previous call, and forgets them.
+
+        Returns:
+            Interaction ID of the last input of each changed user ID, None if unknown.
+        """
+        with self._lock:
+            changed, self._changed = self._changed, {}
+        return changed
+
+    def restore_changed(self, changed: Dict[Text, Optional[Text]]):
+        """
+        Reports users as changed again, for example after failing to process them.
+
+        Args:
+            changed: Interaction ID of each user ID, as returned by pop_changed.
+        """
+        with self._lock:
+            for user_id, interaction_id in changed.items():
+                self._changed.setdefault(user_id, interaction_id)
+
+
+def _cumulative(counts: List[int]) -> List[int]:
+    total, out = 0, []
+    for count in counts:
+        total += count
+        out.append(total)
+    return out
+
+
+def _response_size(response: Response) -> int:
+    """Gets the size of a response body, decoded if it has no Content-Length, 0 if streamed and not read yet."""
+    length = response.headers.get("Content-Length")
+    if length is not None:
+        return int(length)
+    raw = getattr(response, "raw", None)
+    if raw is not None and raw.closed:
+        return len(response.content)
+    return 0
+
+
+def body_size(data: Any) -> int:
+    """
+    Gets the size of a request body as sent, given as the data argument of a session request.
+
+    Args:
+        data: Request body, either form fields as a dict or a list of key-value pairs, text, bytes or a stream.
+
+    Returns:
+        Size of the body in bytes, 0 if there is none or it is streamed, streams not being measured.
+    """
+    if data is None:
+        return 0
+    if isinstance(data, memoryview):
+        return data.nbytes
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    if isinstance(data, str):
+        return len(data.encode("utf-8"))
+    if isinstance(data, dict) or (isinstance(data, list) and all(isinstance(field, tuple) for field in data)):
+        return len(urlencode(data, doseq=True))
+    return 0
@@ -0,0 +1,407 @@
+"""
+Typed models of aEi.ai API responses.
+
+Models are decoded into __slots__ objects holding only their declared fields, so that large listings keep one
+compact object per record instead of the nested dicts of the decoded response body.
+
+When msgspec is installed, response bodies are decoded by typed msgspec decoders, which never build the
+intermediate dicts, whatever the codec backend. Otherwise, and for bodies whose values do not have the declared
+types, the body is decoded to dicts by the codec first.
+"""
+
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Text, Tuple, Type, Union
+
+from api import codec
+
+if TYPE_CHECKING:
+    from requests.models import Response
+
+
+class Field:
+    """Model field read from a key of the response body, optionally decoded into a nested model."""
+    __slots__ = ("key", "model", "name", "slot")
+
+    def __init__(self, key: Text, model: Type["Model"] = None):
+        """
+        Constructs a model field.
+
+        Args:
+            key: Key of the field in the response body.
+            model: Model to decode the field value into, None to keep the decoded JSON value.
+        """
+        self.key = key
+        self.model = model
+        self.name = None
+        self.slot = None
+
+    def __set_name__(self, owner: type, name: Text):
+        # values are stored in a private slot declared by the owner
+        self.name = name
+        self.slot = "_" + name
+
+    def __get__(self, instance: Optional["Model"], owner: type) -> Any:
+        if instance is None:
+            return self
+        return getattr(instance, self.slot)
+
+    def __set__(self, instance: "Model", value: Any):
+        setattr(instance, self.slot, value)
+
+
+class Model:
+    """Base of typed models, each declaring its fields and a private slot per field."""
+    __slots__ = ()
+
+    _fields: Tuple[Field, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._fields = tuple(value for value in vars(cls).values() if isinstance(value, Field))
+
+    def __init__(self, **fields: Any):
+        """
+        Constructs a model.
+
+        Args:
+            **fields: Field values by field name, missing fields being None.
+        """
+        for field in self._fields:
+            setattr(self, field.slot, fields.pop(field.name, None))
+        if fields:
+            raise TypeError("Unknown %s fields: %s" % (type(self).__name__, ", ".join(sorted(fields))))
+
+    @classmethod
+    def from_dict(cls, data: Dict[Text, Any]) -> "Model":
+        """
+        Builds a model from a decoded JSON object, ignoring the keys that are not fields.
+
+        Args:
+            data: Decoded JSON object.
+
+        Returns:
+            Model of the object.
+        """
+        model = cls.__new__(cls)
+        for field in cls._fields:
+            value = data.get(field.key)
+            if field.model is not None and value is not None:
+                value = field.model.from_dict(value)
+            setattr(model, field.slot, value)
+        return model
+
+    @classmethod
+    def from_bytes(cls, content: Union[bytes, Text], key: Text = None) -> "Model":
+        """
+        Builds a model from a raw response body.
+
+        Args:
+            content: Raw JSON response body.
+            key: Key of the model in the response body, None if the body is the model itself.
+
+        Returns:
+            Model of the response body.
+        """
+        decoded = _typed_decode(cls, key, False, content)
+        if decoded is not None:
+            return decoded
+        data = codec.loads(content)
+        return cls.from_dict(data[key] if key is not None else data)
+
+    @classmethod
+    def from_response(cls, response: "Response", key: Text = None) -> "Model":
+        """
+        Builds a model from an API response.
+
+        Args:
+            response: API response.
+            key: Key of the model in the response body, None if the body is the model itself.
+
+        Returns:
+            Model of the response body.
+        """
+        return cls.from_bytes(response.content, key=key)
+
+    def to_dict(self) -> Dict[Text, Any]:
+        """
+        Converts the model back to a JSON object, with the keys of the response body.
+
+        Returns:
+            Fields of the model as key-value pairs, nested models included.
+        """
+        data = {}
+        for field in self._fields:
+            value = getattr(self, field.slot)
+            data[field.key] = value.to_dict() if isinstance(value, Model) else value
+        return data
+
+    def __eq__(self, other: Any) -> bool:
+        return type(self) is type(other) and all(getattr(self, field.slot) == getattr(other, field.slot)
+                                                  for field in self._fields)
+
+    def __repr__(self) -> Text:
+        return "%s(%s)" % (type(self).__name__,
+                           ", ".join("%s=%r" % (field.name, getattr(self, field.slot)) for field in self._fields))
+
+
+class Status(Model):
+    """HTTP response status."""
+    __slots__ = ("_code", "_error", "_help")
+
+    code: int = Field("code")
+    error: Text = Field("error")
+    help: Text = Field("help")
+
+    def __init__(self, code: int = None, error: Text = None, help: Text = None, **kwargs):
+        """
+        Constructs an HTTP response status.
+
+        Args:
+            code: HTTP response status code.
+            error: Error message when response code is not 200.
+            help: Instruction on how to fix the error.
+            **kwargs: Arguments as key-value pairs.
+        """
+        super().__init__(code=code, error=error, help=help)
+
+    def is_success(self) -> bool:
+        """
+        Asserts if the status is successful.
+
+        Returns:
+            True if status code is 200, false otherwise.
+        """
+        return self.code == 200
+
+
+class PAD(Model):
+    """Pleasure, arousal and dominance scores."""
+    __slots__ = ("_pleasure", "_arousal", "_dominance")
+
+    pleasure: float = Field("pleasure")
+    arousal: float = Field("arousal")
+    dominance: float = Field("dominance")
+
+    def as_tuple(self) -> tuple:
+        """
+        Gets the scores as a tuple.
+
+        Returns:
+            (pleasure, arousal, dominance) scores.
+        """
+        return self.pleasure, self.arousal, self.dominance
+
+
+class Emotion(Model):
+    """User's emotion."""
+    __slots__ = ("_pad",)
+
+    pad: PAD = Field("pad", PAD)
+
+
+class Mood(Model):
+    """User's mood."""
+    __slots__ = ("_pad",)
+
+    pad: PAD = Field("pad", PAD)
+
+
+class Personality(Model):
+    """User's personality traits."""
+    __slots__ = ("_openness", "_conscientiousness", "_extraversion", "_agreeableness", "_neuroticism")
+
+    openness: float = Field("openness")
+    conscientiousness: float = Field("conscientiousness")
+    extraversion: float = Field("extraversion")
+    agreeableness: float = Field("agreeableness")
+    neuroticism: float = Field("neuroticism")
+
+
+class Affect(Model):
+    """User's affective state."""
+    __slots__ = ("_emotion", "_mood", "_personality")
+
+    emotion: Emotion = Field("emotion", Emotion)
+    mood: Mood = Field("mood", Mood)
+    personality: Personality = Field("personality", Personality)
+
+
+class User(Model):
+    """aEi.ai user."""
+    __slots__ = ("_user_id", "_affect")
+
+    user_id: Text = Field("userId")
+    affect: Affect = Field("affect", Affect)
+
+
+class Interaction(Model):
+    """aEi.ai interaction."""
+    __slots__ = ("_interaction_id", "_user_ids")
+
+    interaction_id: Text = Field("interactionId")
+    user_ids: List[Text] = Field("userIds")
+
+
+class ModelList:
+    """
+    Read-only sequence of models.
+
+    The raw response body is only decoded on first access, straight into models, and then released.
+    """
+    __slots__ = ("_content", "_key", "_items", "_model")
+
+    def __init__(self, items: List[Model], model: Type[Model]):
+        """
+        Constructs a model list.
+
+        Args:
+            items: Models of the list.
+            model: Model of the items.
+        """
+        self._content = None
+        self._key = None
+        self._items = items
+        self._model = model
+
+    @classmethod
+    def from_bytes(cls, content: Union[bytes, Text], key: Text, model: Type[Model]) -> "ModelList":
+        """
+        Builds a model list from a raw response body, without decoding it yet.
+
+        Args:
+            content: Raw JSON response body.
+            key: Key of the list in the response body, for example, users.
+            model: Model to decode each item into.
+
+        Returns:
+            Model list of the response body.
+        """
+        models = cls(None, model)
+        models._content = content
+        models._key = key
+        return models
+
+    @classmethod
+    def from_response(cls, response: "Response", key: Text, model: Type[Model]) -> "ModelList":
+        """
+        Builds a model list from an API response, without decoding it yet.
+
+        Args:
+            response: API response.
+            key: Key of the list in the response body, for example, users.
+            model: Model to decode each item into.
+
+        Returns:
+            Model list of the response body.
+        """
+        return cls.from_bytes(response.content, key=key, model=model)
+
+    def _get_items(self) -> List[Model]:
+        if self._items is None:
+            items = _typed_decode(self._model, self._key, True, self._content)
+            if items is None:
+                from_dict = self._model.from_dict
+                items = [from_dict(item) for item in codec.loads(self._content)[self._key]]
+            self._items = items
+            # the raw body is not needed anymore once decoded
+            self._content = None
+        return self._items
+
+    def __len__(self) -> int:
+        return len(self._get_items())
+
+    def __getitem__(self, index: int) -> Model:
+        return self._get_items()[index]
+
+    def __iter__(self) -> Iterator[Model]:
+        return iter(self._get_items())
+
+
+# typed decoders and struct converters by model, key and whether the body holds a list, False if msgspec is not
+# installed
+_decoders: Dict[Tuple[Type[Model], Optional[Text], bool], Any] = {}
+_decoders_lock = Lock()
+
+
+def _typed_decode(model: Type[Model], key: Optional[Text], many: bool, content: Union[bytes, Text]) -> Any:
+    """
+    Decodes a response body straight into models with msgspec.
+
+    Args:
+        model: Model of the body, or of its items.
+        key: Key of the model, or of the list, in the body, None if the body is the model itself.
+        many: True if the body holds a list of models.
+        content: Raw JSON response body.
+
+    Returns:
+        Model, or list of models, None if msgspec is not installed or the body does not have the declared types.
+
+    Raises:
+        ValueError: If the body is not valid JSON.
+    """
+    decoder = _decoders.get((model, key, many))
+    if decoder is None:
+        with _decoders_lock:
+            decoder = _decoders.get((model, key, many))
+            if decoder is None:
+                decoder = _decoders[(model, key, many)] = _build_decoder(model, key, many)
+    if decoder is False:
+        return None
+
+    import msgspec
+    decoder, convert = decoder
+    try:
+        decoded = decoder.decode(content)
+    except msgspec.ValidationError:
+        # values of unexpected types are left to the lenient dict path
+        return None
+    except msgspec.DecodeError as e:
+        raise ValueError(str(e)) from e
+    if key is not None:
+        decoded = decoded.value
+    if many:
+        return [convert(struct) for struct in decoded]
+    return convert(decoded)
+
+
+def _build_decoder(model: Type[Model], key: Optional[Text], many: bool) -> Any:
+    try:
+        import msgspec
+    except ImportError:
+        return False
+    decoded = List[_struct(model)] if many else _struct(model)
+    if key is not None:
+        decoded = msgspec.defstruct(model.__name__ + "Body", [("value", decoded)], rename={"value": key})
+    return msgspec.json.Decoder(decoded), _converter(model)
+
+
+def _struct(model: Type[Model]) -> type:
+    """Builds the msgspec struct mirroring a model, with its fields named and typed as declared."""
+    import msgspec
+    fields = []
+    for field in model._fields:
+        field_type = _struct(field.model) if field.model is not None else model.__annotations__.get(field.name, Any)
+        fields.append((field.name, Optional[field_type], None))
+    return msgspec.defstruct(model.__name__ + "Struct", fields,
+                             rename={field.name: field.key for field in model._fields})
+
+
+def _converter(model: Type[Model]) -> Callable[[Any], Model]:
+    """
+    Generates the function copying a struct mirroring a model into a new model, nested structs included.
+
+    The function is generated, as dataclass methods are, because looping over the fields of every record would cost
+    more than decoding the body.
+    """
+    namespace = {"new": object.__new__, "model": model}
+    lines = ["def convert(struct):", "    instance = new(model)"]
+    for field in model._fields:
+        if field.model is None:
+            lines.append("    instance.%s = struct.%s" % (field.slot, field.name))
+        else:
+            namespace["convert_" + field.name] = _converter(field.model)
+            lines.append("    value = struct.%s" % field.name)
+            lines.append("    instance.%s = None if value is None else convert_%s(value)" % (field.slot, field.name))
+    lines.append("    return instance")
+    exec("\n".join(lines), namespace)
+    return namespace["convert"]
@@ -0,0 +1,489 @@
+"""
+Durable disk-backed outbox of aEi.ai write calls.
+
+Write calls are appended to a log and return at once, while background drainers replay them to the service.
+The log is a JSONL file starting with a header line, followed by one line per queued call:
+
+    {"log": "<log ID>", "seq": <first sequence number>}
+    {"seq": 0, "kind": "input", "interaction": "<interaction ID>", "input": {...}}
+    {"seq": 1, "kind": "join", "interaction": "<interaction ID>", "users": ["<user ID>", ...]}
+
+Sequence numbers of the calls acknowledged by the service are appended to a second file, the log path suffixed by
+.acks, and the log is rewritten without them once enough calls were acknowledged. Lines torn by a crash are
+dropped when the outbox is opened again.
+"""
+
+import hashlib
+import logging
+import os
+import uuid
+from collections import OrderedDict, deque
+from threading import Condition, Event, Lock, Thread
+from time import monotonic
+from typing import Any, Callable, Deque, Dict, List, Optional, Text, Union
+
+from requests.models import Response
+
+from api import codec
+from api.aei_ai import AeiClient, image_input, text_input
+from api.resilience import CircuitOpenError
+from api.sharding import stable_shard
+from api.tokens import TokenProvider
+from api.uploads import ImageBody, ImageSource, is_image_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_SYNC_INTERVAL = 0.05
+DEFAULT_COMPACT_THRESHOLD = 10000
+DEFAULT_MAX_BACKOFF = 30.0
+DEFAULT_EXIT_TIMEOUT = 10.0
+RETRY_STATUSES = frozenset([401, 408, 429, 500, 502, 503, 504])
+
+Entry = Dict[Text, Any]
+
+
+class OutboxError(Exception):
+    """Error raised when the outbox cannot accept calls."""
+
+
+class Outbox:
+    """
+    Queues write calls in a durable log and replays them in the background, so that callers never wait for
+    the service.
+
+    Text and image inputs are replayed through the multi-input endpoint in batches. Calls are routed to drainers by
+    interaction ID, and every drainer replays its calls in log order, so the order of inputs and user additions
+    within each interaction is preserved. Failed calls are retried with exponential backoff, holding back the later
+    calls of their drainer, while calls rejected by the service, or failing other than by a transport error, are
+    reported to on_error and dropped.
+
+    Appended calls reach the operating system at once, so they survive the process crashing, and are synced to
+    disk in groups every sync_interval seconds, bounding what a power loss can lose.
+    """
+    def __init__(self, path: Text, tokens: TokenProvider, client: AeiClient = None, workers: int = DEFAULT_WORKERS,
+                 batch_size: int = DEFAULT_BATCH_SIZE, sync_interval: float = DEFAULT_SYNC_INTERVAL,
+                 compact_threshold: int = DEFAULT_COMPACT_THRESHOLD, max_backoff: float = DEFAULT_MAX_BACKOFF,
+                 exit_timeout: float = DEFAULT_EXIT_TIMEOUT,
+                 on_error: Callable[[List[Entry], Union[Response, Exception]], None] = None):
+        """
+        Opens an outbox, recovering the calls left unacknowledged in its log.
+
+        Args:
+            path: Path of the log, created if it does not exist.
+            tokens: Provider of the client's access token.
+            client: aEi.ai API client to replay calls through, a client with a connection per drainer if not given.
+            workers: Number of drainer threads.
+            batch_size: Maximum number of inputs replayed in one call.
+            sync_interval: Maximum number of seconds between syncs of the log to disk, 0 to sync every call.
+            compact_threshold: Number of acknowledged calls above which the log is rewritten without them.
+            max_backoff: Maximum number of seconds between retries of a failed call.
+            exit_timeout: Maximum number of seconds leaving a with block waits for queued calls to be replayed,
+                calls left being replayed when the log is opened again.
+            on_error: Function called with the queued calls rejected by the service, or failing other than by
+                a transport error, and the response or exception rejecting them, None to drop them silently.
+        """
+        self.path = path
+        self.tokens = tokens
+        self.client = client if client is not None else AeiClient(pool_maxsize=workers)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.sync_interval = sync_interval
+        self.compact_threshold = compact_threshold
+        self.max_backoff = max_backoff
+        self.exit_timeout = exit_timeout
+        self.on_error = on_error
+
+        self._log_lock = Lock()
+        self._condition = Condition()
+        self._queues: List[Deque[Entry]] = [deque() for _ in range(workers)]
+        self._busy = [False] * workers
+        self._pending: "OrderedDict[int, bytes]" = OrderedDict()
+        self._acked = 0
+        self._dirty = False
+        self._closing = Event()
+        self._threads: List[Thread] = []
+        self.stats = {"queued": 0, "sent": 0, "rejected": 0, "retries": 0, "compactions": 0}
+
+        self._recover()
+        for entry in self._entries():
+            self._queues[stable_shard(entry["interaction"], workers)].append(entry)
+
+    # write calls
+
+    def send_text(self, user_id: Text, interaction_id: Text, text: Text) -> int:
+        """
+        Queues a text input of a user to an interaction.
+
+        Args:
+            user_id: Source user ID.
+            interaction_id: Target interaction ID.
+            text: User's utterance.
+
+        Returns:
+            Sequence number of the queued call.
+        """
+        return self._append([_input_entry(text_input(user_id=user_id, interaction_id=interaction_id, text=text))])[0]
+
+    def send_image(self, user_id: Text, interaction_id: Text, image: ImageSource) -> int:
+        """
+        Queues an image input of a user to an interaction.
+
+        Images not given by URL are read and queued as base64 data URLs, so that they can be replayed after the
+        source is gone.
+
+        Args:
+            user_id: Source user ID.
+            interaction_id: Target interaction ID.
+            image: User's input image URL, file path, bytes, memoryview or binary file-like object.
+
+        Returns:
+            Sequence number of the queued call.
+        """
+        return self._append([_input_entry(image_input(user_id=user_id, interaction_id=interaction_id,
+                                                      image=image))])[0]
+
+    def send_inputs(self, inputs: Union[Text, List[Dict[Text, Any]]]) -> List[int]:
+        """
+        Queues multiple inputs, each queued and replayed in order with the other calls of its interaction.
+
+        Args:
+            inputs: Inputs as JSON string, or input entries built by text_input or image_input, whose images not
+                given by URL are read and queued as base64 data URLs.
+
+        Returns:
+            Sequence numbers of the queued inputs.
+
+        Raises:
+            ValueError: If inputs are not in the expected format.
+        """
+        try:
+            entries = inputs if isinstance(inputs, list) else codec.loads(inputs)["inputs"]
+            entries = [_input_entry(entry) for entry in entries]
+        except (TypeError, KeyError) as e:
+            raise ValueError("Inputs must be a list of input entries.") from e
+        return self._append(entries)
+
+    def add_users_to_interaction(self, interaction_id: Text, user_ids: List[Text]) -> int:
+        """
+        Queues adding users to an interaction, replayed before the inputs of the interaction queued after it.
+
+        Args:
+            interaction_id: Given interaction ID.
+            user_ids: IDs of the users to add.
+
+        Returns:
+            Sequence number of the queued call.
+        """
+        return self._append([{"kind": "join", "interaction": interaction_id, "users": list(user_ids)}])[0]
+
+    # lifecycle
+
+    def start(self) -> "Outbox":
+        """
+        Starts the drainers, and the thread syncing the log to disk.
+
+        Returns:
+            The started outbox.
+        """
+        self._closing.clear()
+        self._threads = [Thread(target=self._drain, args=(i,), name="aei-outbox-%d" % i, daemon=True)
+                         for i in range(self.workers)]
+        if self.sync_interval > 0:
+            self._threads.append(Thread(target=self._sync_loop, name="aei-outbox-sync", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Waits until every queued call was replayed.
+
+        Args:
+            timeout: Maximum number of seconds to wait, None to wait as long as it takes.
+
+        Returns:
+            True if no call is left, false if the timeout expired first.
+        """
+        deadline = monotonic() + timeout if timeout is not None else None
+        with self._condition:
+            while any(self._queues) or any(self._busy):
+                remaining = deadline - monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def close(self, drain: bool = True, timeout: float = None):
+        """
+        Stops the drainers and closes the log, calls left unreplayed being replayed when the log is opened again.
+
+        Args:
+            drain: True to replay queued calls first.
+            timeout: Maximum number of seconds to wait for queued calls to be replayed, None for no limit.
+        """
+        if drain and self._threads:
+            self.flush(timeout)
+        with self._condition:
+            self._closing.set()
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        with self._log_lock:
+            self._sync()
+            if self._acked:
+                self._compact()
+            self._log.close()
+            self._acks.close()
+
+    def __enter__(self) -> "Outbox":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # the log is durable, so a service that is down does not hold the caller back
+        self.close(timeout=self.exit_timeout)
+
+    def __len__(self) -> int:
+        with self._log_lock:
+            return len(self._pending)
+
+    # log
+
+    def _recover(self):
+        """Opens the log and its acknowledgements, dropping torn lines and acknowledged calls."""
+        header, max_seq = None, -1
+        self._pending.clear()
+        self._acked = 0
+        for raw in _read_lines(self.path):
+            record = codec.loads(raw)
+            if "log" in record:
+                header = record
+                continue
+            self._pending[record["seq"]] = raw
+            max_seq = max(max_seq, record["seq"])
+        for raw in _read_lines(self.path + ".acks"):
+            for seq in raw.split():
+                self._acked += self._pending.pop(int(seq), None) is not None
+                max_seq = max(max_seq, int(seq))
+
+        self._log = open(self.path, "ab")
+        self._acks = open(self.path + ".acks", "ab")
+        if header is None:
+            # a new log, or one whose header was torn, in which case nothing follows it
+            self._log.truncate(0)
+            header = {"log": uuid.uuid4().hex, "seq": max_seq + 1}
+            self._log.write(codec.dumps_bytes(header) + b"\n")
+            self._log.flush()
+            os.fsync(self._log.fileno())
+        self._log_id = header["log"]
+        self._next_seq = max(max_seq + 1, header["seq"])
+
+    def _entries(self) -> List[Entry]:
+        return [codec.loads(raw) for raw in self._pending.values()]
+
+    def _append(self, entries: List[Entry]) -> List[int]:
+        """Appends calls to the log and queues them for their drainers."""
+        with self._log_lock:
+            if self._log.closed:
+                raise OutboxError("The outbox is closed.")
+            # serialized before any state changes, so that an entry failing to encode leaves nothing behind
+            seqs = list(range(self._next_seq, self._next_seq + len(entries)))
+            lines = [codec.dumps_bytes(dict(entry, seq=seq)) + b"\n" for entry, seq in zip(entries, seqs)]
+            self._log.write(b"".join(lines))
+            for entry, seq, raw in zip(entries, seqs, lines):
+                entry["seq"] = seq
+                self._pending[seq] = raw
+            self._next_seq += len(entries)
+            # handed to the operating system now, synced to disk with the next group
+            self._log.flush()
+            self._dirty = True
+            if self.sync_interval <= 0:
+                self._sync()
+
+        with self._condition:
+            for entry in entries:
+                self._queues[stable_shard(entry["interaction"], self.workers)].append(entry)
+            self.stats["queued"] += len(entries)
+            self._condition.notify_all()
+        return seqs
+
+    def _acknowledge(self, seqs: List[int]):
+        """Records replayed calls, compacting the log once enough of them were acknowledged."""
+        with self._log_lock:
+            self._acks.write((" ".join(str(seq) for seq in seqs) + "\n").encode("ascii"))
+            self._acks.flush()
+            self._dirty = True
+            for seq in seqs:
+                self._acked += self._pending.pop(seq, None) is not None
+            if self._acked >= self.compact_threshold and self._acked >= len(self._pending):
+                self._compact()
+            elif self.sync_interval <= 0:
+                self._sync()
+
+    def _sync(self):
+        """Syncs the log and its acknowledgements to disk, must be called while holding the log lock."""
+        if not self._dirty:
+            return
+        os.fsync(self._log.fileno())
+        os.fsync(self._acks.fileno())
+        self._dirty = False
+
+    def _sync_loop(self):
+        while not self._closing.wait(self.sync_interval):
+            with self._log_lock:
+                self._sync()
+
+    def _compact(self):
+        """Rewrites the log with unacknowledged calls only, must be called while holding the log lock."""
+        self._sync()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(codec.dumps_bytes({"log": self._log_id, "seq": self._next_seq}) + b"\n")
+            f.writelines(self._pending.values())
+            f.flush()
+            os.fsync(f.fileno())
+        # replace atomically, acknowledgements of calls no longer in the log being harmless until truncated
+        os.replace(tmp_path, self.path)
+        self._log.close()
+        self._log = open(self.path, "ab")
+        self._acks.truncate(0)
+        os.fsync(self._acks.fileno())
+        self._acked = 0
+        self.stats["compactions"] += 1
+
+    # drainers
+
+    def _drain(self, shard: int):
+        queue = self._queues[shard]
+        backoff = 0.0
+        batch, key = None, None
+        while True:
+            with self._condition:
+                while not queue and not self._closing.is_set():
+                    self._condition.wait()
+                if self._closing.is_set():
+                    return
+                if batch is None:
+                    # a batch is frozen until acknowledged, so that its retries carry the same calls and key
+                    batch = _next_batch(queue, self.batch_size)
+                    key = hashlib.sha1((self._log_id + ":" + ",".join(str(entry["seq"]) for entry in batch))
+                                       .encode("utf-8")).hexdigest()
+                self._busy[shard] = True
+
+            try:
+                response = self._replay(batch, key)
+                retry = response is not None
+            except (OSError, CircuitOpenError):
+                # transport errors, requests exceptions included, and an open circuit are transient
+                retry = True
+            except Exception as e:
+                # errors such as an invalid response body would fail every retry
+                self._reject(batch, e)
+                retry = False
+            with self._condition:
+                self._busy[shard] = False
+                self.stats["retries"] += retry
+                self._condition.notify_all()
+            if retry:
+                # the batch stays at the head of the queue, holding back the later calls of its interactions
+                backoff = min(self.max_backoff, backoff * 2 if backoff else 0.1)
+                if self._closing.wait(backoff):
+                    return
+                continue
+            backoff = 0.0
+
+            with self._condition:
+                for _ in batch:
+                    queue.popleft()
+                self.stats["sent"] += len(batch)
+                self._condition.notify_all()
+            self._acknowledge([entry["seq"] for entry in batch])
+            batch, key = None, None
+
+    def _replay(self, batch: List[Entry], key: Text) -> Optional[Response]:
+        """
+        Replays a batch of queued calls.
+
+        Args:
+            batch: Either inputs, or one user addition.
+            key: Idempotency key of the batch, the same for every attempt.
+
+        Returns:
+            Response to retry the batch for, None if the batch is done with.
+        """
+        if batch[0]["kind"] == "join":
+            entry = batch[0]
+            response = self.tokens.call(self.client.add_users_to_interaction, interaction_id=entry["interaction"],
+                                        user_ids=entry["users"])
+            if response.status_code in RETRY_STATUSES:
+                return response
+            if response.status_code >= 400:
+                self._reject(batch, response)
+            return None
+
+        response = self.tokens.call(self.client.send_inputs, inputs=[entry["input"] for entry in batch],
+                                    idempotency_key=key)
+        if response.status_code in RETRY_STATUSES:
+            return response
+        if response.status_code >= 400:
+            self._reject(batch, response)
+            return None
+
+        results = codec.response_json(response).get("inputs")
+        if isinstance(results, list):
+            rejected = [entry for entry, result in zip(batch, results)
+                        if isinstance(result, dict) and result.get("status", {}).get("code", 200) >= 400]
+            if rejected:
+                self._reject(rejected, response)
+        return None
+
+    def _reject(self, entries: List[Entry], outcome: Union[Response, Exception]):
+        with self._condition:
+            self.stats["rejected"] += len(entries)
+        if self.on_error is not None:
+            try:
+                self.on_error(entries, outcome)
+            except Exception:
+                # a failing callback must not stop the drainer, the calls being dropped anyway
+                logger.exception("Reporting rejected outbox calls failed.")
+
+
+def _input_entry(entry: Dict[Text, Any]) -> Entry:
+    """Wraps an input entry into a queued call, images not given by URL being read into base64 data URLs."""
+    image = entry.get("image")
+    if image is not None and not is_image_url(image):
+        body = ImageBody(image)
+        entry = dict(entry, image="data:%s;base64,%s" % (body.content_type,
+                                                          b"".join(body.iter_base64()).decode("ascii")))
+    return {"kind": "input", "interaction": entry["interactionId"], "input": entry}
+
+
+def _next_batch(queue: Deque[Entry], batch_size: int) -> List[Entry]:
+    """Takes the leading inputs of a queue up to a user addition, or the leading user addition."""
+    if queue[0]["kind"] == "join":
+        return [queue[0]]
+    batch = []
+    for entry in queue:
+        if entry["kind"] != "input" or len(batch) >= batch_size:
+            break
+        batch.append(entry)
+    return batch
+
+
+def _read_lines(path: Text) -> List[bytes]:
+    """Reads the complete lines of a file, truncating a line torn by a crash."""
+    if not os.path.exists(path):
+        return []
+    lines, valid = [], 0
+    with open(path, "rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            lines.append(raw)
+            valid += len(raw)
+    if valid != os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(valid)
+    return lines
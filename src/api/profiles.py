@@ -0,0 +1,146 @@
+"""
+Concurrent retrieval of complete aEi.ai user profiles.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Text, Tuple, Union
+
+from requests.models import Response
+
+from api import codec
+from api.aei_ai import DEFAULT_MAX_URL_LENGTH, AeiClient, default_client, split_targets
+
+FACETS = ("user", "emotion", "mood", "personality", "satisfaction", "social_perception", "empathy")
+
+
+class UserProfile:
+    """Complete view of an aEi.ai user, one decoded response per requested facet."""
+    __slots__ = ("user_id", "user", "emotion", "mood", "personality", "satisfaction", "social_perception",
+                 "empathy", "errors")
+
+    def __init__(self, user_id: Text):
+        """
+        Constructs an empty user profile.
+
+        Args:
+            user_id: Given user ID.
+        """
+        self.user_id = user_id
+        self.user: Dict[Text, Any] = None
+        self.emotion: Dict[Text, Any] = None
+        self.mood: Dict[Text, Any] = None
+        self.personality: Dict[Text, Any] = None
+        self.satisfaction: Dict[Text, Any] = None
+        self.social_perception: Dict[Text, Any] = None
+        self.empathy: Dict[Text, Any] = None
+        self.errors: Dict[Text, Union[Response, Exception]] = {}
+
+    def is_complete(self) -> bool:
+        """
+        Asserts if all requested facets were retrieved.
+
+        Returns:
+            True if no facet request failed, false otherwise.
+        """
+        return not self.errors
+
+    def __repr__(self) -> Text:
+        facets = [facet for facet in FACETS if getattr(self, facet) is not None]
+        return "UserProfile(user_id=%r, facets=%r, errors=%r)" % (self.user_id, facets, list(self.errors))
+
+
+def get_user_profiles(user_ids: List[Text], access_token: Text, facets: Iterable[Text] = FACETS,
+                      empathy_targets: List[Text] = None, client: AeiClient = None, max_workers: int = None,
+                      max_url_length: int = DEFAULT_MAX_URL_LENGTH) -> List[UserProfile]:
+    """
+    Gets profiles of given users, requesting all facets of all users concurrently.
+
+    Args:
+        user_ids: Given user IDs.
+        access_token: Client's access token.
+        facets: Facets to retrieve, any of user, emotion, mood, personality, satisfaction, social_perception
+            and empathy.
+        empathy_targets: Target user IDs of the empathy facet, the other given users if not given.
+        client: aEi.ai API client to call, the default client if not given.
+        max_workers: Maximum number of requests in flight, the client's connection pool size if not given.
+        max_url_length: Maximum length of empathy request URLs, target lists being split over several requests
+            to fit.
+
+    Returns:
+        Profiles of given users, in the same order as user IDs.
+    """
+    client = client if client is not None else default_client()
+    facets = list(facets)
+    for facet in facets:
+        if facet not in FACETS:
+            raise ValueError("Unknown user profile facet: " + facet)
+    max_workers = max_workers if max_workers is not None else client.pool_maxsize
+
+    profiles = [UserProfile(user_id) for user_id in user_ids]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+        for profile in profiles:
+            for facet in facets:
+                future = executor.submit(_get_facet, client, profile.user_id, facet, access_token,
+                                         user_ids, empathy_targets, max_url_length)
+                futures.append((profile, facet, future))
+
+        for profile, facet, future in futures:
+            try:
+                body, failed = future.result()
+            except Exception as e:
+                profile.errors[facet] = e
+                continue
+            if failed is not None:
+                profile.errors[facet] = failed
+                continue
+            setattr(profile, facet, body)
+    return profiles
+
+
+def _get_facet(client: AeiClient, user_id: Text, facet: Text, access_token: Text, user_ids: List[Text],
+               empathy_targets: List[Text], max_url_length: int) -> Tuple[Any, Optional[Response]]:
+    """
+    Gets one facet of a user.
+
+    Args:
+        client: aEi.ai API client to call.
+        user_id: Given user ID.
+        facet: Facet to retrieve.
+        access_token: Client's access token.
+        user_ids: All user IDs whose profiles are requested.
+        empathy_targets: Target user IDs of the empathy facet, None for the other requested users.
+        max_url_length: Maximum length of empathy request URLs.
+
+    Returns:
+        Decoded response body, and the response of the failed request, None if none failed.
+
+    Raises:
+        ValueError: If a response body is not valid JSON.
+    """
+    if facet == "user":
+        return _decode(client.get_user(user_id=user_id, access_token=access_token))
+    if facet != "empathy":
+        return _decode(getattr(client, "get_user_" + facet)(user_id=user_id, access_token=access_token))
+
+    targets = empathy_targets if empathy_targets is not None else [u for u in user_ids if u != user_id]
+    base_length = len(client.api_url + "/users/" + user_id + "/empathy")
+    body = None
+    # the scores of every target list are merged into the body of the first one
+    for chunk in split_targets(targets, base_length, max_url_length) or [[]]:
+        part, failed = _decode(client.get_user_empathy(user_id=user_id, target_user_ids=chunk,
+                                                       access_token=access_token))
+        if failed is not None:
+            return None, failed
+        if body is None:
+            body = part
+        elif isinstance(body, dict) and isinstance(body.get("empathy"), dict) and isinstance(part, dict) \
+                and isinstance(part.get("empathy"), dict):
+            body["empathy"].update(part["empathy"])
+    return body, None
+
+
+def _decode(response: Response) -> Tuple[Any, Optional[Response]]:
+    if response.status_code != 200:
+        return None, response
+    return codec.response_json(response), None
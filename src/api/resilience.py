@@ -0,0 +1,384 @@
+"""
+Rate limiting, retries and circuit breaking for aEi.ai API calls.
+"""
+
+import asyncio
+import random
+from email.utils import parsedate_to_datetime
+from threading import Lock
+from time import monotonic, sleep, time
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Optional, Text, Tuple, Type
+
+from requests.exceptions import ConnectionError, RequestException, Timeout
+from requests.models import Response
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "PUT", "DELETE"])
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the aEi.ai service while it is considered unhealthy."""
+    def __init__(self, retry_in: float):
+        """
+        Constructs a circuit-open error.
+
+        Args:
+            retry_in: Number of seconds until the service is tried again.
+        """
+        super().__init__("aEi.ai service is unhealthy, calls are rejected for the next %.1f seconds." % retry_in)
+        self.retry_in = retry_in
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the rate of requests sent to the service."""
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        Constructs a token bucket, initially full.
+
+        Args:
+            rate: Number of requests allowed per second, for example, sized to the client's subscription.
+            capacity: Maximum burst of requests, equal to the rate if not given.
+
+        Raises:
+            ValueError: If the rate or the capacity is not positive.
+        """
+        if rate <= 0:
+            raise ValueError("Rate must be positive, not %r." % rate)
+        if capacity is not None and capacity <= 0:
+            raise ValueError("Capacity must be positive, not %r." % capacity)
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = monotonic()
+        self._lock = Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """
+        Takes given number of tokens, waiting until they are available.
+
+        Args:
+            tokens: Number of tokens to take.
+        """
+        while True:
+            wait = self._take(tokens)
+            if wait == 0.0:
+                return
+            sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0):
+        """
+        Takes given number of tokens, waiting without blocking the event loop until they are available.
+
+        Args:
+            tokens: Number of tokens to take.
+        """
+        while True:
+            wait = self._take(tokens)
+            if wait == 0.0:
+                return
+            await asyncio.sleep(wait)
+
+    def _take(self, tokens: float) -> float:
+        """Takes given number of tokens if available, returning 0, else the number of seconds until they are."""
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker.
+
+    After a number of consecutive failures the circuit opens and calls fail fast. Once the reset timeout
+    has passed, a single trial call is let through: its success closes the circuit, its failure opens it again.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Constructs a closed circuit breaker.
+
+        Args:
+            failure_threshold: Number of consecutive failures that opens the circuit.
+            reset_timeout: Number of seconds the circuit stays open before a trial call.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """True if calls are currently rejected."""
+        with self._lock:
+            return self._opened_at is not None and monotonic() - self._opened_at < self.reset_timeout
+
+    def before_call(self):
+        """
+        Asserts that a call may be made, reserving the trial call when the reset timeout has passed.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return
+            elapsed = monotonic() - self._opened_at
+            if elapsed < self.reset_timeout:
+                raise CircuitOpenError(self.reset_timeout - elapsed)
+            if self._trial_in_flight:
+                raise CircuitOpenError(0.0)
+            self._trial_in_flight = True
+
+    def record_success(self):
+        """Records a successful call, closing the circuit."""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_aborted(self):
+        """Records a call that failed before getting an answer, for reasons unrelated to the service."""
+        with self._lock:
+            # the trial call is left to the next call
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Records a failed call, opening the circuit when the threshold is reached or the trial call failed."""
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = monotonic()
+            self._trial_in_flight = False
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, honouring Retry-After, for idempotent requests only."""
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.2, max_delay: float = 20.0,
+                 retry_statuses: FrozenSet[int] = RETRY_STATUSES,
+                 idempotent_methods: FrozenSet[Text] = IDEMPOTENT_METHODS):
+        """
+        Constructs a retry policy.
+
+        Args:
+            max_retries: Maximum number of retries of one call.
+            base_delay: Delay in seconds before the first retry, doubled on every further retry.
+            max_delay: Maximum delay in seconds before any retry; a response asking to wait longer through
+                Retry-After is returned rather than retried early.
+            retry_statuses: HTTP response status codes to retry.
+            idempotent_methods: HTTP methods safe to retry; other requests are retried only if they
+                carry an idempotency key.
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = retry_statuses
+        self.idempotent_methods = idempotent_methods
+
+    def is_retryable(self, method: Text, headers: Optional[Dict[Text, Text]]) -> bool:
+        """
+        Asserts if a request may be sent more than once.
+
+        Args:
+            method: HTTP method.
+            headers: Request headers.
+
+        Returns:
+            True if the request is idempotent or carries an idempotency key, false otherwise.
+        """
+        return method in self.idempotent_methods or bool(headers and headers.get(IDEMPOTENCY_KEY_HEADER))
+
+    def delay(self, attempt: int, response: Response = None) -> Optional[float]:
+        """
+        Computes the delay before given retry.
+
+        Args:
+            attempt: Number of the failed attempt, starting from 0.
+            response: Response of the failed attempt, None if it raised.
+
+        Returns:
+            Number of seconds to wait, None if the response asks to wait longer than the maximum delay, in which
+            case the request must not be retried.
+        """
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        retry_after = retry_after_seconds(response) if response is not None else None
+        if retry_after is not None:
+            # retrying before the service asks to would only prolong its throttling
+            if retry_after > self.max_delay:
+                return None
+            return max(retry_after, backoff)
+        return backoff
+
+
+class Resilience:
+    """Resilience layer every request of a client goes through, each part being optional."""
+    def __init__(self, rate_limiter: TokenBucket = None, retry_policy: RetryPolicy = None,
+                 circuit_breaker: CircuitBreaker = None):
+        """
+        Constructs a resilience layer.
+
+        Args:
+            rate_limiter: Client-side rate limiter, None for no limit.
+            retry_policy: Retry policy, None to never retry.
+            circuit_breaker: Circuit breaker, None to always call the service.
+        """
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+
+    def execute(self, method: Text, endpoint: Text, headers: Optional[Dict[Text, Text]],
+                send: Callable[[], Response], on_retry: Callable[[Text, int], None] = None) -> Response:
+        """
+        Sends a request, applying rate limiting, retries and circuit breaking.
+
+        Args:
+            method: HTTP method.
+            endpoint: Name of the called API endpoint.
+            headers: Request headers.
+            send: Function sending the request once.
+            on_retry: Function called with the endpoint name and the retry number before each retry, None for none.
+
+        Returns:
+            Response to the last attempt.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+        """
+        policy = self.retry_policy
+        retryable = policy is not None and policy.is_retryable(method, headers)
+        attempt = 0
+        while True:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before_call()
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            try:
+                response = send()
+            except (ConnectionError, Timeout):
+                self._record(failed=True)
+                if not retryable or attempt >= policy.max_retries:
+                    raise
+                delay = policy.delay(attempt)
+            except RequestException:
+                self._record(failed=True)
+                raise
+            except BaseException:
+                # errors of the caller, such as a bad argument, say nothing of the service's health
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record_aborted()
+                raise
+            else:
+                # a throttled service is still a healthy one
+                self._record(failed=response.status_code >= 500)
+                if not retryable or attempt >= policy.max_retries or response.status_code not in policy.retry_statuses:
+                    return response
+                delay = policy.delay(attempt, response)
+                if delay is None:
+                    return response
+                response.close()
+
+            sleep(delay)
+            attempt += 1
+            if on_retry is not None:
+                on_retry(endpoint, attempt)
+
+    async def execute_async(self, method: Text, endpoint: Text, headers: Optional[Dict[Text, Text]],
+                            send: Callable[[], Awaitable[Any]],
+                            transient_errors: Tuple[Type[BaseException], ...] = (ConnectionError, Timeout),
+                            request_errors: Tuple[Type[BaseException], ...] = (RequestException,),
+                            on_retry: Callable[[Text, int], None] = None) -> Any:
+        """
+        Sends a request from a coroutine, applying rate limiting, retries and circuit breaking without blocking the
+        event loop.
+
+        Args:
+            method: HTTP method.
+            endpoint: Name of the called API endpoint.
+            headers: Request headers.
+            send: Coroutine function sending the request once, whose response has status_code and headers.
+            transient_errors: Errors of the HTTP client raised when the request may not have reached the service,
+                retried like failed responses.
+            request_errors: Other errors of the HTTP client, counted as failures but never retried.
+            on_retry: Function called with the endpoint name and the retry number before each retry, None for none.
+
+        Returns:
+            Response to the last attempt.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+        """
+        policy = self.retry_policy
+        retryable = policy is not None and policy.is_retryable(method, headers)
+        attempt = 0
+        while True:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.before_call()
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async()
+
+            try:
+                response = await send()
+            except transient_errors:
+                self._record(failed=True)
+                if not retryable or attempt >= policy.max_retries:
+                    raise
+                delay = policy.delay(attempt)
+            except request_errors:
+                self._record(failed=True)
+                raise
+            except BaseException:
+                # errors of the caller and cancellations say nothing of the service's health
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record_aborted()
+                raise
+            else:
+                # a throttled service is still a healthy one
+                self._record(failed=response.status_code >= 500)
+                if not retryable or attempt >= policy.max_retries or response.status_code not in policy.retry_statuses:
+                    return response
+                delay = policy.delay(attempt, response)
+                if delay is None:
+                    return response
+
+            await asyncio.sleep(delay)
+            attempt += 1
+            if on_retry is not None:
+                on_retry(endpoint, attempt)
+
+    def _record(self, failed: bool):
+        if self.circuit_breaker is None:
+            return
+        if failed:
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
+
+
+def retry_after_seconds(response: Response) -> Optional[float]:
+    """
+    Reads the Retry-After header of a response.
+
+    Args:
+        response: HTTP response.
+
+    Returns:
+        Number of seconds to wait, None if the header is missing or invalid.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError):
+        return None
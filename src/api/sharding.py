@@ -0,0 +1,421 @@
+"""
+Multi-process execution of large aEi.ai workloads.
+
+JSON encoding of request bodies and decoding of responses hold the GIL, so a single process saturates one
+core however many threads it runs. The sharded executor spreads that work over worker processes, each with
+its own pooled client and threads, and exchanges compact binary messages with them.
+"""
+
+import hashlib
+import marshal
+import os
+import shutil
+import tempfile
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.connection import Connection, wait
+from threading import Lock
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Text, Tuple
+
+from api import codec
+from api.aei_ai import AEI_AI_URL, AeiClient, auth_headers, image_input, params_2_string, text_input
+from api.affect import PAD_KEYS, PERSONALITY_KEYS, as_dict, pad_scores, personality_scores
+from api.tokens import TokenProvider
+
+DEFAULT_THREADS = 4
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_PAGE_SIZE = 1000
+# tasks queued per worker beyond the one it is running, which keeps workers busy while bounding memory
+MAX_QUEUED_TASKS = 1
+
+# emotion PAD, mood PAD and personality traits of a user
+AFFECT_WIDTH = 2 * len(PAD_KEYS) + len(PERSONALITY_KEYS)
+
+
+class ShardError(Exception):
+    """Raised when a worker process fails to run its part of a workload."""
+
+
+class ShardedExecutor:
+    """
+    Pool of worker processes running aEi.ai workloads.
+
+    Inputs are sharded by interaction ID, so that all inputs of an interaction are sent by the same worker,
+    in order. Workers share the access token through a token file, so only the first of them logs in.
+
+    Example:
+        with ShardedExecutor(username, password) as executor:
+            statuses = executor.send_inputs(inputs)
+            matrix = executor.affect_matrix()
+    """
+    def __init__(self, username: Text, password: Text, base_url: Text = AEI_AI_URL, processes: int = None,
+                 threads: int = DEFAULT_THREADS, batch_size: int = DEFAULT_BATCH_SIZE, token_cache_path: Text = None):
+        """
+        Constructs a sharded executor and starts its worker processes.
+
+        Args:
+            username: Client's username.
+            password: Client's password.
+            base_url: Base URL of the aEi.ai service.
+            processes: Number of worker processes, the number of CPUs if not given.
+            threads: Number of threads, and of pooled connections, per worker process.
+            batch_size: Maximum number of inputs sent in one call.
+            token_cache_path: Path of the file the access token is shared through, a temporary file if not given.
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.threads = threads
+        self.batch_size = batch_size
+
+        self._temp_dir = None
+        if token_cache_path is None:
+            self._temp_dir = tempfile.mkdtemp(prefix="aei-")
+            token_cache_path = os.path.join(self._temp_dir, "token.json")
+
+        # log in once, so that workers start with the cached token
+        with AeiClient(base_url=base_url) as client:
+            TokenProvider(username=username, password=password, client=client, cache_path=token_cache_path).get_token()
+
+        # spawn rather than fork, as forking a process running threads may copy locks held by them
+        context = get_context("spawn")
+        self._connections: List[Connection] = []
+        self._workers = []
+        for shard in range(self.processes):
+            parent_connection, child_connection = context.Pipe()
+            worker = context.Process(target=_serve, name="aei-shard-%d" % shard, daemon=True,
+                                     args=(child_connection, shard, self.processes, base_url, username, password,
+                                           token_cache_path, threads, batch_size))
+            worker.start()
+            child_connection.close()
+            self._connections.append(parent_connection)
+            self._workers.append(worker)
+
+    def __enter__(self) -> "ShardedExecutor":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stops the worker processes and removes the temporary token file."""
+        for connection in self._connections:
+            try:
+                connection.send_bytes(marshal.dumps(("stop",)))
+            except OSError:
+                pass
+        for worker in self._workers:
+            worker.join()
+        for connection in self._connections:
+            connection.close()
+        self._connections, self._workers = [], []
+        if self._temp_dir is not None:
+            shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._temp_dir = None
+
+    def send_inputs(self, inputs: Iterable[Dict[Text, Any]]) -> array:
+        """
+        Analyzes inputs across the worker processes, preserving the order of inputs within each interaction.
+
+        Args:
+            inputs: Input entries built by text_input or image_input, with images given by URL, file path or bytes.
+
+        Returns:
+            Status code of each input, in input order: the per-input status reported by the service, or the
+            status of the call that carried the input.
+
+        Raises:
+            ShardError: If a worker failed to send its inputs.
+        """
+        statuses = array("H")
+        task_size = self.batch_size * self.threads
+        entries: List[List[Tuple]] = [[] for _ in range(self.processes)]
+        positions: List[List[int]] = [[] for _ in range(self.processes)]
+        queued: List[Deque[List[int]]] = [deque() for _ in range(self.processes)]
+
+        for position, entry in enumerate(inputs):
+            statuses.append(0)
+            shard = stable_shard(entry["interactionId"], self.processes)
+            entries[shard].append((entry["userId"], entry["interactionId"], entry.get("text"), entry.get("image")))
+            positions[shard].append(position)
+            if len(entries[shard]) >= task_size:
+                self._submit_inputs(shard, entries[shard], positions[shard], queued, statuses)
+                entries[shard], positions[shard] = [], []
+
+        for shard in range(self.processes):
+            if entries[shard]:
+                self._submit_inputs(shard, entries[shard], positions[shard], queued, statuses)
+        for shard in range(self.processes):
+            while queued[shard]:
+                self._collect_inputs(shard, queued, statuses)
+        return statuses
+
+    def affect_matrix(self, page_size: int = None):
+        """
+        Lists all users of the client across the worker processes, each fetching and decoding its own pages.
+
+        Paging relies on limit and offset parameters that the service may not support: pages repeating an earlier
+        one are dropped, and a page longer than the page size is taken as the whole list.
+
+        Args:
+            page_size: Number of users per page, for example DEFAULT_PAGE_SIZE, None to list all users in a single
+                request decoded by one worker.
+
+        Returns:
+            AffectMatrix of all users, in listing order.
+
+        Raises:
+            ShardError: If a worker failed to list its pages.
+        """
+        # only affect matrices need NumPy
+        import numpy as np
+        from api.analytics import AffectMatrix
+
+        for connection in self._connections:
+            connection.send_bytes(marshal.dumps(("users", page_size)))
+
+        pages: Dict[int, Tuple[bytes, bytes]] = {}
+        running = set(self._connections)
+        while running:
+            for connection in wait(list(running)):
+                reply = marshal.loads(connection.recv_bytes())
+                if reply[0] == "page":
+                    pages[reply[1]] = (reply[2], reply[3])
+                elif reply[0] == "done":
+                    running.discard(connection)
+                else:
+                    running.discard(connection)
+                    self._drain(running)
+                    raise ShardError(reply[1])
+
+        user_ids: List[Text] = []
+        values = array("d")
+        first_ids = set()
+        for page in sorted(pages):
+            ids, page_values = pages[page]
+            if not ids:
+                continue
+            page_ids = ids.decode("utf-8").split("\n")
+            # a page starting like an earlier one is the same page again, from a service ignoring the offset
+            if page_ids[0] in first_ids:
+                continue
+            first_ids.add(page_ids[0])
+            user_ids.extend(page_ids)
+            values.frombytes(page_values)
+
+        matrix = np.frombuffer(values, dtype=np.float64).reshape(len(user_ids), AFFECT_WIDTH)
+        pad = len(PAD_KEYS)
+        return AffectMatrix(user_ids=user_ids, emotion=matrix[:, :pad], mood=matrix[:, pad:2 * pad],
+                            personality=matrix[:, 2 * pad:])
+
+    def _submit_inputs(self, shard: int, entries: List[Tuple], positions: List[int], queued: List[Deque[List[int]]],
+                       statuses: array):
+        if len(queued[shard]) > MAX_QUEUED_TASKS:
+            self._collect_inputs(shard, queued, statuses)
+        self._connections[shard].send_bytes(marshal.dumps(("inputs", entries)))
+        queued[shard].append(positions)
+
+    def _collect_inputs(self, shard: int, queued: List[Deque[List[int]]], statuses: array):
+        positions = queued[shard].popleft()
+        reply = marshal.loads(self._connections[shard].recv_bytes())
+        if reply[0] == "error":
+            # leave every worker ready for the next workload before failing
+            for other in range(self.processes):
+                while queued[other]:
+                    queued[other].popleft()
+                    self._connections[other].recv_bytes()
+            raise ShardError(reply[1])
+        codes = array("H")
+        codes.frombytes(reply[1])
+        for position, code in zip(positions, codes):
+            statuses[position] = code
+
+    def _drain(self, running: set):
+        """
+        Reads the remaining replies of a failed listing, so that workers are ready for the next workload.
+
+        Workers reply to every task with a single terminal message, sent once all of its pages are, so that no reply
+        of the listing is left in any connection.
+        """
+        while running:
+            for connection in wait(list(running)):
+                if marshal.loads(connection.recv_bytes())[0] != "page":
+                    running.discard(connection)
+
+
+def stable_shard(key: Text, shards: int) -> int:
+    """
+    Assigns a key to a shard, the same one in every process and every run, unlike hash(), which is salted.
+
+    Args:
+        key: Key to assign, for example, an interaction ID.
+        shards: Number of shards.
+
+    Returns:
+        Shard of the key, from 0 to shards - 1.
+    """
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big") % shards
+
+
+def _serve(connection: Connection, shard: int, shards: int, base_url: Text, username: Text, password: Text,
+           token_cache_path: Text, threads: int, batch_size: int):
+    """
+    Runs the tasks sent to a worker process until it is stopped.
+
+    Args:
+        connection: Connection to the parent process.
+        shard: Index of the worker.
+        shards: Number of workers.
+        base_url: Base URL of the aEi.ai service.
+        username: Client's username.
+        password: Client's password.
+        token_cache_path: Path of the shared token file.
+        threads: Number of threads of the worker.
+        batch_size: Maximum number of inputs sent in one call.
+    """
+    client = AeiClient(base_url=base_url, pool_maxsize=threads)
+    tokens = TokenProvider(username=username, password=password, client=client, cache_path=token_cache_path)
+    worker = _Worker(connection, client, tokens, shard, shards, threads, batch_size)
+    with client, ThreadPoolExecutor(max_workers=threads) as executor:
+        worker.executor = executor
+        while True:
+            try:
+                message = marshal.loads(connection.recv_bytes())
+            except EOFError:
+                return
+            if message[0] == "stop":
+                return
+            try:
+                if message[0] == "inputs":
+                    reply = ("inputs", worker.send_inputs(message[1]))
+                else:
+                    worker.list_users(message[1])
+                    reply = ("done",)
+            except Exception as e:
+                reply = ("error", "shard %d: %s: %s" % (shard, type(e).__name__, e))
+            worker.send(reply)
+
+
+class _Worker:
+    """Tasks of a worker process."""
+    def __init__(self, connection: Connection, client: AeiClient, tokens: TokenProvider, shard: int, shards: int,
+                 threads: int, batch_size: int):
+        self.connection = connection
+        self.client = client
+        self.tokens = tokens
+        self.shard = shard
+        self.shards = shards
+        self.threads = threads
+        self.batch_size = batch_size
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self._send_lock = Lock()
+
+    def send(self, reply: Tuple):
+        with self._send_lock:
+            self.connection.send_bytes(marshal.dumps(reply))
+
+    def send_inputs(self, entries: List[Tuple]) -> bytes:
+        """Sends a shard's inputs, each thread sending the inputs of its own interactions in order."""
+        statuses = array("H", bytes(2 * len(entries)))
+        lanes: List[List[int]] = [[] for _ in range(self.threads)]
+        for position, entry in enumerate(entries):
+            # entries of this shard share their hash modulo the number of shards, spread them with the rest
+            # the shard of an interaction among all lanes of all processes is that of its process plus a multiple of
+            # the number of processes
+            lanes[stable_shard(entry[1], self.shards * self.threads) // self.shards].append(position)
+
+        def send_lane(lane: List[int]):
+            for start in range(0, len(lane), self.batch_size):
+                batch = lane[start:start + self.batch_size]
+                inputs = []
+                for position in batch:
+                    user_id, interaction_id, text, image = entries[position]
+                    if text is not None:
+                        inputs.append(text_input(user_id=user_id, interaction_id=interaction_id, text=text))
+                    else:
+                        inputs.append(image_input(user_id=user_id, interaction_id=interaction_id, image=image))
+                response = self.tokens.call(self.client.send_inputs, inputs=inputs)
+                codes = [response.status_code] * len(batch)
+                if response.status_code < 400:
+                    results = codec.response_json(response).get("inputs")
+                    if isinstance(results, list) and len(results) == len(batch):
+                        codes = [_status_code(result, response.status_code) for result in results]
+                for position, code in zip(batch, codes):
+                    statuses[position] = code
+
+        self._run_lanes(send_lane, [lane for lane in lanes if lane])
+        return statuses.tobytes()
+
+    def list_users(self, page_size: Optional[int]):
+        """
+        Fetches every page assigned to this worker, replying with each page as soon as it is decoded.
+
+        Without page size, the first worker fetches the whole list in a single request.
+        """
+        def list_lane(lane: int):
+            step = self.shards * self.threads
+            page = self.shard * self.threads + lane
+            first_id = None
+            while True:
+                url = self.client.api_url + "/users/"
+                if page_size is not None:
+                    url += params_2_string(params={"limit": str(page_size), "offset": str(page * page_size)})
+                response = self.tokens.call(self._get, url=url)
+                response.raise_for_status()
+                users = codec.response_json(response).get("users") or []
+
+                if page_size is None:
+                    self._send_page(page, users)
+                    return
+                if len(users) > page_size:
+                    # the service ignores the limit and returned the whole list, which only the first page keeps
+                    self._send_page(page, users if page == 0 else [])
+                    return
+                if users and users[0].get("userId") == first_id:
+                    # the service ignores the offset and returned the previous page again
+                    return
+                first_id = users[0].get("userId") if users else None
+                self._send_page(page, users)
+
+                # a short page is the last one
+                if len(users) < page_size:
+                    return
+                page += step
+
+        if page_size is not None:
+            self._run_lanes(list_lane, range(self.threads))
+        elif self.shard == 0:
+            self._run_lanes(list_lane, [0])
+
+    def _send_page(self, page: int, users: List[Dict[Text, Any]]):
+        values = array("d")
+        for user in users:
+            values.extend(_affect_row(user))
+        self.send(("page", page, "\n".join(str(user.get("userId")) for user in users).encode("utf-8"),
+                   values.tobytes()))
+
+    def _run_lanes(self, function: Callable[[Any], None], lanes: Iterable[Any]):
+        """
+        Runs a function on lanes concurrently, waiting for every lane before raising the first error, so that no
+        lane is still running, or replying, once the task is over.
+        """
+        futures = [self.executor.submit(function, lane) for lane in lanes]
+        errors = [future.exception() for future in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def _get(self, url: Text, access_token: Text):
+        return self.client._request("GET", "get_user_list", url=url, headers=auth_headers(access_token))
+
+
+def _status_code(result: Any, default: int) -> int:
+    status = result.get("status") if isinstance(result, dict) else None
+    code = status.get("code") if isinstance(status, dict) else None
+    return code if isinstance(code, int) else default
+
+
+def _affect_row(user: Dict[Text, Any]) -> List[float]:
+    affect = as_dict(user.get("affect"))
+    return [*pad_scores(affect.get("emotion")), *pad_scores(affect.get("mood")),
+            *personality_scores(affect.get("personality"))]
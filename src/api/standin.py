@@ -0,0 +1,570 @@
+"""
+In-process stand-in for the aEi.ai service, for offline load and regression testing.
+
+The stand-in serves the routes used by the API client with realistic payloads, and can inject latency,
+server errors and throttling. It keeps its state in memory and accounts for every request it serves.
+"""
+
+import hashlib
+import json
+import random
+import re
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from math import log
+from threading import Lock, Thread
+from time import sleep
+from typing import Any, Callable, Dict, List, Optional, Text, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from api.aei_ai import API_VERSION
+from api.compression import GZIP, ZSTD, compress, decompress, zstandard
+
+API_PREFIX = "/api/" + API_VERSION
+TOKEN_EXPIRES_IN = 3600
+
+
+def constant_latency(seconds: float) -> Callable[[], float]:
+    """
+    Builds a latency distribution that always returns the same value.
+
+    Args:
+        seconds: Latency in seconds.
+
+    Returns:
+        Function sampling a latency in seconds.
+    """
+    return lambda: seconds
+
+
+def lognormal_latency(median: float, sigma: float = 0.5) -> Callable[[random.Random], float]:
+    """
+    Builds a log-normal latency distribution, which has the long tail of real service latencies.
+
+    Args:
+        median: Median latency in seconds.
+        sigma: Standard deviation of the latency logarithm, larger values give a longer tail.
+
+    Returns:
+        Function sampling a latency in seconds from given random generator.
+    """
+    mu = log(median)
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+
+def random_user(rng: random.Random, attributes: Dict[Text, Text] = None) -> Dict[Text, Any]:
+    """
+    Generates a user payload with random affect, shaped like the ones returned by the service.
+
+    Args:
+        rng: Random generator.
+        attributes: User custom attributes as string key-value pairs.
+
+    Returns:
+        User as key-value pairs.
+    """
+    uniform = rng.uniform
+    return {
+        "userId": "%032x" % rng.getrandbits(128),
+        "attributes": attributes or {},
+        "affect": {
+            "emotion": {"pad": _random_pad(rng)},
+            "mood": {"pad": _random_pad(rng)},
+            "personality": {
+                "openness": uniform(0, 1),
+                "conscientiousness": uniform(0, 1),
+                "extraversion": uniform(0, 1),
+                "agreeableness": uniform(0, 1),
+                "neuroticism": uniform(0, 1)
+            }
+        },
+        "satisfaction": {"score": uniform(0, 1)},
+        "socialPerception": {"warmth": uniform(-1, 1), "competence": uniform(-1, 1)}
+    }
+
+
+def _random_pad(rng: random.Random) -> Dict[Text, float]:
+    return {"pleasure": rng.uniform(-1, 1), "arousal": rng.uniform(-1, 1), "dominance": rng.uniform(-1, 1)}
+
+
+class StandInState:
+    """In-memory state of the stand-in service."""
+    def __init__(self):
+        self.tokens = set()
+        self.users: Dict[Text, Dict[Text, Any]] = {}
+        self.interactions: Dict[Text, Dict[Text, Any]] = {}
+        self.queries = 0
+        self.paid_queries = 0
+        self.subscription = {"type": "free"}
+        self.lock = Lock()
+
+
+class StandInServer:
+    """
+    aEi.ai stand-in HTTP server running in a background thread.
+
+    Example:
+        with StandInServer(latency=lognormal_latency(0.02)) as server:
+            client = AeiClient(base_url=server.url)
+    """
+    def __init__(self, host: Text = "127.0.0.1", port: int = 0, latency: Callable[[random.Random], float] = None,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, retry_after: float = 1.0,
+                 require_auth: bool = True, seed: int = None, compression_threshold: int = None,
+                 bandwidth: float = None, paging: bool = True):
+        """
+        Constructs a stand-in server, listening once started.
+
+        Args:
+            host: Host to listen on.
+            port: Port to listen on, 0 to pick a free one.
+            latency: Function sampling the latency added to each request in seconds from the stand-in's random
+                generator, None for no added latency.
+            error_rate: Fraction of requests answered with a 500 error.
+            throttle_rate: Fraction of requests answered with a 429 error.
+            retry_after: Retry-After value in seconds sent with 429 errors.
+            require_auth: True to reject API requests without a token issued by the stand-in.
+            seed: Seed of the random generator used for payloads, latencies and injected failures.
+            compression_threshold: Minimum size in bytes of the response bodies compressed for clients accepting
+                it, None to never compress responses.
+            bandwidth: Link bandwidth in bytes per second, whose transfer time of request and response bodies is
+                added to the latency, None for no limit.
+            paging: True to honor the limit and offset parameters of listings, False to always return whole
+                listings, as a service without paging does.
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.require_auth = require_auth
+        self.compression_threshold = compression_threshold
+        self.bandwidth = bandwidth
+        self.paging = paging
+        self.random = random.Random(seed)
+        self.state = StandInState()
+
+        self._stats_lock = Lock()
+        self._requests: Dict[Text, int] = {}
+        self._statuses: Dict[int, int] = {}
+        self._bytes_in = 0
+        self._bytes_out = 0
+
+        self._server = ThreadingHTTPServer((host, port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> Text:
+        """Base URL of the stand-in, to be passed to clients as their base URL."""
+        host, port = self._server.server_address[:2]
+        return "http://%s:%d" % (host, port)
+
+    def start(self) -> "StandInServer":
+        """
+        Starts serving requests in a background thread.
+
+        Returns:
+            The started server.
+        """
+        self._thread = Thread(target=self._server.serve_forever, name="aei-stand-in", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops serving requests and closes the listening socket."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def issue_token(self) -> Text:
+        """
+        Issues an access token without going through the login route.
+
+        Returns:
+            Access token accepted by the stand-in.
+        """
+        token = uuid.uuid4().hex
+        with self.state.lock:
+            self.state.tokens.add(token)
+        return token
+
+    def add_users(self, count: int) -> List[Text]:
+        """
+        Creates given number of users with random affect.
+
+        Args:
+            count: Number of users to create.
+
+        Returns:
+            IDs of the new users.
+        """
+        with self.state.lock:
+            return [self._new_user(None)["userId"] for _ in range(count)]
+
+    def stats(self) -> Dict[Text, Any]:
+        """
+        Gets the request accounting of the stand-in.
+
+        Returns:
+            Number of requests per route handler name, number of responses per status code, and request/response
+            body bytes as sent on the wire.
+        """
+        with self._stats_lock:
+            return {
+                "requests": dict(self._requests),
+                "statuses": dict(self._statuses),
+                "bytes_in": self._bytes_in,
+                "bytes_out": self._bytes_out
+            }
+
+    def reset_stats(self):
+        """Clears the request accounting."""
+        with self._stats_lock:
+            self._requests.clear()
+            self._statuses.clear()
+            self._bytes_in = 0
+            self._bytes_out = 0
+
+    def _account(self, route: Text, status: int, bytes_in: int, bytes_out: int):
+        with self._stats_lock:
+            self._requests[route] = self._requests.get(route, 0) + 1
+            self._statuses[status] = self._statuses.get(status, 0) + 1
+            self._bytes_in += bytes_in
+            self._bytes_out += bytes_out
+
+    def _new_user(self, attributes: Optional[Dict[Text, Text]]) -> Dict[Text, Any]:
+        """Creates a user, must be called while holding the state lock."""
+        user = random_user(self.random, attributes)
+        self.state.users[user["userId"]] = user
+        return user
+
+    def _bill(self):
+        """Counts a billable query, paid unless on the free plan, must be called while holding the state lock."""
+        self.state.queries += 1
+        if self.state.subscription.get("type") != "free":
+            self.state.paid_queries += 1
+
+    def _analyze(self, user_id: Text, interaction_id: Text) -> Dict[Text, Any]:
+        """Moves a user's emotion after an input, must be called while holding the state lock."""
+        user = self.state.users.get(user_id)
+        if user is None or interaction_id not in self.state.interactions:
+            return {"userId": user_id, "interactionId": interaction_id,
+                    "status": _status(404, "Unknown user or interaction.")}
+        pad = user["affect"]["emotion"]["pad"]
+        for key in pad:
+            pad[key] = max(-1.0, min(1.0, pad[key] + self.random.gauss(0, 0.1)))
+        self._bill()
+        return {"userId": user_id, "interactionId": interaction_id, "emotion": {"pad": dict(pad)},
+                "status": _status(200)}
+
+    def handle(self, method: Text, path: Text, query: Dict[Text, List[Text]], headers: Dict[Text, Text],
+               body: bytes) -> Tuple[int, Dict[Text, Any]]:
+        """
+        Serves a request.
+
+        Args:
+            method: HTTP method.
+            path: Request path.
+            query: Query parameters.
+            headers: Request headers.
+            body: Request body.
+
+        Returns:
+            HTTP status code and response body.
+        """
+        for route_method, pattern, name in _ROUTES:
+            if route_method != method:
+                continue
+            match = pattern.fullmatch(path)
+            if match is None:
+                continue
+            if path.startswith(API_PREFIX) and self.require_auth and not self._is_authorized(headers):
+                return 401, {"status": _status(401, "Invalid access token.", "Log in to get a new access token.")}
+            with self.state.lock:
+                return getattr(self, "_" + name)(query=query, headers=headers, body=body, **match.groupdict())
+        return 404, {"status": _status(404, "Unknown route.")}
+
+    def _is_authorized(self, headers: Dict[Text, Text]) -> bool:
+        authorization = headers.get("Authorization") or ""
+        if not authorization.startswith("Bearer "):
+            return False
+        with self.state.lock:
+            return authorization[len("Bearer "):] in self.state.tokens
+
+    # route handlers, called while holding the state lock
+
+    def _register(self, **kwargs):
+        return 200, {"status": _status(200)}
+
+    def _login(self, **kwargs):
+        token = uuid.uuid4().hex
+        self.state.tokens.add(token)
+        return 200, {"access_token": token, "token_type": "bearer", "expires_in": TOKEN_EXPIRES_IN}
+
+    def _ok(self, **kwargs):
+        return 200, {"status": _status(200)}
+
+    def _create_user(self, body: bytes, **kwargs):
+        try:
+            attributes = json.loads(body) if body else None
+            if attributes is not None and not isinstance(attributes, dict):
+                raise ValueError("User attributes must be an object.")
+        except ValueError:
+            return 400, {"status": _status(400, "Invalid user attributes.", "Send attributes as a JSON object.")}
+        return 200, {"status": _status(200), "user": self._new_user(attributes)}
+
+    def _list_users(self, query: Dict[Text, List[Text]], **kwargs):
+        try:
+            users = self._page(list(self.state.users.values()), query)
+        except ValueError:
+            return 400, {"status": _status(400, "Invalid paging.", "Send limit and offset as integers.")}
+        return 200, {"status": _status(200), "users": users}
+
+    def _get_user(self, user_id: Text, **kwargs):
+        user = self.state.users.get(user_id)
+        if user is None:
+            return 404, {"status": _status(404, "Unknown user.")}
+        self._bill()
+        return 200, {"status": _status(200), "user": user}
+
+    def _get_user_facet(self, user_id: Text, facet: Text, query: Dict[Text, List[Text]], **kwargs):
+        user = self.state.users.get(user_id)
+        if user is None:
+            return 404, {"status": _status(404, "Unknown user.")}
+        self._bill()
+        if facet == "emotion" or facet == "mood" or facet == "personality":
+            return 200, {"status": _status(200), facet: user["affect"][facet]}
+        if facet == "satisfaction":
+            return 200, {"status": _status(200), "satisfaction": user["satisfaction"]}
+        if facet == "social-perception":
+            return 200, {"status": _status(200), "socialPerception": user["socialPerception"]}
+        # empathy towards each target, higher when emotions are closer
+        pad = user["affect"]["emotion"]["pad"]
+        empathy = {}
+        for target_id in query.get("target_user_id", []):
+            target = self.state.users.get(target_id)
+            if target is None:
+                continue
+            target_pad = target["affect"]["emotion"]["pad"]
+            distance = sum((pad[key] - target_pad[key]) ** 2 for key in pad) ** 0.5
+            empathy[target_id] = max(0.0, 1.0 - distance / 12 ** 0.5)
+        return 200, {"status": _status(200), "empathy": empathy}
+
+    def _create_interaction(self, body: bytes, **kwargs):
+        try:
+            user_ids = _form(body).get("user_id", [])
+        except ValueError:
+            return 400, {"status": _status(400, "Invalid form.", "Send form fields encoded as UTF-8.")}
+        interaction = {"interactionId": uuid.uuid4().hex, "userIds": user_ids}
+        self.state.interactions[interaction["interactionId"]] = interaction
+        return 200, {"status": _status(200), "interaction": interaction}
+
+    def _list_interactions(self, query: Dict[Text, List[Text]], **kwargs):
+        try:
+            interactions = self._page(list(self.state.interactions.values()), query)
+        except ValueError:
+            return 400, {"status": _status(400, "Invalid paging.", "Send limit and offset as integers.")}
+        return 200, {"status": _status(200), "interactions": interactions}
+
+    def _get_interaction(self, interaction_id: Text, **kwargs):
+        interaction = self.state.interactions.get(interaction_id)
+        if interaction is None:
+            return 404, {"status": _status(404, "Unknown interaction.")}
+        return 200, {"status": _status(200), "interaction": interaction}
+
+    def _add_users_to_interaction(self, interaction_id: Text, body: bytes, **kwargs):
+        interaction = self.state.interactions.get(interaction_id)
+        if interaction is None:
+            return 404, {"status": _status(404, "Unknown interaction.")}
+        try:
+            user_ids = _form(body).get("user_id", [])
+        except ValueError:
+            return 400, {"status": _status(400, "Invalid form.", "Send form fields encoded as UTF-8.")}
+        for user_id in user_ids:
+            if user_id not in interaction["userIds"]:
+                interaction["userIds"].append(user_id)
+        return 200, {"status": _status(200), "interaction": interaction}
+
+    def _send_input(self, query: Dict[Text, List[Text]], **kwargs):
+        result = self._analyze(query.get("user_id", [""])[0], query.get("interaction_id", [""])[0])
+        return result["status"]["code"], result
+
+    def _send_inputs(self, body: bytes, **kwargs):
+        try:
+            entries = json.loads(body)["inputs"]
+        except (ValueError, KeyError, TypeError):
+            return 400, {"status": _status(400, "Invalid inputs.", "Send inputs as {\"inputs\": [...]}.")}
+        results = [self._analyze(entry.get("userId"), entry.get("interactionId")) for entry in entries]
+        return 200, {"status": _status(200), "inputs": results}
+
+    def _get_free_queries(self, **kwargs):
+        return 200, {"status": _status(200), "queries": self.state.queries - self.state.paid_queries}
+
+    def _get_paid_queries(self, **kwargs):
+        return 200, {"status": _status(200), "queries": self.state.paid_queries}
+
+    def _get_subscription(self, **kwargs):
+        return 200, {"status": _status(200), "subscription": self.state.subscription}
+
+    def _update_subscription(self, body: bytes, **kwargs):
+        try:
+            subscription_type = _form(body).get("subscription_type", ["free"])[0]
+        except ValueError:
+            return 400, {"status": _status(400, "Invalid form.", "Send form fields encoded as UTF-8.")}
+        self.state.subscription = {"type": subscription_type}
+        return 200, {"status": _status(200), "subscription": self.state.subscription}
+
+    def _get_sources(self, **kwargs):
+        return 200, {"status": _status(200), "sources": []}
+
+    def _page(self, items: List[Any], query: Dict[Text, List[Text]]) -> List[Any]:
+        """Gets the page of a listing requested by its limit and offset, raising ValueError if they are invalid."""
+        if not self.paging or "limit" not in query:
+            return items
+        offset = int(query.get("offset", ["0"])[0])
+        return items[offset:offset + int(query["limit"][0])]
+
+
+def _form(body: bytes) -> Dict[Text, List[Text]]:
+    """Decodes form fields, raising ValueError if they are not UTF-8 encoded."""
+    return parse_qs(body.decode("utf-8"))
+
+
+def _status(code: int, error: Text = None, help: Text = None) -> Dict[Text, Any]:
+    return {"code": code, "error": error, "help": help}
+
+
+_ROUTES = [(method, re.compile(pattern), name) for method, pattern, name in [
+    ("POST", r"/register", "register"),
+    ("POST", r"/oauth/token", "login"),
+    ("POST", r"/reset-password", "ok"),
+    ("PUT", r"/update-password", "ok"),
+    ("POST", API_PREFIX + r"/users", "create_user"),
+    ("GET", API_PREFIX + r"/users/?", "list_users"),
+    ("GET", API_PREFIX + r"/users/(?P<user_id>[^/]+)", "get_user"),
+    ("GET", API_PREFIX + r"/users/(?P<user_id>[^/]+)/(?P<facet>emotion|mood|personality|satisfaction|"
+                         r"social-perception|empathy)", "get_user_facet"),
+    ("POST", API_PREFIX + r"/interactions", "create_interaction"),
+    ("GET", API_PREFIX + r"/interactions", "list_interactions"),
+    ("GET", API_PREFIX + r"/interactions/(?P<interaction_id>[^/]+)", "get_interaction"),
+    ("PUT", API_PREFIX + r"/interactions/(?P<interaction_id>[^/]+)/users", "add_users_to_interaction"),
+    ("POST", API_PREFIX + r"/inputs/(?:text|image)", "send_input"),
+    ("POST", API_PREFIX + r"/inputs", "send_inputs"),
+    ("GET", API_PREFIX + r"/metrics/queries/used", "get_free_queries"),
+    ("GET", API_PREFIX + r"/metrics/queries", "get_paid_queries"),
+    ("GET", API_PREFIX + r"/subscriptions", "get_subscription"),
+    ("PUT", API_PREFIX + r"/subscriptions", "update_subscription"),
+    ("GET", API_PREFIX + r"/sources", "get_sources"),
+    ("GET", API_PREFIX + r"/sources/[^/]+", "ok"),
+    ("POST", API_PREFIX + r"/sources/[^/]+", "ok"),
+    ("PUT", API_PREFIX + r"/sources/[^/]+", "ok"),
+    ("DELETE", API_PREFIX + r"/sources/[^/]+", "ok"),
+    ("PUT", API_PREFIX + r"/clients/password", "ok")
+]]
+
+
+def _route_name(method: Text, path: Text) -> Text:
+    for route_method, pattern, name in _ROUTES:
+        if route_method == method and pattern.fullmatch(path):
+            return name
+    return "unknown"
+
+
+def _handler(server: StandInServer) -> type:
+    """Builds the request handler class bound to given stand-in server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers and body are written separately, which Nagle's algorithm would delay on keep-alive connections
+        disable_nagle_algorithm = True
+
+        def _serve(self):
+            if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                body = self._read_chunked()
+            else:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+            url = urlsplit(self.path)
+            wire_in = len(body)
+
+            if server.latency is not None:
+                sleep(max(0.0, server.latency(server.random)))
+
+            extra_headers = {}
+            roll = server.random.random()
+            try:
+                body = decompress(body, self.headers.get("Content-Encoding"))
+                unsupported = False
+            except (ValueError, OSError):
+                unsupported = True
+            if unsupported:
+                status, payload = 415, {"status": _status(415, "Unsupported content encoding.")}
+            elif roll < server.throttle_rate:
+                status, payload = 429, {"status": _status(429, "Too many requests.", "Slow down.")}
+                extra_headers["Retry-After"] = "%g" % server.retry_after
+            elif roll < server.throttle_rate + server.error_rate:
+                status, payload = 500, {"status": _status(500, "Internal server error.")}
+            else:
+                status, payload = server.handle(self.command, url.path, parse_qs(url.query), dict(self.headers), body)
+
+            content = json.dumps(payload).encode("utf-8")
+            if self.command == "GET" and status == 200:
+                # entity tag of the payload, answering conditional requests of unchanged payloads without a body
+                etag = '"%s"' % hashlib.md5(content).hexdigest()
+                extra_headers["ETag"] = etag
+                if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+                    status, content = 304, b""
+            encoding = self._response_encoding(len(content)) if content else None
+            if encoding is not None:
+                content = compress(content, encoding)
+                extra_headers["Content-Encoding"] = encoding
+            if server.bandwidth is not None:
+                sleep((wire_in + len(content)) / server.bandwidth)
+
+            # accounted before answering, so that clients see the stats of every request they got a response to
+            server._account(_route_name(self.command, url.path), status, wire_in, len(content))
+            self.send_response(status)
+            if status != 304:
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+            for name, value in extra_headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(content)
+
+        def _response_encoding(self, size: int) -> Optional[Text]:
+            if server.compression_threshold is None or size < server.compression_threshold:
+                return None
+            accepted = [value.split(";")[0].strip() for value in self.headers.get("Accept-Encoding", "").split(",")]
+            if ZSTD in accepted and zstandard is not None:
+                return ZSTD
+            if GZIP in accepted:
+                return GZIP
+            return None
+
+        def _read_chunked(self) -> bytes:
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";", 1)[0], 16)
+                if size == 0:
+                    # skip trailers up to the empty line ending the body
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    return b"".join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+
+        do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _serve
+
+        def log_message(self, format, *args):
+            # accounting replaces the per-request log
+            pass
+
+    return Handler
@@ -0,0 +1,195 @@
+"""
+Streaming iteration over large aEi.ai collections.
+"""
+
+import codecs
+import json
+from typing import Any, Iterable, Iterator, Text, Type
+
+from api.aei_ai import AeiClient, auth_headers, default_client, params_2_string
+from api.models import Model
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+def iter_users(access_token: Text, page_size: int = None, model: Type[Model] = None,
+               client: AeiClient = None) -> Iterator[Any]:
+    """
+    Iterates over all aEi.ai users of the client, decoding them as they arrive.
+
+    Args:
+        access_token: Client's access token.
+        page_size: Number of users to request per page, None to stream all users in a single response.
+        model: Model to decode each user into, for example, User, None to yield decoded JSON objects.
+        client: aEi.ai API client to call, the default client if not given.
+
+    Returns:
+        Iterator over the users.
+    """
+    client = client if client is not None else default_client()
+    return _iter_collection(client, "get_user_list", client.api_url + "/users/", "users", access_token,
+                            page_size, model)
+
+
+def iter_interactions(access_token: Text, page_size: int = None, model: Type[Model] = None,
+                      client: AeiClient = None) -> Iterator[Any]:
+    """
+    Iterates over all interactions of the client, decoding them as they arrive.
+
+    Args:
+        access_token: Client's access token.
+        page_size: Number of interactions to request per page, None to stream all interactions in a single response.
+        model: Model to decode each interaction into, for example, Interaction, None to yield decoded JSON objects.
+        client: aEi.ai API client to call, the default client if not given.
+
+    Returns:
+        Iterator over the interactions.
+    """
+    client = client if client is not None else default_client()
+    return _iter_collection(client, "get_interaction_list", client.api_url + "/interactions", "interactions",
+                            access_token, page_size, model)
+
+
+def _iter_collection(client: AeiClient, endpoint: Text, url: Text, key: Text, access_token: Text, page_size: int,
+                     model: Type[Model]) -> Iterator[Any]:
+    """
+    Iterates over a collection, page by page when page size is given.
+
+    Paging relies on limit and offset parameters that the service may not support: iteration stops at a page longer
+    than the page size, taken as the whole list, and at a page repeating the previous one.
+
+    Args:
+        client: aEi.ai API client to call.
+        endpoint: Name of the listing API endpoint.
+        url: Listing URL.
+        key: Key of the collection in the response body.
+        access_token: Client's access token.
+        page_size: Number of records to request per page, None for a single response.
+        model: Model to decode each record into, None to yield decoded JSON objects.
+
+    Returns:
+        Iterator over the records.
+    """
+    headers = auth_headers(access_token)
+    offset = 0
+    previous_first = None
+    while True:
+        page_url = url
+        if page_size is not None:
+            page_url += params_2_string(params={"limit": str(page_size), "offset": str(offset)})
+
+        count = 0
+        response = client._request("GET", endpoint, url=page_url, headers=headers, stream=True)
+        try:
+            response.raise_for_status()
+            for record in iter_json_array(response.iter_content(chunk_size=DEFAULT_CHUNK_SIZE), key):
+                if count == 0 and offset > 0 and record == previous_first:
+                    # the service ignores the offset and returned the previous page again
+                    return
+                if count == 0:
+                    previous_first = record
+                count += 1
+                yield model.from_dict(record) if model is not None else record
+        finally:
+            response.close()
+
+        # a short page is the last one, a page longer than requested is the whole list from a service ignoring the
+        # limit
+        if page_size is None or count != page_size:
+            return
+        offset += count
+
+
+def iter_json_array(chunks: Iterable[bytes], key: Text) -> Iterator[Any]:
+    """
+    Incrementally decodes the items of an array stored under given key of a top-level JSON object.
+
+    Only the item being decoded is held in memory, on top of the current chunk.
+
+    Args:
+        chunks: Raw JSON body, chunk by chunk.
+        key: Key of the array in the top-level object.
+
+    Returns:
+        Iterator over the decoded array items.
+    """
+    reader = _Reader(chunks)
+    reader.expect("{")
+    while True:
+        if reader.peek() == "}":
+            return
+        name = reader.value()
+        reader.expect(":")
+        if name != key:
+            reader.value()
+        else:
+            reader.expect("[")
+            if reader.peek() == "]":
+                return
+            while True:
+                yield reader.value()
+                if reader.peek() == "]":
+                    return
+                reader.expect(",")
+        if reader.peek() == "}":
+            return
+        reader.expect(",")
+
+
+class _Reader:
+    """Buffered reader of JSON values from a chunked UTF-8 body."""
+    def __init__(self, chunks: Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.position = 0
+
+    def _fill(self) -> bool:
+        """Appends the next chunk to the buffer, dropping consumed text, returns False at the end of the body."""
+        for chunk in self.chunks:
+            text = self.decoder.decode(chunk)
+            if text:
+                self.buffer = self.buffer[self.position:] + text
+                self.position = 0
+                return True
+        return False
+
+    def peek(self) -> Text:
+        """Skips whitespace and returns the next character without consuming it."""
+        while True:
+            buffer, position = self.buffer, self.position
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            self.position = position
+            if position < len(buffer):
+                return buffer[position]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON body.")
+
+    def expect(self, char: Text):
+        """Consumes given character, which must be the next one."""
+        found = self.peek()
+        if found != char:
+            raise ValueError("Expected %r at JSON body position, found %r." % (char, found))
+        self.position += 1
+
+    def value(self) -> Any:
+        """Decodes and consumes the next JSON value, reading more chunks until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.position)
+            except ValueError:
+                value, end = None, None
+            # a number at the end of the buffer may continue in the next chunk
+            if end is not None and end < len(self.buffer):
+                self.position = end
+                return value
+            if not self._fill():
+                if end is None:
+                    raise ValueError("Invalid JSON body.")
+                self.position = end
+                return value
@@ -0,0 +1,182 @@
+"""
+Access token caching for the aEi.ai Python API.
+"""
+
+import json
+import os
+import tempfile
+from threading import Lock
+from time import time
+from typing import TYPE_CHECKING, Callable, Optional, Text
+
+from api import codec
+from api.aei_ai import AeiClient, default_client
+
+if TYPE_CHECKING:
+    from requests.models import Response
+
+DEFAULT_EXPIRES_IN = 3600
+DEFAULT_REFRESH_MARGIN = 60
+UNAUTHORIZED = 401
+
+
+class TokenProvider:
+    """
+    Thread-safe provider of aEi.ai access tokens.
+
+    The token returned by login is cached and refreshed shortly before it expires. Refreshes are
+    single-flight: when many threads find the token expired or rejected at once, only one of them
+    logs in and the others reuse its token.
+    """
+    def __init__(self, username: Text, password: Text, client: AeiClient = None,
+                 refresh_margin: float = DEFAULT_REFRESH_MARGIN, cache_path: Text = None):
+        """
+        Constructs an access token provider.
+
+        Args:
+            username: Client's username.
+            password: Client's password.
+            client: aEi.ai API client to log in through, the default client if not given.
+            refresh_margin: Number of seconds before expiry at which the token is refreshed.
+            cache_path: Path of a file to persist the token to, so that new processes can skip login.
+        """
+        self.username = username
+        self.password = password
+        self.client = client if client is not None else default_client()
+        self.refresh_margin = refresh_margin
+        self.cache_path = cache_path
+
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = Lock()
+
+        if cache_path is not None:
+            self._load()
+
+    def get_token(self) -> Text:
+        """
+        Gets a valid access token, logging in only if the cached one is missing or about to expire.
+
+        Returns:
+            Client's access token.
+        """
+        token = self._token
+        if token is not None and time() < self._expires_at - self.refresh_margin:
+            return token
+
+        with self._lock:
+            if self._token is None or time() >= self._expires_at - self.refresh_margin:
+                self._refresh()
+            return self._token
+
+    def invalidate(self, token: Text) -> Text:
+        """
+        Reports given token as rejected by the service and gets a fresh one.
+
+        Args:
+            token: Access token that was rejected.
+
+        Returns:
+            Client's new access token.
+        """
+        with self._lock:
+            # another thread may have already replaced the rejected token
+            if self._token is None or self._token == token:
+                self._refresh(rejected=token)
+            return self._token
+
+    def call(self, function: Callable[..., "Response"], *args, **kwargs) -> "Response":
+        """
+        Calls given API function with a valid access token, retrying once with a fresh token if it is rejected.
+
+        Args:
+            function: API function taking access_token as keyword argument, for example, get_user.
+            *args: Positional arguments of the function.
+            **kwargs: Keyword arguments of the function, other than access_token.
+
+        Returns:
+            Response of the API function.
+        """
+        token = self.get_token()
+        response = function(*args, access_token=token, **kwargs)
+        if response.status_code == UNAUTHORIZED:
+            response = function(*args, access_token=self.invalidate(token), **kwargs)
+        return response
+
+    def _refresh(self, rejected: Text = None):
+        """
+        Logs in and caches the new token, must be called while holding the lock.
+
+        When the token is persisted, another process may have refreshed it meanwhile, in which case its token is
+        used instead of logging in again.
+
+        Args:
+            rejected: Access token rejected by the service, never reused.
+        """
+        if self.cache_path is not None:
+            self._load(rejected)
+            if self._token != rejected and time() < self._expires_at - self.refresh_margin:
+                return
+
+        response = self.client.login(username=self.username, password=self.password)
+        response.raise_for_status()
+        body = codec.response_json(response)
+
+        self._token = body["access_token"]
+        self._expires_at = time() + float(body.get("expires_in", DEFAULT_EXPIRES_IN))
+
+        if self.cache_path is not None:
+            self._save()
+
+    def _load(self, rejected: Text = None):
+        """Loads a persisted token, if there is one that has not expired yet, nor been rejected."""
+        cached = _read_cache(self.cache_path)
+        if cached is None or cached.get("username") != self.username or cached["access_token"] == rejected:
+            return
+        if time() < cached["expires_at"] - self.refresh_margin:
+            self._token = cached["access_token"]
+            self._expires_at = cached["expires_at"]
+
+    def _save(self):
+        """
+        Persists the current token, readable by the owner only.
+
+        Persisting is best-effort: the token stays usable by this process if the file cannot be written.
+        """
+        cached = {"username": self.username, "access_token": self._token, "expires_at": self._expires_at}
+        # a temporary file of its own, as other processes may be saving their token at the same time
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".token-", suffix=".tmp",
+                                            dir=os.path.dirname(os.path.abspath(self.cache_path)))
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(cached, f)
+            # replace atomically, so that concurrent processes never read a partial file
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def _read_cache(path: Text) -> Optional[dict]:
+    """
+    Reads a persisted token file.
+
+    Args:
+        path: Path of the token file.
+
+    Returns:
+        Persisted token as key-value pairs, None if the file is missing or unreadable.
+    """
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or "access_token" not in cached or "expires_at" not in cached:
+        return None
+    return cached
@@ -0,0 +1,337 @@
+"""
+Lightweight HTTP transport built on the standard library, for processes making few calls.
+
+Importing requests takes about 100 ms, most of the run time of a process making a single call, such as the
+command-line tool. This transport sends the requests of an AeiClient over keep-alive http.client connections
+instead, and only imports requests to raise its exceptions, so that callers catching them, resilience included,
+work the same with either transport.
+"""
+
+import json
+import select
+import socket
+import zlib
+from http.client import HTTPConnection, HTTPException, HTTPResponse, HTTPSConnection
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Optional, Text, Tuple, Union
+from urllib.parse import urlencode, urlsplit
+
+DEFAULT_MAX_IDLE = 10
+DEFAULT_ACCEPT_ENCODING = "gzip, deflate"
+
+# methods whose request may be sent twice, even once received by the service
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"))
+
+# connection key: scheme, host and port
+_Key = Tuple[Text, Text, Optional[int]]
+
+
+class StdlibSession:
+    """
+    Sends requests over keep-alive connections, as the subset of a requests session an AeiClient uses.
+
+    Response bodies encoded with gzip or deflate are decoded, and zstd too if the zstandard package is installed.
+    Redirects are not followed.
+    """
+    def __init__(self, max_idle: int = DEFAULT_MAX_IDLE):
+        """
+        Constructs a session.
+
+        Args:
+            max_idle: Maximum number of idle keep-alive connections kept per host.
+        """
+        self.max_idle = max_idle
+        self._idle: Dict[_Key, List[HTTPConnection]] = {}
+        self._lock = Lock()
+
+    def request(self, method: Text, url: Text, data: Any = None, headers: Dict[Text, Text] = None,
+                timeout: Union[float, Tuple[float, float]] = None, stream: bool = False) -> "StdlibResponse":
+        """
+        Sends a request.
+
+        Args:
+            method: HTTP method.
+            url: Request URL.
+            data: Request body, either form fields as a dict or a list of key-value pairs, text, bytes or an iterable
+                of byte chunks.
+            headers: Request headers.
+            timeout: Timeout in seconds, either a single value or a (connect, read) tuple, None for no timeout.
+            stream: True to read the response body only when it is accessed.
+
+        Returns:
+            Response to the request.
+
+        Raises:
+            requests.exceptions.ConnectionError: If the connection failed.
+            requests.exceptions.Timeout: If connecting to, or reading from, the service timed out.
+        """
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+
+        headers = dict(headers or {})
+        headers.setdefault("Accept-Encoding", DEFAULT_ACCEPT_ENCODING)
+        body, chunked = _encode_body(data, headers)
+
+        # an idle connection may have been closed by the service meanwhile, which is only known once used
+        connection = self._take(key)
+        reused = connection is not None
+        while True:
+            if connection is None:
+                connection = _connect(key, connect_timeout)
+            connecting = connection.sock is None
+            sending = True
+            try:
+                if connecting:
+                    connection.connect()
+                    connecting = False
+                connection.sock.settimeout(read_timeout)
+                connection.request(method, path, body=body, headers=headers, encode_chunked=chunked)
+                sending = False
+                raw = connection.getresponse()
+                break
+            except (OSError, HTTPException) as e:
+                connection.close()
+                if reused and _may_resend(e, method, sending, chunked):
+                    connection, reused = None, False
+                    continue
+                _raise_transport_error(e, url, connecting)
+
+        response = StdlibResponse(raw, url, lambda: self._release(key, connection, raw))
+        if not stream:
+            # reads the body, releasing the connection
+            response.content
+        return response
+
+    def head(self, url: Text, **kwargs) -> "StdlibResponse":
+        """
+        Sends a HEAD request.
+
+        Args:
+            url: Request URL.
+            **kwargs: Arguments of request.
+
+        Returns:
+            Response to the request.
+        """
+        return self.request("HEAD", url, **kwargs)
+
+    def close(self):
+        """Closes all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def _take(self, key: _Key) -> Optional[HTTPConnection]:
+        """Takes an idle connection, closing those the service is known to have closed meanwhile."""
+        while True:
+            with self._lock:
+                connections = self._idle.get(key)
+                connection = connections.pop() if connections else None
+            if connection is None or not _dropped(connection):
+                return connection
+            connection.close()
+
+    def _release(self, key: _Key, connection: HTTPConnection, raw: HTTPResponse):
+        """Keeps the connection of a fully read response for the next requests, unless the service closes it."""
+        if raw.will_close:
+            connection.close()
+            return
+        with self._lock:
+            connections = self._idle.setdefault(key, [])
+            if len(connections) < self.max_idle:
+                connections.append(connection)
+                return
+        connection.close()
+
+
+class StdlibResponse:
+    """Response of a StdlibSession, with the attributes and methods of a requests response the client relies on."""
+    def __init__(self, raw: HTTPResponse, url: Text, release):
+        """
+        Constructs a response whose body is not read yet.
+
+        Args:
+            raw: Response of the connection.
+            url: Request URL.
+            release: Function releasing the connection once the body is fully read.
+        """
+        self.raw = raw
+        self.url = url
+        self.status_code = raw.status
+        self.reason = raw.reason
+        self.headers = raw.headers
+        self._release = release
+        self._content: Optional[bytes] = None
+
+    @property
+    def ok(self) -> bool:
+        """True if the status code is not an error one."""
+        return self.status_code < 400
+
+    @property
+    def content(self) -> bytes:
+        """Decoded response body, read on first access."""
+        if self._content is None:
+            self._content = b"".join(self.iter_content(chunk_size=64 * 1024))
+        return self._content
+
+    @property
+    def text(self) -> Text:
+        """Response body as text, in the charset of its content type, UTF-8 by default."""
+        charset = self.headers.get_content_charset() or "utf-8"
+        return self.content.decode(charset, errors="replace")
+
+    def json(self) -> Any:
+        """
+        Decodes the response body.
+
+        Returns:
+            Decoded JSON body.
+
+        Raises:
+            ValueError: If the body is not valid JSON.
+        """
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size: int = 1) -> Iterator[bytes]:
+        """
+        Reads the decoded response body chunk by chunk.
+
+        Args:
+            chunk_size: Maximum number of bytes read at once.
+
+        Returns:
+            Iterator over the decoded chunks.
+
+        Raises:
+            requests.exceptions.ConnectionError: If the connection failed while reading the body.
+        """
+        if self._content is not None:
+            yield self._content
+            return
+        decoder = _decoder(self.headers.get("Content-Encoding"))
+        try:
+            while True:
+                chunk = self.raw.read(chunk_size)
+                if not chunk:
+                    break
+                chunk = decoder.decompress(chunk) if decoder is not None else chunk
+                if chunk:
+                    yield chunk
+        except (OSError, HTTPException) as e:
+            self.raw.close()
+            _raise_transport_error(e, self.url, False)
+        if decoder is not None:
+            chunk = decoder.flush()
+            if chunk:
+                yield chunk
+        # closes the response only, its connection being kept alive
+        self.raw.close()
+        self._release()
+
+    def raise_for_status(self):
+        """
+        Raises the error of an error status code.
+
+        Raises:
+            requests.exceptions.HTTPError: If the status code is an error one.
+        """
+        if self.status_code >= 400:
+            from requests.exceptions import HTTPError
+            kind = "Client" if self.status_code < 500 else "Server"
+            raise HTTPError("%d %s Error: %s for url: %s" % (self.status_code, kind, self.reason, self.url),
+                            response=self)
+
+    def close(self):
+        """Closes the response, and its connection unless the body was fully read."""
+        if not self.raw.isclosed():
+            self.raw.close()
+
+    def __enter__(self) -> "StdlibResponse":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _connect(key: _Key, timeout: Optional[float]) -> HTTPConnection:
+    scheme, host, port = key
+    if scheme == "https":
+        return HTTPSConnection(host, port, timeout=timeout)
+    if scheme == "http":
+        return HTTPConnection(host, port, timeout=timeout)
+    from requests.exceptions import InvalidSchema
+    raise InvalidSchema("No connection adapters were found for scheme %r." % scheme)
+
+
+def _dropped(connection: HTTPConnection) -> bool:
+    """True if an idle connection was closed by the service, an idle socket being readable only then."""
+    if connection.sock is None:
+        return True
+    try:
+        readable, _, _ = select.select([connection.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+def _may_resend(error: Exception, method: Text, sending: bool, chunked: bool) -> bool:
+    """
+    Tells whether a request failing on a reused connection may be sent again on a new one.
+
+    A request failing while being sent was not processed, the connection having been closed by the service while
+    idle, whereas one failing while its response is awaited may have been, so is only sent again if idempotent.
+    Timeouts are never retried, nor streamed bodies, which may not be read again.
+    """
+    if chunked or isinstance(error, socket.timeout):
+        return False
+    return sending or method.upper() in IDEMPOTENT_METHODS
+
+
+def _encode_body(data: Any, headers: Dict[Text, Text]) -> Tuple[Any, bool]:
+    """
+    Encodes a request body as the requests library does.
+
+    Returns:
+        Body to send and whether it is sent in chunks, its length being unknown.
+    """
+    if data is None:
+        return None, False
+    if isinstance(data, dict) or (isinstance(data, list) and all(isinstance(field, tuple) for field in data)):
+        if not any(name.lower() == "content-type" for name in headers):
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        return urlencode(data, doseq=True).encode("utf-8"), False
+    if isinstance(data, str):
+        return data.encode("utf-8"), False
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return data, False
+    # chunks of unknown total length, such as streamed images
+    return data, True
+
+
+def _decoder(encoding: Optional[Text]) -> Any:
+    """Gets the incremental decoder of a body sent with given content encoding, None for identity."""
+    encoding = (encoding or "").strip().lower()
+    if encoding == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return zlib.decompressobj()
+    if encoding == "zstd":
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj()
+    return None
+
+
+def _raise_transport_error(error: Exception, url: Text, connecting: bool):
+    """Raises the requests exception matching a connection error, connecting being True if it failed to connect."""
+    from requests import exceptions
+    if isinstance(error, socket.timeout):
+        kind = exceptions.ConnectTimeout if connecting else exceptions.ReadTimeout
+        raise kind("%s timed out: %s" % (url, error)) from error
+    raise exceptions.ConnectionError("%s failed: %s" % (url, error)) from error
@@ -0,0 +1,248 @@
+"""
+Streamed image upload bodies of the aEi.ai Python API.
+
+Images given as file paths are memory-mapped and sent in bounded chunks with chunked transfer encoding,
+so that neither the file nor its base64 encoding is ever held in memory as a whole.
+"""
+
+import errno
+import mimetypes
+import os
+from base64 import b64encode
+from mmap import ACCESS_READ, mmap
+from typing import Any, BinaryIO, Dict, Iterator, List, Text, Union
+
+from api import codec
+
+ImageSource = Union[Text, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+# a multiple of 3, so that base64 encoded chunks concatenate into one valid base64 string
+DEFAULT_UPLOAD_CHUNK_SIZE = 3 * 64 * 1024
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+URL_PREFIXES = ("http://", "https://", "data:")
+
+_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp")
+]
+
+
+def is_image_url(image: Any) -> bool:
+    """
+    Asserts if given image is passed by URL, including data URLs, rather than by content.
+
+    Args:
+        image: Image URL, file path, bytes or file-like object.
+
+    Returns:
+        True if the image is an http, https or data URL, false otherwise, for example for file paths.
+    """
+    return isinstance(image, str) and image[:8].lower().startswith(URL_PREFIXES)
+
+
+def is_buffer(image: Any) -> bool:
+    """
+    Asserts if given image content is already in memory.
+
+    Args:
+        image: Image URL, file path, bytes or file-like object.
+
+    Returns:
+        True if the image is bytes, a bytearray or a memoryview, false otherwise.
+    """
+    return isinstance(image, (bytes, bytearray, memoryview))
+
+
+class ImageBody:
+    """
+    Image content read in bounded chunks from a file path, an in-memory buffer or a file-like object.
+
+    The body can be iterated more than once, so that a request sending it can be retried. A file-like
+    object can only be sent again if it is seekable.
+    """
+    def __init__(self, image: ImageSource, chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE):
+        """
+        Constructs an image body.
+
+        Args:
+            image: File path, bytes, bytearray, memoryview or binary file-like object.
+            chunk_size: Maximum number of bytes read at once.
+
+        Raises:
+            FileNotFoundError: If the image is given by a path that is not an existing file, for example, a
+                mistyped path or a URL of an unsupported scheme.
+            TypeError: If the image is of none of the supported types.
+        """
+        self.path = None
+        self.buffer = None
+        self.file = None
+        self.chunk_size = chunk_size
+
+        if isinstance(image, (str, os.PathLike)):
+            self.path = os.fspath(image)
+            if not os.path.isfile(self.path):
+                raise FileNotFoundError(errno.ENOENT, "Image is neither an http(s) or data URL nor a file", self.path)
+            self.content_type = mimetypes.guess_type(self.path)[0] or DEFAULT_CONTENT_TYPE
+        elif is_buffer(image):
+            self.buffer = memoryview(image).cast("B")
+            self.content_type = sniff_content_type(self.buffer[:16])
+        elif hasattr(image, "read"):
+            self.file = image
+            self._start = image.tell() if _is_seekable(image) else None
+            self.content_type = self._sniff_file()
+        else:
+            raise TypeError("Image must be a URL, a file path, bytes or a file-like object, not %s."
+                            % type(image).__name__)
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self.path is not None:
+            return self._iter_path()
+        if self.buffer is not None:
+            return self._iter_buffer(self.buffer)
+        return self._iter_file()
+
+    def iter_base64(self) -> Iterator[bytes]:
+        """
+        Encodes the image in base64, chunk by chunk.
+
+        Returns:
+            Iterator of base64 encoded chunks, which concatenate into the encoding of the whole image.
+        """
+        pending = b""
+        for chunk in self:
+            # file-like objects may return short reads, keep the encoded chunks aligned to 3 bytes
+            if pending or len(chunk) % 3:
+                chunk = pending + bytes(chunk)
+                split = len(chunk) - len(chunk) % 3
+                chunk, pending = chunk[:split], chunk[split:]
+            if chunk:
+                yield b64encode(chunk)
+        if pending:
+            yield b64encode(pending)
+
+    def _iter_path(self) -> Iterator[bytes]:
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return
+            # slicing the mapping copies one chunk at a time, the pages themselves stay in the OS page cache
+            with mmap(f.fileno(), 0, access=ACCESS_READ) as mapped:
+                for offset in range(0, size, self.chunk_size):
+                    yield mapped[offset:offset + self.chunk_size]
+
+    def _iter_buffer(self, buffer: memoryview) -> Iterator[memoryview]:
+        for offset in range(0, len(buffer), self.chunk_size):
+            yield buffer[offset:offset + self.chunk_size]
+
+    def _iter_file(self) -> Iterator[bytes]:
+        if self._start is not None:
+            self.file.seek(self._start)
+        while True:
+            chunk = self.file.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def _sniff_file(self) -> Text:
+        name = getattr(self.file, "name", None)
+        if isinstance(name, str):
+            content_type = mimetypes.guess_type(name)[0]
+            if content_type is not None:
+                return content_type
+        if self._start is None:
+            return DEFAULT_CONTENT_TYPE
+        # file-like objects may return short reads, too short to hold a signature
+        head = b""
+        while len(head) < 16:
+            chunk = self.file.read(16 - len(head))
+            if not chunk:
+                break
+            head += chunk
+        self.file.seek(self._start)
+        return sniff_content_type(head)
+
+
+def sniff_content_type(head: Union[bytes, memoryview]) -> Text:
+    """
+    Detects the content type of an image from its first bytes.
+
+    Args:
+        head: First bytes of the image, at least 12 to detect all supported formats.
+
+    Returns:
+        Image MIME type, application/octet-stream if the format is not recognized.
+    """
+    head = bytes(head)
+    for signature, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return DEFAULT_CONTENT_TYPE
+
+
+class InputsBody:
+    """
+    Multi-input JSON body whose images given by content are embedded as base64 data URLs, encoded while
+    the body is sent.
+    """
+    def __init__(self, inputs: List[Dict[Text, Any]], chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE):
+        """
+        Constructs a multi-input body.
+
+        Args:
+            inputs: Input entries built by text_input or image_input, in the order they should be analyzed.
+            chunk_size: Maximum number of image bytes read at once.
+        """
+        self.inputs = inputs
+        # bodies are built once, so that file-like objects are sent again from the same position on retries
+        self._images = {i: ImageBody(entry["image"], chunk_size=chunk_size) for i, entry in enumerate(inputs)
+                        if entry.get("image") is not None and not is_image_url(entry["image"])}
+
+    def __iter__(self) -> Iterator[bytes]:
+        # text is buffered so that small entries are sent together rather than as one chunk each
+        text = ['{"inputs": [']
+        for i, entry in enumerate(self.inputs):
+            if i > 0:
+                text.append(", ")
+            body = self._images.get(i)
+            if body is None:
+                text.append(codec.dumps(entry))
+                continue
+
+            fields = codec.dumps({key: value for key, value in entry.items() if key != "image"})
+            text.append(fields[:-1] + (", " if len(fields) > 2 else "") + '"image": "data:%s;base64,'
+                        % body.content_type)
+            yield "".join(text).encode("utf-8")
+            yield from body.iter_base64()
+            text = ['"}']
+        text.append("]}")
+        yield "".join(text).encode("utf-8")
+
+
+def inputs_body(inputs: List[Dict[Text, Any]]) -> Union[Text, InputsBody]:
+    """
+    Builds the body of a multi-input request.
+
+    Args:
+        inputs: Input entries built by text_input or image_input, in the order they should be analyzed.
+
+    Returns:
+        Inputs as JSON string when all images are URLs, a streamed body otherwise.
+    """
+    for entry in inputs:
+        image = entry.get("image")
+        if image is not None and not is_image_url(image):
+            return InputsBody(inputs)
+    return codec.dumps({"inputs": inputs})
+
+
+def _is_seekable(file: BinaryIO) -> bool:
+    try:
+        return file.seekable()
+    except (AttributeError, ValueError):
+        return False
+
@@ -0,0 +1,310 @@
+"""
+Adaptive polling of aEi.ai users' emotion and mood, notifying only meaningful changes.
+"""
+
+import hashlib
+import heapq
+import math
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition, Thread
+from time import monotonic
+from typing import Any, Callable, Dict, Iterable, List, Optional, Text, Tuple, Union
+
+from requests.models import Response
+
+from api import codec
+from api.aei_ai import AeiClient, default_client
+from api.affect import FACETS, pad_distance, pad_scores
+from api.instrumentation import InputTracker
+from api.tokens import TokenProvider
+
+DEFAULT_MIN_INTERVAL = 1.0
+DEFAULT_MAX_INTERVAL = 60.0
+DEFAULT_BACKOFF = 2.0
+DEFAULT_THRESHOLD = 0.05
+
+PAD = Tuple[float, float, float]
+WatchCallback = Callable[[Text, Text, Optional[PAD], PAD], None]
+
+
+class _Watched:
+    """Polling state of one facet of one user, updated while holding the watch lock."""
+    __slots__ = ("user_id", "facet", "interval", "due", "version", "etag", "digest", "reported", "polling")
+
+    def __init__(self, user_id: Text, facet: Text, interval: float, due: float):
+        self.user_id = user_id
+        self.facet = facet
+        self.interval = interval
+        self.due = due
+        self.version = 0
+        self.etag: Optional[Text] = None
+        self.digest: Optional[bytes] = None
+        self.reported: Optional[PAD] = None
+        self.polling = False
+
+
+class Watch:
+    """
+    Polls the facets of watched users, each at its own interval, and calls back when their PAD moves.
+
+    A facet is polled every min_interval seconds after it changed, and its interval grows by the backoff factor at
+    every poll finding it stable, up to max_interval. Inputs of watched users sent through the client bring their
+    next poll forward to min_interval seconds. Polls are conditional requests on the ETag of the previous response,
+    and responses without ETag are compared by content hash, so that unchanged payloads are never decoded.
+
+    Example:
+        with Watch(user_ids, callback=print, access_token=access_token, client=client):
+            ...
+    """
+    def __init__(self, user_ids: Iterable[Text], callback: WatchCallback, access_token: Union[Text, TokenProvider],
+                 facets: Iterable[Text] = ("emotion",), client: AeiClient = None,
+                 min_interval: float = DEFAULT_MIN_INTERVAL, max_interval: float = DEFAULT_MAX_INTERVAL,
+                 backoff: float = DEFAULT_BACKOFF, threshold: float = DEFAULT_THRESHOLD, max_workers: int = None,
+                 on_error: Callable[[Text, Text, Any], None] = None):
+        """
+        Constructs a watch, polling once started.
+
+        Args:
+            user_ids: IDs of the users to watch.
+            callback: Function called with user ID, facet, previously reported PAD and new PAD, from a polling
+                thread, when the distance between both PAD is at least the threshold. The first poll of each facet
+                is reported with None as previous PAD. Missing scores are NaN, a score appearing or going missing
+                is always reported, and polls without any score are not.
+            access_token: Client's access token, or a TokenProvider, so that polls keep working after the token
+                expires, as long-lived watches need.
+            facets: Facets to watch, emotion and/or mood.
+            client: aEi.ai API client to call, the default client if not given.
+            min_interval: Polling interval in seconds after a change or an input.
+            max_interval: Polling interval in seconds of facets that stay stable.
+            backoff: Factor the interval grows by after each poll finding no meaningful change.
+            threshold: Minimum Euclidean distance between reported and new PAD to call back.
+            max_workers: Maximum number of polls in flight, the client's connection pool size if not given.
+            on_error: Function called with user ID, facet, and failed response or exception, None to ignore errors.
+        """
+        self.client = client if client is not None else default_client()
+        self.callback = callback
+        self.access_token = access_token
+        self.facets = list(facets)
+        for facet in self.facets:
+            if facet not in FACETS:
+                raise ValueError("Unknown watched facet: " + facet)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.threshold = threshold
+        self.max_workers = max_workers if max_workers is not None else self.client.pool_maxsize
+        self.on_error = on_error
+        self.inputs = InputTracker(listener=self._on_input)
+
+        self._condition = Condition()
+        self._watched: Dict[Tuple[Text, Text], _Watched] = {}
+        self._queue: List[Tuple[float, int, Text, Text]] = []
+        self._stats = {"polls": 0, "not_modified": 0, "unchanged": 0, "decoded": 0, "notifications": 0,
+                       "errors": 0}
+        self._running = False
+        self._thread: Thread = None
+        self._executor: ThreadPoolExecutor = None
+        self.add(user_ids)
+
+    def add(self, user_ids: Iterable[Text]):
+        """
+        Starts watching users, polling them as soon as possible.
+
+        Args:
+            user_ids: IDs of the users to watch.
+        """
+        now = monotonic()
+        with self._condition:
+            for user_id in user_ids:
+                for facet in self.facets:
+                    if (user_id, facet) not in self._watched:
+                        watched = self._watched[(user_id, facet)] = _Watched(user_id, facet, self.min_interval, now)
+                        self._schedule(watched, now)
+            self._condition.notify()
+
+    def remove(self, user_ids: Iterable[Text]):
+        """
+        Stops watching users.
+
+        Args:
+            user_ids: IDs of the watched users.
+        """
+        with self._condition:
+            for user_id in user_ids:
+                for facet in self.facets:
+                    self._watched.pop((user_id, facet), None)
+
+    def start(self) -> "Watch":
+        """
+        Starts polling in background threads, and tracking the inputs sent through the client.
+
+        Returns:
+            The started watch.
+        """
+        self._running = True
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.client.add_hook(self.inputs)
+        self._thread = Thread(target=self._run, name="aei-watch", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops polling, waiting for the polls in flight."""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self.client.remove_hook(self.inputs)
+        if self._thread is not None:
+            self._thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "Watch":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def stats(self) -> Dict[Text, int]:
+        """
+        Gets the counts of the watch.
+
+        Returns:
+            Numbers of polls, of polls answered 304 Not Modified, of payloads unchanged by content hash, of decoded
+            payloads, of callback calls and of failed polls.
+        """
+        with self._condition:
+            return dict(self._stats)
+
+    def _on_input(self, user_id: Text, interaction_id: Optional[Text]):
+        """Brings the next polls of a user forward after an input of theirs."""
+        now = monotonic()
+        with self._condition:
+            for facet in self.facets:
+                watched = self._watched.get((user_id, facet))
+                if watched is None:
+                    continue
+                watched.interval = self.min_interval
+                if not watched.polling and watched.due > now + self.min_interval:
+                    self._schedule(watched, now + self.min_interval)
+            self._condition.notify()
+
+    def _schedule(self, watched: _Watched, due: float):
+        """Queues the next poll of a facet, must be called while holding the lock."""
+        watched.due = due
+        watched.version += 1
+        heapq.heappush(self._queue, (due, watched.version, watched.user_id, watched.facet))
+
+    def _run(self):
+        """Submits polls as they fall due, until stopped."""
+        with self._condition:
+            while self._running:
+                now = monotonic()
+                while self._queue and self._queue[0][0] <= now:
+                    _, version, user_id, facet = heapq.heappop(self._queue)
+                    watched = self._watched.get((user_id, facet))
+                    # entries of removed or rescheduled facets are stale
+                    if watched is None or watched.version != version:
+                        continue
+                    watched.polling = True
+                    self._executor.submit(self._poll, watched)
+                timeout = self._queue[0][0] - now if self._queue else None
+                self._condition.wait(timeout)
+
+    def _poll(self, watched: _Watched):
+        """Polls a facet, calls back if it changed, and schedules its next poll."""
+        error, pad = None, None
+        try:
+            getter = getattr(self.client, "get_user_" + watched.facet)
+            if isinstance(self.access_token, TokenProvider):
+                response = self.access_token.call(getter, user_id=watched.user_id, etag=watched.etag)
+            else:
+                response = getter(user_id=watched.user_id, access_token=self.access_token, etag=watched.etag)
+            changed, pad = self._read(watched, response)
+        except Exception as e:
+            changed, error = False, e
+        if changed and all(math.isnan(score) for score in pad):
+            # a payload without scores carries nothing to report, nor a move to compare
+            changed = False
+        elif changed and watched.reported is not None and pad_distance(watched.reported, pad) < self.threshold:
+            changed = False
+
+        previous = watched.reported
+        if changed:
+            watched.reported = pad
+            try:
+                self.callback(watched.user_id, watched.facet, previous, pad)
+            except Exception as e:
+                error = e
+        if error is not None and self.on_error is not None:
+            self.on_error(watched.user_id, watched.facet, error)
+
+        with self._condition:
+            self._stats["polls"] += 1
+            self._stats["notifications"] += changed
+            self._stats["errors"] += error is not None
+            watched.polling = False
+            if self._watched.get((watched.user_id, watched.facet)) is not watched:
+                return
+            if changed:
+                watched.interval = self.min_interval
+            else:
+                watched.interval = min(watched.interval * self.backoff, self.max_interval)
+            self._schedule(watched, monotonic() + watched.interval)
+            self._condition.notify()
+
+    def _read(self, watched: _Watched, response: Response) -> Tuple[bool, Optional[PAD]]:
+        """
+        Reads the PAD of a facet from a poll response, unless the payload did not change.
+
+        Args:
+            watched: Polled facet.
+            response: Response to the poll.
+
+        Returns:
+            True and the new PAD if the payload changed, false and None otherwise.
+
+        Raises:
+            ValueError: If the response is an error, or its body is not valid JSON.
+        """
+        if response.status_code == 304:
+            with self._condition:
+                self._stats["not_modified"] += 1
+            return False, None
+        if response.status_code != 200:
+            raise ValueError("Polling %s of user %s failed with status %d."
+                             % (watched.facet, watched.user_id, response.status_code))
+
+        watched.etag = response.headers.get("ETag")
+        digest = hashlib.blake2b(response.content, digest_size=16).digest()
+        if digest == watched.digest:
+            with self._condition:
+                self._stats["unchanged"] += 1
+            return False, None
+        watched.digest = digest
+
+        body = codec.response_json(response)
+        with self._condition:
+            self._stats["decoded"] += 1
+        return True, pad_scores(body.get(watched.facet, body) if isinstance(body, dict) else None)
+
+
+def watch(user_ids: Iterable[Text], facets: Iterable[Text], callback: WatchCallback,
+          access_token: Union[Text, TokenProvider], client: AeiClient = None, **kwargs) -> Watch:
+    """
+    Starts watching the facets of given users.
+
+    Args:
+        user_ids: IDs of the users to watch.
+        facets: Facets to watch, emotion and/or mood.
+        callback: Function called with user ID, facet, previously reported PAD and new PAD on meaningful changes.
+        access_token: Client's access token, or a TokenProvider.
+        client: aEi.ai API client to call, the default client if not given.
+        **kwargs: Other arguments of Watch.
+
+    Returns:
+        Started watch, to be stopped by the caller.
+    """
+    return Watch(user_ids, callback=callback, access_token=access_token, facets=facets, client=client,
+                 **kwargs).start()
+
@@ -0,0 +1,371 @@
+"""
+Benchmarks of the aEi.ai Python API, run against the in-process stand-in service.
+
+Measures client-side overhead per call, throughput and latency of sequential, threaded and async calls,
+memory needed to list users, and bytes on the wire with and without compression. Results are written as JSON,
+to compare releases.
+
+Usage:
+    python benchmark.py --output benchmark.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from time import perf_counter
+from timeit import Timer
+from typing import Any, Callable, Dict, List, Text
+
+from api import codec
+from api.aei_ai import AeiClient, auth_headers, inputs_2_string, params_2_string, text_input
+from api.compression import GZIP, ZSTD, Compression, zstandard
+from api.models import ModelList, User
+from api.standin import StandInServer, lognormal_latency, random_user
+from api.streaming import DEFAULT_CHUNK_SIZE, iter_json_array
+
+
+def time_per_call(function: Callable[[], Any], min_time: float = 0.2) -> float:
+    """
+    Measures the mean duration of a function call.
+
+    Args:
+        function: Function to call.
+        min_time: Minimum total duration of the measurement in seconds.
+
+    Returns:
+        Mean duration of one call in microseconds.
+    """
+    timer = Timer(function)
+    number, total = timer.autorange()
+    if total < min_time:
+        number = max(number, int(number * min_time / total))
+    best = min(timer.repeat(repeat=3, number=number))
+    return best / number * 1e6
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """
+    Computes a percentile with the nearest-rank method.
+
+    Args:
+        values: Measured values.
+        fraction: Percentile as a fraction, for example, 0.99.
+
+    Returns:
+        Percentile of the values.
+    """
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[Text, float]:
+    """
+    Summarizes call latencies.
+
+    Args:
+        latencies: Latency of each call in seconds.
+        elapsed: Wall time of all calls in seconds.
+
+    Returns:
+        Number of calls, calls per second, and p50/p99 latencies in milliseconds.
+    """
+    return {
+        "calls": len(latencies),
+        "calls_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3
+    }
+
+
+def bench_overhead() -> Dict[Text, float]:
+    """
+    Measures client-side work done per call, without any I/O.
+
+    Returns:
+        Mean duration in microseconds of each measured operation.
+    """
+    params = {"user_id": "5c2f1b7e9a8d4c3b2a1f0e9d", "interaction_id": "1a2b3c4d5e6f7a8b9c0d1e2f"}
+    inputs = [text_input("5c2f1b7e9a8d4c3b2a1f0e9d", "1a2b3c4d5e6f7a8b9c0d1e2f", "I am happy today")] * 100
+
+    rng = random.Random(0)
+    user_body = json.dumps({"users": [random_user(rng) for _ in range(1000)]}).encode("utf-8")
+
+    return {
+        "params_2_string_us": time_per_call(lambda: params_2_string(params=params)),
+        "auth_headers_us": time_per_call(lambda: auth_headers("0123456789abcdef0123456789abcdef")),
+        "inputs_2_string_100_inputs_us": time_per_call(lambda: inputs_2_string(inputs)),
+        "decode_1000_users_json_us": time_per_call(lambda: json.loads(user_body)),
+        "decode_1000_users_codec_us": time_per_call(lambda: codec.loads(user_body)),
+        "decode_1000_users_models_us": time_per_call(
+            lambda: [user.user_id for user in ModelList.from_bytes(user_body, "users", User)])
+    }
+
+
+def bench_sequential(server: StandInServer, token: Text, user_ids: List[Text], calls: int) -> Dict[Text, float]:
+    """
+    Measures calls made one after another through a pooled client.
+
+    Args:
+        server: Running stand-in service.
+        token: Access token accepted by the stand-in.
+        user_ids: IDs of existing users.
+        calls: Number of calls to make.
+
+    Returns:
+        Summary of the call latencies.
+    """
+    latencies = []
+    with AeiClient(base_url=server.url) as client:
+        start = perf_counter()
+        for i in range(calls):
+            call_start = perf_counter()
+            client.get_user_emotion(user_id=user_ids[i % len(user_ids)], access_token=token)
+            latencies.append(perf_counter() - call_start)
+        return summarize(latencies, perf_counter() - start)
+
+
+def bench_threaded(server: StandInServer, token: Text, user_ids: List[Text], calls: int,
+                   workers: int) -> Dict[Text, float]:
+    """
+    Measures calls made concurrently from a thread pool through one pooled client.
+
+    Args:
+        server: Running stand-in service.
+        token: Access token accepted by the stand-in.
+        user_ids: IDs of existing users.
+        calls: Number of calls to make.
+        workers: Number of threads.
+
+    Returns:
+        Summary of the call latencies.
+    """
+    def call(i: int) -> float:
+        call_start = perf_counter()
+        client.get_user_emotion(user_id=user_ids[i % len(user_ids)], access_token=token)
+        return perf_counter() - call_start
+
+    with AeiClient(base_url=server.url, pool_maxsize=workers, warm_up=workers) as client:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            start = perf_counter()
+            latencies = list(executor.map(call, range(calls)))
+            return summarize(latencies, perf_counter() - start)
+
+
+def bench_async(server: StandInServer, token: Text, user_ids: List[Text], calls: int,
+                concurrency: int) -> Dict[Text, float]:
+    """
+    Measures calls made concurrently from one event loop.
+
+    Args:
+        server: Running stand-in service.
+        token: Access token accepted by the stand-in.
+        user_ids: IDs of existing users.
+        calls: Number of calls to make.
+        concurrency: Maximum number of calls in flight.
+
+    Returns:
+        Summary of the call latencies.
+    """
+    from api.aei_ai_async import AsyncAeiClient
+
+    async def run_calls() -> Dict[Text, float]:
+        async with AsyncAeiClient(base_url=server.url, concurrency=concurrency) as client:
+            async def call(i: int) -> float:
+                call_start = perf_counter()
+                await client.get_user_emotion(user_id=user_ids[i % len(user_ids)], access_token=token)
+                return perf_counter() - call_start
+
+            start = perf_counter()
+            latencies = await asyncio.gather(*[call(i) for i in range(calls)])
+            return summarize(list(latencies), perf_counter() - start)
+
+    return asyncio.run(run_calls())
+
+
+def bench_listing_memory(server: StandInServer, token: Text) -> Dict[Text, float]:
+    """
+    Measures peak memory allocated to decode the list of all users of the stand-in.
+
+    The body is downloaded before measuring, so that only client-side decoding is measured, not the
+    stand-in running in the same process.
+
+    Args:
+        server: Running stand-in service holding the users to list.
+        token: Access token accepted by the stand-in.
+
+    Returns:
+        Number of users, and peak memory in bytes when decoding the whole list and when streaming it.
+    """
+    with AeiClient(base_url=server.url) as client:
+        content = client.get_user_list(access_token=token).content
+
+    tracemalloc.start()
+    users = json.loads(content)["users"]
+    count = len(users)
+    decoded_peak = tracemalloc.get_traced_memory()[1]
+    del users
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    chunks = (content[i:i + DEFAULT_CHUNK_SIZE] for i in range(0, len(content), DEFAULT_CHUNK_SIZE))
+    streamed = sum(1 for _ in iter_json_array(chunks, "users"))
+    streamed_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "users": count,
+        "body_bytes": len(content),
+        "decoded_peak_bytes": decoded_peak,
+        "streamed_peak_bytes": streamed_peak,
+        "decoded_bytes_per_user": decoded_peak / max(count, 1),
+        "streamed_users": streamed
+    }
+
+
+def random_text(rng: random.Random, words: int) -> Text:
+    """
+    Generates a chat-like utterance, drawn from a small vocabulary so that it compresses like real text.
+
+    Args:
+        rng: Random generator.
+        words: Number of words.
+
+    Returns:
+        Utterance.
+    """
+    return " ".join(rng.choice(_VOCABULARY) for _ in range(words))
+
+
+_VOCABULARY = ("i", "you", "we", "the", "a", "is", "was", "not", "really", "very", "so", "and", "but", "today",
+               "feel", "think", "know", "happy", "sad", "angry", "tired", "great", "terrible", "order", "delivery",
+               "late", "refund", "thanks", "please", "help", "again", "never", "always", "service", "support",
+               "waiting", "hours", "problem", "fixed", "still", "broken", "love", "hate", "okay", "sure", "why")
+
+
+def bench_compression(calls: int, batch_size: int, users: int, bandwidth: float) -> Dict[Text, Any]:
+    """
+    Measures bytes on the wire and latency of large inputs and user listings, with and without compression.
+
+    Args:
+        calls: Number of calls per endpoint and algorithm.
+        batch_size: Number of inputs sent per call.
+        users: Number of users listed per call.
+        bandwidth: Link bandwidth simulated by the stand-in in bytes per second.
+
+    Returns:
+        Request bytes per input call, response bytes per listing call, and their latency summaries, for
+        no compression and for each available algorithm.
+    """
+    rng = random.Random(0)
+    results = {}
+    for algorithm in [None, GZIP] + ([ZSTD] if zstandard is not None else []):
+        threshold = None if algorithm is None else 1024
+        with StandInServer(seed=0, compression_threshold=threshold, bandwidth=bandwidth) as server:
+            token = server.issue_token()
+            user_ids = server.add_users(users)
+            compression = Compression(algorithm) if algorithm is not None else None
+            with AeiClient(base_url=server.url, compression=compression) as client:
+                response = client.create_new_interaction(user_ids=user_ids[:2], access_token=token)
+                interaction_id = response.json()["interaction"]["interactionId"]
+                batches = [[text_input(user_ids[i % 2], interaction_id, random_text(rng, 30))
+                            for i in range(batch_size)] for _ in range(calls)]
+
+                server.reset_stats()
+                latencies = []
+                start = perf_counter()
+                for batch in batches:
+                    call_start = perf_counter()
+                    client.send_inputs(inputs=inputs_2_string(batch), access_token=token)
+                    latencies.append(perf_counter() - call_start)
+                send_inputs = summarize(latencies, perf_counter() - start)
+                send_inputs["request_bytes_per_call"] = server.stats()["bytes_in"] / calls
+
+                server.reset_stats()
+                latencies = []
+                start = perf_counter()
+                for _ in range(calls):
+                    call_start = perf_counter()
+                    client.get_user_list(access_token=token).content
+                    latencies.append(perf_counter() - call_start)
+                get_user_list = summarize(latencies, perf_counter() - start)
+                get_user_list["response_bytes_per_call"] = server.stats()["bytes_out"] / calls
+
+        results[algorithm or "none"] = {"send_inputs": send_inputs, "get_user_list": get_user_list}
+    return results
+
+
+def run(calls: int, workers: int, latency: float, users: int, modes: List[Text],
+        bandwidth: float = 10e6) -> Dict[Text, Any]:
+    """
+    Runs the benchmarks.
+
+    Args:
+        calls: Number of calls per throughput benchmark.
+        workers: Number of threads, and of concurrent async calls.
+        latency: Median latency added by the stand-in in seconds.
+        users: Number of users to list in the memory benchmark.
+        modes: Throughput benchmarks to run, any of sequential, threaded and async.
+        bandwidth: Link bandwidth in bytes per second simulated in the compression benchmark.
+
+    Returns:
+        Benchmark results.
+    """
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "json_codec": codec.get_codec().name,
+        "parameters": {"calls": calls, "workers": workers, "latency": latency, "users": users, "bandwidth": bandwidth},
+        "overhead": bench_overhead(),
+        "throughput": {}
+    }
+
+    with StandInServer(latency=lognormal_latency(latency) if latency > 0 else None, seed=0) as server:
+        token = server.issue_token()
+        user_ids = server.add_users(100)
+        if "sequential" in modes:
+            results["throughput"]["sequential"] = bench_sequential(server, token, user_ids, calls)
+        if "threaded" in modes:
+            results["throughput"]["threaded"] = bench_threaded(server, token, user_ids, calls, workers)
+        if "async" in modes:
+            results["throughput"]["async"] = bench_async(server, token, user_ids, calls, workers)
+
+    with StandInServer(seed=0) as server:
+        token = server.issue_token()
+        server.add_users(users)
+        results["memory"] = bench_listing_memory(server, token)
+
+    results["compression"] = bench_compression(calls=max(1, calls // 50), batch_size=500, users=1000,
+                                               bandwidth=bandwidth)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the aEi.ai Python API against a local stand-in.")
+    parser.add_argument("--output", default="benchmark.json", help="path of the JSON results file")
+    parser.add_argument("--calls", type=int, default=1000, help="number of calls per throughput benchmark")
+    parser.add_argument("--workers", type=int, default=32, help="number of threads and concurrent async calls")
+    parser.add_argument("--latency", type=float, default=0.005, help="median stand-in latency in seconds")
+    parser.add_argument("--users", type=int, default=100000, help="number of users in the memory benchmark")
+    parser.add_argument("--bandwidth", type=float, default=10e6,
+                        help="link bandwidth in bytes per second in the compression benchmark")
+    parser.add_argument("--modes", nargs="+", default=["sequential", "threaded", "async"],
+                        choices=["sequential", "threaded", "async"], help="throughput benchmarks to run")
+    args = parser.parse_args()
+
+    results = run(calls=args.calls, workers=args.workers, latency=args.latency, users=args.users, modes=args.modes,
+                  bandwidth=args.bandwidth)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Bulk ingestion of a JSONL utterance log into aEi.ai.
+
+Each line of the log is {"user_id": ..., "interaction_id": ..., "text": ...}, or with "image" instead of "text".
+Progress is checkpointed, so that running the same command again after a crash resumes where it stopped.
+
+Usage:
+    AEI_USERNAME=... AEI_PASSWORD=... python ingest.py chats.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from api.aei_ai import AEI_AI_URL, AeiClient
+from api.ingestion import DEFAULT_BATCH_SIZE, DEFAULT_REPORT_INTERVAL, DEFAULT_WORKERS, IngestionError, \
+    IngestionStats, Ingestor
+from api.resilience import CircuitBreaker, Resilience, RetryPolicy
+from api.tokens import TokenProvider
+
+
+def report(stats: IngestionStats):
+    """
+    Prints the progress of the run.
+
+    Args:
+        stats: Counts of the run.
+    """
+    print("sent %d, failed %d, invalid %d, skipped %d, %.1f records/s"
+          % (stats.sent, stats.failed, stats.invalid, stats.skipped, stats.records_per_second()), file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest a JSONL utterance log into aEi.ai, resuming if interrupted.")
+    parser.add_argument("log", help="path of the JSONL log")
+    parser.add_argument("--checkpoint", help="path of the checkpoint file, the log path suffixed by .checkpoint "
+                                             "by default")
+    parser.add_argument("--base-url", default=AEI_AI_URL, help="base URL of the aEi.ai service")
+    parser.add_argument("--username", default=os.environ.get("AEI_USERNAME"), help="username, $AEI_USERNAME by default")
+    parser.add_argument("--password", default=os.environ.get("AEI_PASSWORD"), help="password, $AEI_PASSWORD by default")
+    parser.add_argument("--token-cache", help="path of a file to cache the access token in")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="number of concurrent senders, that of the resumed run when resuming")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="number of log lines whose records a sender sends per call, that of the resumed run "
+                             "when resuming")
+    parser.add_argument("--report-interval", type=float, default=DEFAULT_REPORT_INTERVAL,
+                        help="number of seconds between progress reports")
+    args = parser.parse_args()
+
+    if not args.username or not args.password:
+        parser.error("username and password are required")
+
+    resilience = Resilience(retry_policy=RetryPolicy(), circuit_breaker=CircuitBreaker())
+    with AeiClient(base_url=args.base_url, pool_maxsize=args.workers, resilience=resilience) as client:
+        tokens = TokenProvider(username=args.username, password=args.password, client=client,
+                               cache_path=args.token_cache)
+        ingestor = Ingestor(tokens=tokens, client=client, workers=args.workers, batch_size=args.batch_size,
+                            report_interval=args.report_interval, on_report=report)
+        try:
+            stats = ingestor.run(args.log, checkpoint_path=args.checkpoint)
+        except IngestionError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+    print(json.dumps(stats.to_dict(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
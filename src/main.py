@@ -1,5 +1,6 @@
 import sys
 from api.aei_ai import *
+from api.models import ModelList, User
 
 # replace username with your username
 USERNAME = "<YOUR USERNAME>"
@@ -59,11 +60,11 @@ def main():
         sys.exit(1)
 
     # get all user models
-    users = get_user_list(access_token=access_token).json()["users"]
+    users = ModelList.from_response(get_user_list(access_token=access_token), key="users", model=User)
     # NOTICE: user1 says she is happy, and user2 empathizes with her (e.g., check out emotion pleasure scores)
     for user in users:
-        pad = user["affect"]["emotion"]["pad"]
-        print("User[%s] Emotion PAD: (%1.2f, %1.2f, %1.2f)" % (user['userId'], pad['pleasure'], pad['arousal'], pad['dominance']))
+        pad = user.affect.emotion.pad
+        print("User[%s] Emotion PAD: (%1.2f, %1.2f, %1.2f)" % (user.user_id, pad.pleasure, pad.arousal, pad.dominance))
 
     # check how many free queries you've made until now
     queries = get_used_free_queries(access_token=access_token).json()["queries"]
@@ -0,0 +1,64 @@
+"""
+Tests of the asynchronous client, run against the in-process stand-in service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import asyncio
+import io
+import os
+import tempfile
+import unittest
+
+from api.aei_ai import image_input, text_input
+from api.aei_ai_async import AsyncAeiClient
+from api.standin import StandInServer
+
+_PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 64
+
+
+class AsyncClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer(seed=0).start()
+        self.addCleanup(self.server.stop)
+        self.user_ids = self.server.add_users(1)
+        self.token = self.server.issue_token()
+
+        fd, self.image_path = tempfile.mkstemp(suffix=".png")
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PNG)
+        self.addCleanup(os.remove, self.image_path)
+
+    def _run(self, scenario):
+        async def run():
+            async with AsyncAeiClient(base_url=self.server.url) as client:
+                response = await client.create_new_interaction(self.user_ids, access_token=self.token)
+                interaction_id = response.json()["interaction"]["interactionId"]
+                return await scenario(client, interaction_id)
+        return asyncio.run(run())
+
+    def test_send_image_sources(self):
+        async def scenario(client, interaction_id):
+            images = ["https://example.com/face.png", self.image_path, _PNG, memoryview(_PNG), io.BytesIO(_PNG)]
+            return [await client.send_image(self.user_ids[0], interaction_id, image, access_token=self.token)
+                    for image in images]
+
+        responses = self._run(scenario)
+        self.assertEqual([200] * 5, [response.status_code for response in responses])
+        self.assertEqual(5, self.server.stats()["requests"]["send_input"])
+
+    def test_send_inputs_entries(self):
+        async def scenario(client, interaction_id):
+            inputs = [text_input(self.user_ids[0], interaction_id, "Hello"),
+                      image_input(self.user_ids[0], interaction_id, self.image_path)]
+            return await client.send_inputs(inputs, access_token=self.token)
+
+        response = self._run(scenario)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(2, len(response.json()["inputs"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
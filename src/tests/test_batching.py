@@ -0,0 +1,97 @@
+"""
+Tests of the micro-batching of inputs, run against the in-process stand-in service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import unittest
+
+from requests.exceptions import HTTPError
+
+from api.aei_ai import AeiClient
+from api.batching import BatchingSender
+from api.standin import StandInServer
+from api.tokens import TokenProvider
+
+
+class BatchingSenderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer(seed=0).start()
+        self.addCleanup(self.server.stop)
+        self.client = AeiClient(base_url=self.server.url)
+        self.addCleanup(self.client.close)
+        self.user_ids = self.server.add_users(2)
+        self.token = TokenProvider("sample", "secret", client=self.client).get_token()
+        self.interaction_id = self.client.create_new_interaction(self.user_ids, access_token=self.token) \
+            .json()["interaction"]["interactionId"]
+
+    def _sender(self, **kwargs) -> BatchingSender:
+        sender = BatchingSender(self.token, client=self.client, **kwargs)
+        self.addCleanup(sender.close)
+        return sender
+
+    def _batches(self) -> int:
+        return self.server.stats()["requests"].get("send_inputs", 0)
+
+    def test_full_batch(self):
+        sender = self._sender(max_batch_size=4, max_delay=60)
+        futures = [sender.send_text(self.user_ids[i % 2], self.interaction_id, "text %d" % i) for i in range(8)]
+
+        # full batches are sent at once, each future resolving to the result of its own input
+        results = [future.result(timeout=5) for future in futures]
+        self.assertEqual([self.user_ids[i % 2] for i in range(8)], [result["userId"] for result in results])
+        self.assertEqual(2, self._batches())
+
+    def test_deadline(self):
+        sender = self._sender(max_batch_size=100, max_delay=0.05)
+        futures = [sender.send_text(self.user_ids[0], self.interaction_id, "text %d" % i) for i in range(3)]
+
+        self.assertEqual([200] * 3, [future.result(timeout=5)["status"]["code"] for future in futures])
+        self.assertEqual(1, self._batches())
+
+    def test_per_input_status(self):
+        sender = self._sender(max_delay=60)
+        known = sender.send_text(self.user_ids[0], self.interaction_id, "Hello")
+        unknown = sender.send_text(self.user_ids[0], "unknown", "Hello")
+        sender.flush()
+
+        self.assertEqual(200, known.result(timeout=5)["status"]["code"])
+        self.assertEqual(404, unknown.result(timeout=5)["status"]["code"])
+
+    def test_rejected_batch(self):
+        sender = self._sender(max_delay=60)
+        self.server.error_rate = 1.0
+        futures = [sender.send_text(self.user_ids[0], self.interaction_id, "text %d" % i) for i in range(3)]
+        sender.flush()
+
+        for future in futures:
+            with self.assertRaises(HTTPError):
+                future.result(timeout=5)
+
+    def test_cancelled_input(self):
+        sender = self._sender(max_delay=60)
+        cancelled = sender.send_text(self.user_ids[0], self.interaction_id, "Never mind")
+        self.assertTrue(cancelled.cancel())
+        kept = sender.send_text(self.user_ids[0], self.interaction_id, "Hello")
+        queries = self.server.state.queries
+        sender.flush()
+
+        self.assertEqual(200, kept.result(timeout=5)["status"]["code"])
+        self.assertEqual(1, self.server.state.queries - queries)
+
+    def test_close(self):
+        sender = self._sender(max_delay=60)
+        future = sender.send_text(self.user_ids[0], self.interaction_id, "Hello")
+        sender.close()
+
+        # closing sends what is queued, then refuses new inputs
+        self.assertTrue(future.done())
+        self.assertEqual(200, future.result()["status"]["code"])
+        with self.assertRaises(RuntimeError):
+            sender.send_text(self.user_ids[0], self.interaction_id, "Hello")
+
+
+if __name__ == "__main__":
+    unittest.main()
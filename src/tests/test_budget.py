@@ -0,0 +1,93 @@
+"""
+Tests of the local query budget, run against the in-process stand-in service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import time
+import unittest
+
+from api.aei_ai import AeiClient
+from api.budget import BudgetExceededError, QueryBudget
+from api.standin import StandInServer
+
+
+class QueryBudgetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer(seed=0).start()
+        self.addCleanup(self.server.stop)
+        self.user_ids = self.server.add_users(2)
+        self.token = self.server.issue_token()
+
+    def _client(self, budget: QueryBudget) -> AeiClient:
+        client = AeiClient(base_url=self.server.url, budget=budget)
+        self.addCleanup(client.close)
+        return client
+
+    def _wait_synced(self, budget: QueryBudget):
+        deadline = time.monotonic() + 5
+        while budget._syncing and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_local_count(self):
+        budget = QueryBudget(self.token, quota=100)
+        client = self._client(budget)
+        budget.sync()
+        for _ in range(3):
+            client.get_user(self.user_ids[0], access_token=self.token)
+        client.get_interaction_list(access_token=self.token)
+        self.assertEqual(budget.used(), 3)
+        self.assertEqual(budget.remaining_budget(), 97)
+        self.assertEqual(budget.counts(), {"get_user": 3})
+
+    def test_drift_corrected(self):
+        budget = QueryBudget(self.token)
+        client = self._client(budget)
+        budget.sync()
+        client.get_user(self.user_ids[0], access_token=self.token)
+        # queries made by another client
+        with AeiClient(base_url=self.server.url) as other:
+            for _ in range(4):
+                other.get_user(self.user_ids[1], access_token=self.token)
+        self.assertTrue(budget.sync())
+        self.assertEqual(budget.used(), 5)
+        self.assertEqual(budget.drift, 4)
+
+    def test_sync_off_the_call(self):
+        # metrics requests take a second, which the call must not wait for
+        budget = QueryBudget(self.token, sync_every=1)
+        client = self._client(budget)
+        budget.sync()
+        client.get_user(self.user_ids[0], access_token=self.token)
+        self.server.latency = lambda rng: 1.0
+        start = time.monotonic()
+        client.get_user(self.user_ids[0], access_token=self.token)
+        self.assertLess(time.monotonic() - start, 1.9)
+        self.server.latency = None
+        self._wait_synced(budget)
+
+    def test_quota_from_subscription(self):
+        budget = QueryBudget(self.token, plan_quotas={"free": 2, "pro": 1000}, refuse=True)
+        client = self._client(budget)
+        self.assertIsNone(budget.remaining_budget())
+        budget.sync()
+        self.assertEqual(budget.quota, 2)
+        client.get_user(self.user_ids[0], access_token=self.token)
+        client.get_user(self.user_ids[0], access_token=self.token)
+        with self.assertRaises(BudgetExceededError):
+            client.get_user(self.user_ids[0], access_token=self.token)
+        client.update_subscription("pro", access_token=self.token)
+        budget.sync()
+        self.assertEqual(budget.remaining_budget(), 998)
+
+    def test_given_quota_kept(self):
+        budget = QueryBudget(self.token, quota=10, plan_quotas={"free": 2})
+        self._client(budget)
+        budget.sync()
+        self.assertEqual(budget.quota, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
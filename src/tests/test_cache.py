@@ -0,0 +1,129 @@
+"""
+Tests of the user model response cache, run against the in-process stand-in service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import threading
+import time
+import unittest
+
+from api.aei_ai import AeiClient, ResponseCache
+from api.standin import StandInServer
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer(seed=0).start()
+        self.addCleanup(self.server.stop)
+        self.user_ids = self.server.add_users(3)
+        self.token = self.server.issue_token()
+
+    def _client(self, cache: ResponseCache) -> AeiClient:
+        client = AeiClient(base_url=self.server.url, cache=cache)
+        self.addCleanup(client.close)
+        return client
+
+    def _interaction(self, client: AeiClient) -> str:
+        response = client.create_new_interaction(self.user_ids, access_token=self.token)
+        return response.json()["interaction"]["interactionId"]
+
+    def _requests(self) -> int:
+        return self.server.stats()["requests"].get("get_user_facet", 0)
+
+    def _emotion(self, client: AeiClient, user_id: str):
+        return client.get_user_emotion(user_id, access_token=self.token).json()["emotion"]
+
+    def test_read_write_reread(self):
+        client = self._client(ResponseCache())
+        interaction_id = self._interaction(client)
+
+        before = self._emotion(client, self.user_ids[0])
+        self.assertEqual(before, self._emotion(client, self.user_ids[0]))
+        self.assertEqual(1, self._requests())
+
+        # an input of the user drops its cached responses, so the next read sees the moved emotion
+        client.send_text(self.user_ids[0], interaction_id, "Hello", access_token=self.token)
+        after = self._emotion(client, self.user_ids[0])
+        self.assertEqual(2, self._requests())
+        self.assertNotEqual(before, after)
+        self.assertEqual(self.server.state.users[self.user_ids[0]]["affect"]["emotion"], after)
+
+    def test_inputs_invalidate_their_users_only(self):
+        client = self._client(ResponseCache())
+        interaction_id = self._interaction(client)
+        for user_id in self.user_ids:
+            self._emotion(client, user_id)
+
+        client.send_inputs([{"userId": self.user_ids[0], "interactionId": interaction_id, "text": "Hello"}],
+                           access_token=self.token)
+        for user_id in self.user_ids:
+            self._emotion(client, user_id)
+        self.assertEqual(4, self._requests())
+
+    def test_ttl(self):
+        client = self._client(ResponseCache(ttls={"emotion": 0.05, "mood": 0}))
+        self._emotion(client, self.user_ids[0])
+        self._emotion(client, self.user_ids[0])
+        self.assertEqual(1, self._requests())
+        time.sleep(0.1)
+        self._emotion(client, self.user_ids[0])
+        self.assertEqual(2, self._requests())
+
+        # facets without time-to-live are never cached
+        for _ in range(2):
+            client.get_user_mood(self.user_ids[0], access_token=self.token)
+        self.assertEqual(4, self._requests())
+
+    def test_lru(self):
+        cache = ResponseCache(max_entries=2)
+        client = self._client(cache)
+        for user_id in (self.user_ids[0], self.user_ids[1], self.user_ids[0], self.user_ids[2]):
+            self._emotion(client, user_id)
+        self.assertEqual(3, self._requests())
+        self.assertEqual(2, len(cache))
+
+        # the least recently used user was evicted, the other ones are still cached
+        self._emotion(client, self.user_ids[0])
+        self._emotion(client, self.user_ids[2])
+        self.assertEqual(3, self._requests())
+        self._emotion(client, self.user_ids[1])
+        self.assertEqual(4, self._requests())
+
+    def test_put_after_invalidation(self):
+        cache = ResponseCache()
+        generation = cache.generation(self.user_ids[0])
+        cache.invalidate_user(self.user_ids[0])
+        # a response requested before the input is older than it, so it is not cached
+        cache.put(self.token, self.user_ids[0], "emotion", object(), generation)
+        self.assertIsNone(cache.get(self.token, self.user_ids[0], "emotion"))
+
+    def test_concurrent_reads_and_writes(self):
+        self.server.latency = lambda rng: 0.002
+        client = self._client(ResponseCache())
+        interaction_id = self._interaction(client)
+        stop = threading.Event()
+
+        def read():
+            while not stop.is_set():
+                self._emotion(client, self.user_ids[0])
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        try:
+            for i in range(20):
+                client.send_text(self.user_ids[0], interaction_id, "Hello %d" % i, access_token=self.token)
+                # reads that raced with the input never leave a stale response behind
+                self.assertEqual(self.server.state.users[self.user_ids[0]]["affect"]["emotion"],
+                                 self._emotion(client, self.user_ids[0]))
+        finally:
+            stop.set()
+            for reader in readers:
+                reader.join()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Tests of the concurrent empathy matrix retrieval, run against the in-process stand-in service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import math
+import unittest
+
+from api.aei_ai import AeiClient
+from api.empathy import empathy_matrix
+from api.standin import StandInServer
+
+
+class _Body:
+    status_code = 200
+    content = b'{"status": {"code": 200}}'
+
+
+class _NoScoresClient(AeiClient):
+    """Client whose empathy responses of the first user carry no scores."""
+    def __init__(self, *args, user_id, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user_id = user_id
+
+    def get_user_empathy(self, user_id, target_user_ids, access_token):
+        if user_id == self.user_id:
+            return _Body()
+        return super().get_user_empathy(user_id, target_user_ids, access_token=access_token)
+
+
+class EmpathyMatrixTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer(seed=0).start()
+        self.addCleanup(self.server.stop)
+        self.user_ids = self.server.add_users(5)
+        self.token = self.server.issue_token()
+        self.client = AeiClient(base_url=self.server.url)
+        self.addCleanup(self.client.close)
+
+    def _expected(self, user_id: str, target_id: str) -> float:
+        pad = self.server.state.users[user_id]["affect"]["emotion"]["pad"]
+        target_pad = self.server.state.users[target_id]["affect"]["emotion"]["pad"]
+        distance = sum((pad[key] - target_pad[key]) ** 2 for key in pad) ** 0.5
+        return max(0.0, 1.0 - distance / 12 ** 0.5)
+
+    def _assert_scores(self, matrix):
+        for user_id in matrix.user_ids:
+            for target_id in matrix.user_ids:
+                if user_id == target_id:
+                    self.assertTrue(math.isnan(matrix.get(user_id, target_id)))
+                else:
+                    self.assertAlmostEqual(self._expected(user_id, target_id), matrix.get(user_id, target_id))
+
+    def test_matrix(self):
+        matrix = empathy_matrix(self.user_ids, self.token, client=self.client)
+        self.assertTrue(matrix.is_complete())
+        self._assert_scores(matrix)
+        self.assertEqual(5, self.server.stats()["requests"]["get_user_facet"])
+
+    def test_targets_split(self):
+        # URLs too short for two targets, so that every target is requested on its own
+        matrix = empathy_matrix(self.user_ids, self.token, client=self.client, max_url_length=1)
+        self.assertTrue(matrix.is_complete())
+        self._assert_scores(matrix)
+        self.assertEqual(5 * 4, self.server.stats()["requests"]["get_user_facet"])
+
+    def test_update(self):
+        matrix = empathy_matrix(self.user_ids, self.token, client=self.client)
+        self.server.reset_stats()
+        self.server.state.users[self.user_ids[0]]["affect"]["emotion"]["pad"] = \
+            {"pleasure": 1.0, "arousal": 1.0, "dominance": 1.0}
+        new_user_id = self.server.add_users(1)[0]
+        matrix.update([self.user_ids[0], new_user_id], self.token, client=self.client)
+
+        self.assertEqual(self.user_ids + [new_user_id], matrix.user_ids)
+        self.assertTrue(matrix.is_complete())
+        self._assert_scores(matrix)
+        # full rows of changed users, and one request per other user for their columns
+        self.assertEqual(6, self.server.stats()["requests"]["get_user_facet"])
+
+    def test_missing_scores(self):
+        with _NoScoresClient(base_url=self.server.url, user_id=self.user_ids[0]) as client:
+            matrix = empathy_matrix(self.user_ids, self.token, client=client)
+
+        self.assertFalse(matrix.is_complete())
+        self.assertEqual([self.user_ids[0]], list(matrix.errors))
+        self.assertTrue(all(math.isnan(matrix.get(self.user_ids[0], target_id)) for target_id in self.user_ids))
+        self.assertAlmostEqual(self._expected(self.user_ids[1], self.user_ids[0]),
+                               matrix.get(self.user_ids[1], self.user_ids[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
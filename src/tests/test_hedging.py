@@ -0,0 +1,192 @@
+"""
+Tests of hedged requests, run against fake copies and the in-process stand-in service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import threading
+import time
+import unittest
+
+from requests.exceptions import ConnectionError
+
+from api.aei_ai import AeiClient
+from api.budget import QueryBudget
+from api.hedging import Hedging
+from api.standin import StandInServer
+
+
+class _Response:
+    """Response of a fake copy, recording whether it was closed."""
+    def __init__(self, copy: int):
+        self.copy = copy
+        self.status_code = 200
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class _Copies:
+    """Sends copies taking given numbers of seconds in turn, the last one repeated, failing the given copies."""
+    def __init__(self, *durations: float, failing=()):
+        self.durations = list(durations)
+        self.failing = set(failing)
+        self.sent = 0
+        self.responses = []
+        self._lock = threading.Lock()
+
+    def send(self) -> _Response:
+        with self._lock:
+            copy = self.sent
+            self.sent += 1
+        time.sleep(self.durations[min(copy, len(self.durations) - 1)])
+        if copy in self.failing:
+            raise ConnectionError("Connection reset.")
+        response = _Response(copy)
+        self.responses.append(response)
+        return response
+
+
+class HedgingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.hedging = Hedging(min_samples=5, min_delay=0.05, max_extra_load=1.0, max_workers=4)
+        self.addCleanup(self.hedging.close)
+
+    def _learn(self, endpoint: str = "get_user"):
+        for _ in range(5):
+            self.hedging.execute(endpoint, _Copies(0.0).send)
+        self.assertEqual(self.hedging.delay(endpoint), 0.05)
+
+    def test_no_hedge_before_min_samples(self):
+        copies = _Copies(0.05)
+        for _ in range(4):
+            self.hedging.execute("get_user", copies.send)
+        self.assertEqual(copies.sent, 4)
+        self.assertIsNone(self.hedging.delay("get_user"))
+
+    def test_slow_copy_hedged(self):
+        self._learn()
+        copies = _Copies(0.5, 0.0)
+        hedged = []
+        answered = []
+        response = self.hedging.execute("get_user", copies.send, on_hedge=lambda endpoint, won: hedged.append(won),
+                                        on_response=lambda endpoint, response: answered.append(response))
+        self.assertEqual(response.copy, 1)
+        self.assertEqual(hedged, [True])
+        stats = self.hedging.stats()["get_user"]
+        self.assertEqual((stats["requests"], stats["hedges"], stats["hedges_won"]), (6, 1, 1))
+        # the losing copy is answered later, and its response discarded
+        deadline = time.monotonic() + 2
+        while len(copies.responses) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.01)
+        self.assertTrue(copies.responses[1].closed)
+        # both copies are reported, the losing one once it is answered
+        self.assertEqual(sorted(response.copy for response in answered), [0, 1])
+
+    def test_failed_copy_not_reported(self):
+        self._learn()
+        copies = _Copies(0.2, 0.0, failing=[0])
+        answered = []
+        response = self.hedging.execute("get_user", copies.send,
+                                        on_response=lambda endpoint, response: answered.append(response))
+        self.assertEqual(response.copy, 1)
+        self.hedging.close()
+        # the hedged copy, the only one answered, is reported once
+        self.assertEqual([response.copy for response in answered], [1])
+
+    def test_fast_copy_not_hedged(self):
+        self._learn()
+        copies = _Copies(0.0)
+        self.hedging.execute("get_user", copies.send)
+        self.assertEqual(copies.sent, 1)
+        self.assertEqual(self.hedging.stats()["get_user"]["hedges"], 0)
+
+    def test_extra_load_capped(self):
+        hedging = Hedging(min_samples=5, min_delay=0.01, max_extra_load=0.1, max_workers=4)
+        self.addCleanup(hedging.close)
+        for _ in range(5):
+            hedging.execute("get_user", _Copies(0.0).send)
+        copies = _Copies(0.03)
+        for _ in range(20):
+            hedging.execute("get_user", copies.send)
+        # one credit to start with, and a tenth of a credit per request
+        hedges = hedging.stats()["get_user"]["hedges"]
+        self.assertLessEqual(hedges, 1 + 25 * 0.1)
+        self.assertGreaterEqual(hedges, 1)
+        self.assertEqual(copies.sent, 20 + hedges)
+
+    def test_threads_bounded(self):
+        self._learn()
+        copies = _Copies(0.1)
+        threads_before = threading.active_count()
+        callers = [threading.Thread(target=self.hedging.execute, args=("get_user", copies.send)) for _ in range(16)]
+        for caller in callers:
+            caller.start()
+        peak = 0
+        while any(caller.is_alive() for caller in callers):
+            peak = max(peak, threading.active_count() - threads_before - len(callers))
+            time.sleep(0.005)
+        self.assertLessEqual(peak, self.hedging.max_workers)
+        # every caller got an answer, those finding the pool busy sending their copy themselves
+        self.assertEqual(len(copies.responses), copies.sent)
+        self.assertGreaterEqual(copies.sent, 16)
+
+
+class HedgedClientTest(unittest.TestCase):
+
+    def test_hedged_copies_charged(self):
+        # a single slow request, once the others have set the hedging deadline
+        slow = []
+        with StandInServer(seed=0, latency=lambda rng: slow.pop() if slow else 0.0) as server:
+            user_id = server.add_users(1)[0]
+            token = server.issue_token()
+            budget = QueryBudget(token)
+            hedging = Hedging(min_samples=5, min_delay=0.05, max_extra_load=1.0)
+            with AeiClient(base_url=server.url, hedging=hedging, budget=budget) as client:
+                budget.sync()
+                for _ in range(5):
+                    self.assertEqual(client.get_user(user_id, access_token=token).status_code, 200)
+                slow.append(0.5)
+                self.assertEqual(client.get_user(user_id, access_token=token).status_code, 200)
+                hedging.close()
+            self.assertEqual(hedging.stats()["get_user"]["hedges"], 1)
+            self.assertEqual(server.stats()["requests"]["get_user"], 7)
+            self.assertEqual(budget.used(), 7)
+            self.assertEqual(server.state.queries, 7)
+
+    def test_failed_copy_not_charged(self):
+        slow = []
+        with StandInServer(seed=0) as server:
+            user_id = server.add_users(1)[0]
+            token = server.issue_token()
+            budget = QueryBudget(token)
+            hedging = Hedging(min_samples=5, min_delay=0.05, max_extra_load=1.0)
+            with AeiClient(base_url=server.url, hedging=hedging, budget=budget) as client:
+                budget.sync()
+                for _ in range(5):
+                    self.assertEqual(client.get_user(user_id, access_token=token).status_code, 200)
+
+                # the first copy of the next call fails without reaching the service, after the hedge is sent
+                request = client.session.request
+
+                def failing_request(*args, **kwargs):
+                    if slow:
+                        slow.pop()
+                        time.sleep(0.3)
+                        raise ConnectionError("Connection reset.")
+                    return request(*args, **kwargs)
+                client.session.request = failing_request
+                slow.append(True)
+                self.assertEqual(client.get_user(user_id, access_token=token).status_code, 200)
+                hedging.close()
+            self.assertEqual(hedging.stats()["get_user"]["hedges_won"], 1)
+            self.assertEqual(server.state.queries, 6)
+            self.assertEqual(budget.used(), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Tests of the persistent affect history store.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from api.history import AffectStore
+
+
+class AffectStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = directory.name
+
+    def test_reopen(self):
+        with AffectStore(self.path) as store:
+            store.append([("u1", "emotion", (0.1, 0.2, 0.3), "i1")], timestamp=10.0)
+            store.append([("u2", "mood", (0.4, 0.5, 0.6), None), ("u1", "emotion", (0.1, 0.2, 0.3), "i1")],
+                         timestamp=20.0)
+        with AffectStore(self.path) as store:
+            self.assertEqual(len(store), 2)
+            self.assertEqual(store.user_ids, ["u1", "u2"])
+            self.assertEqual(store.latest("u2", "mood"), (0.4, 0.5, 0.6))
+            times, pad = store.series("u1", "emotion")
+            self.assertEqual(times.tolist(), [10.0])
+
+    def test_failed_write_truncated(self):
+        with AffectStore(self.path) as store:
+            store.append([("u1", "emotion", (0.1, 0.2, 0.3), "i1")], timestamp=10.0)
+            with mock.patch("api.history.os.fsync", side_effect=OSError("disk full")):
+                with self.assertRaises(OSError):
+                    store.append([("u2", "emotion", (0.4, 0.5, 0.6), "i2")], timestamp=20.0)
+            self.assertEqual(os.path.getsize(os.path.join(self.path, "time.f8")), 8)
+            store.append([("u3", "emotion", (0.7, 0.8, 0.9), None)], timestamp=30.0)
+            self.assertEqual(store.user_ids, ["u1", "u3"])
+        with AffectStore(self.path) as store:
+            self.assertEqual(len(store), 2)
+            self.assertEqual(store.user_ids, ["u1", "u3"])
+            times, pad = store.series("u3", "emotion")
+            self.assertEqual(times.tolist(), [30.0])
+            self.assertEqual(pad.tolist(), [[0.7, 0.8, 0.9]])
+
+    def test_clock_set_back(self):
+        with AffectStore(self.path) as store:
+            store.append([("u1", "emotion", (0.1, 0.2, 0.3), None)], timestamp=2e9)
+            with self.assertRaises(ValueError):
+                store.append([("u1", "emotion", (0.4, 0.5, 0.6), None)], timestamp=1e9)
+            # snapshots taken now are recorded at the latest time instead
+            self.assertEqual(store.append([("u1", "emotion", (0.4, 0.5, 0.6), None)]), 1)
+            times, _ = store.series("u1", "emotion")
+            self.assertEqual(times.tolist(), [2e9, 2e9])
+
+
+if __name__ == "__main__":
+    unittest.main()
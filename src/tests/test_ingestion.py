@@ -0,0 +1,103 @@
+"""
+Tests of the resumable bulk ingestion, run against the in-process stand-in service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from requests.exceptions import ConnectionError
+
+from api.aei_ai import AeiClient
+from api.ingestion import Checkpoint, IngestionError, Ingestor
+from api.standin import StandInServer
+from api.tokens import TokenProvider
+
+_RECORDS = 40
+
+
+class _CrashingClient(AeiClient):
+    """Client recording the input batches sent through it, whose given call fails as if the process crashed."""
+    def __init__(self, *args, crash_at: int = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.crash_at = crash_at
+        self.crashed_key = None
+        self.batches = []
+
+    def send_inputs(self, inputs, access_token, idempotency_key=None):
+        if len(self.batches) == self.crash_at:
+            self.crash_at = None
+            self.crashed_key = idempotency_key
+            raise ConnectionError("Connection reset.")
+        self.batches.append((idempotency_key, [entry["text"] for entry in inputs]))
+        return super().send_inputs(inputs, access_token=access_token, idempotency_key=idempotency_key)
+
+
+class IngestionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer(seed=0).start()
+        self.addCleanup(self.server.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log_path = os.path.join(directory.name, "log.jsonl")
+        with open(self.log_path, "w") as f:
+            for line in range(_RECORDS):
+                if line == 7:
+                    f.write("not json\n")
+                    continue
+                record = {"user_id": "u%d" % (line % 3), "interaction_id": "i%d" % (line % 4), "text": "t%d" % line}
+                f.write(json.dumps(record) + "\n")
+
+    def _ingestor(self, client: AeiClient) -> Ingestor:
+        self.addCleanup(client.close)
+        tokens = TokenProvider("sample", "secret", client=client)
+        return Ingestor(tokens, client=client, workers=2, batch_size=5, checkpoint_interval=0.0)
+
+    def test_resume_after_crash(self):
+        crashing = _CrashingClient(base_url=self.server.url, crash_at=3)
+        with self.assertRaises(IngestionError):
+            self._ingestor(crashing).run(self.log_path)
+        checkpoint = Checkpoint(self.log_path + ".checkpoint", self.log_path)
+        checkpoint.close()
+        self.assertLess(checkpoint.line, _RECORDS)
+
+        resumed = _CrashingClient(base_url=self.server.url)
+        stats = self._ingestor(resumed).run(self.log_path)
+
+        # every valid record is sent exactly once across both runs, users and interactions are created once
+        texts = [text for _, batch in crashing.batches + resumed.batches for text in batch]
+        self.assertEqual(sorted("t%d" % line for line in range(_RECORDS) if line != 7), sorted(texts))
+        self.assertEqual(3, self.server.stats()["requests"]["create_user"])
+        self.assertEqual(4, self.server.stats()["requests"]["create_interaction"])
+        self.assertEqual(0, stats.failed)
+        # only the batch that crashed is sent again, with the key of its first attempt
+        self.assertEqual(0, len(set(key for key, _ in crashing.batches) & set(key for key, _ in resumed.batches)))
+        self.assertIn(crashing.crashed_key, [key for key, _ in resumed.batches])
+
+    def test_new_keys_for_new_ingestion(self):
+        first = _CrashingClient(base_url=self.server.url)
+        self._ingestor(first).run(self.log_path)
+        os.remove(self.log_path + ".checkpoint")
+        second = _CrashingClient(base_url=self.server.url)
+        self._ingestor(second).run(self.log_path)
+
+        # the same records ingested again once their checkpoint is deleted are not dropped as duplicates
+        self.assertEqual(sorted(batch for _, batch in first.batches), sorted(batch for _, batch in second.batches))
+        self.assertEqual(set(), set(key for key, _ in first.batches) & set(key for key, _ in second.batches))
+
+    def test_checkpoint_of_another_log(self):
+        other_path = self.log_path + ".other"
+        with open(other_path, "w"):
+            pass
+        self._ingestor(_CrashingClient(base_url=self.server.url)).run(other_path, self.log_path + ".checkpoint")
+        with self.assertRaises(IngestionError):
+            self._ingestor(_CrashingClient(base_url=self.server.url)).run(self.log_path, self.log_path + ".checkpoint")
+
+
+if __name__ == "__main__":
+    unittest.main()
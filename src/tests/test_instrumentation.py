@@ -0,0 +1,45 @@
+"""
+Tests of request metrics, run against the in-process stand-in service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import unittest
+
+from api.aei_ai import AeiClient
+from api.instrumentation import Metrics
+from api.standin import StandInServer
+from api.transport import StdlibSession
+
+
+class MetricsTest(unittest.TestCase):
+
+    def _request_bytes(self, session=None) -> dict:
+        with StandInServer(seed=0) as server:
+            token = server.issue_token()
+            user_ids = server.add_users(2)
+            metrics = Metrics()
+            with AeiClient(base_url=server.url, hooks=[metrics], session=session) as client:
+                interaction_id = client.create_new_interaction(user_ids, access_token=token).json()[
+                    "interaction"]["interactionId"]
+                client.send_text(user_ids[0], interaction_id, "hello", access_token=token)
+                client.get_user(user_ids[0], access_token=token)
+            endpoints = metrics.snapshot()["endpoints"]
+            bytes_in = server.stats()["bytes_in"]
+        request_bytes = {endpoint: values["request_bytes"] for endpoint, values in endpoints.items()}
+        self.assertEqual(sum(request_bytes.values()), bytes_in)
+        return request_bytes
+
+    def test_request_bytes(self):
+        request_bytes = self._request_bytes()
+        self.assertGreater(request_bytes["create_new_interaction"], 0)
+        self.assertGreater(request_bytes["send_text"], 0)
+        self.assertEqual(request_bytes["get_user"], 0)
+
+    def test_request_bytes_with_stdlib_session(self):
+        self.assertEqual(self._request_bytes(StdlibSession()), self._request_bytes())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+"""
+Tests of the durable outbox of write calls, run against the in-process stand-in service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import os
+import socket
+import tempfile
+import time
+import unittest
+
+from api.aei_ai import AeiClient
+from api.outbox import Outbox
+from api.standin import StandInServer
+from api.tokens import TokenProvider
+
+
+class _RecordingClient(AeiClient):
+    """Client recording the calls replayed through it, in order."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+
+    def send_inputs(self, inputs, access_token, idempotency_key=None):
+        self.calls.append(("inputs", [entry["text"] for entry in inputs]))
+        return super().send_inputs(inputs, access_token=access_token, idempotency_key=idempotency_key)
+
+    def add_users_to_interaction(self, interaction_id, user_ids, access_token):
+        self.calls.append(("join", list(user_ids)))
+        return super().add_users_to_interaction(interaction_id, user_ids, access_token=access_token)
+
+
+class _Body:
+    status_code = 200
+    content = b"<html>maintenance</html>"
+
+
+class _InvalidBodyClient(_RecordingClient):
+    """Client whose input batches are answered with a body that is not JSON."""
+    def send_inputs(self, inputs, access_token, idempotency_key=None):
+        self.calls.append(("inputs", [entry["text"] for entry in inputs]))
+        return _Body()
+
+
+def _closed_port_url() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return "http://127.0.0.1:%d" % s.getsockname()[1]
+
+
+class OutboxTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer(seed=0).start()
+        self.addCleanup(self.server.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "outbox.jsonl")
+        self.tokens = TokenProvider("user", "password", client=AeiClient(base_url=self.server.url))
+        self.user_ids = self.server.add_users(2)
+        with AeiClient(base_url=self.server.url) as client:
+            self.interaction_id = self.tokens.call(client.create_new_interaction,
+                                                   user_ids=self.user_ids[:1]).json()["interaction"]["interactionId"]
+
+    def _outbox(self, client: AeiClient = None, **kwargs) -> Outbox:
+        client = client if client is not None else _RecordingClient(base_url=self.server.url)
+        self.addCleanup(client.close)
+        return Outbox(self.path, self.tokens, client=client, workers=2, batch_size=3, **kwargs)
+
+    def _text(self, outbox: Outbox, text: str) -> int:
+        return outbox.send_text(self.user_ids[0], self.interaction_id, text)
+
+    def test_replay_order(self):
+        outbox = self._outbox()
+        client = outbox.client
+        for i in range(4):
+            self._text(outbox, "t%d" % i)
+        outbox.add_users_to_interaction(self.interaction_id, self.user_ids[1:])
+        self._text(outbox, "t4")
+        with outbox:
+            self.assertTrue(outbox.flush(10))
+        self.assertEqual(client.calls, [("inputs", ["t0", "t1", "t2"]), ("inputs", ["t3"]),
+                                        ("join", self.user_ids[1:]), ("inputs", ["t4"])])
+        self.assertEqual(outbox.stats["sent"], 6)
+        self.assertEqual(len(outbox), 0)
+
+    def test_replay_after_crash(self):
+        outbox = self._outbox()
+        seqs = [self._text(outbox, "t%d" % i) for i in range(5)]
+        # never started, as if the process had crashed, the last line being torn
+        outbox._log.flush()
+        with open(self.path, "ab") as f:
+            f.write(b'{"seq": 5, "kind": "inp')
+        outbox = self._outbox()
+        self.assertEqual(len(outbox), 5)
+        client = outbox.client
+        with outbox:
+            self.assertTrue(outbox.flush(10))
+        self.assertEqual(client.calls, [("inputs", ["t0", "t1", "t2"]), ("inputs", ["t3", "t4"])])
+        outbox = self._outbox()
+        self.assertEqual(self._text(outbox, "t5"), seqs[-1] + 1)
+        outbox.close()
+
+    def test_compaction(self):
+        outbox = self._outbox(compact_threshold=4)
+        with outbox:
+            for i in range(10):
+                self._text(outbox, "t%d" % i)
+            self.assertTrue(outbox.flush(10))
+        self.assertGreaterEqual(outbox.stats["compactions"], 1)
+        with open(self.path, "rb") as f:
+            self.assertEqual(len(f.readlines()), 1)
+        self.assertEqual(os.path.getsize(self.path + ".acks"), 0)
+        # acknowledged calls are not replayed again
+        outbox = self._outbox()
+        self.assertEqual(len(outbox), 0)
+        outbox.close()
+
+    def test_exit_with_service_down(self):
+        outbox = self._outbox(client=_RecordingClient(base_url=_closed_port_url()), exit_timeout=0.5)
+        start = time.monotonic()
+        with outbox:
+            self._text(outbox, "t0")
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertGreaterEqual(outbox.stats["retries"], 1)
+        # kept for the next run
+        outbox = self._outbox()
+        self.assertEqual(len(outbox), 1)
+        outbox.close()
+
+    def test_invalid_response_dropped(self):
+        errors = []
+        outbox = self._outbox(client=_InvalidBodyClient(base_url=self.server.url),
+                              on_error=lambda entries, outcome: errors.append((entries, outcome)))
+        self._text(outbox, "t0")
+        self._text(outbox, "t1")
+        with outbox:
+            self.assertTrue(outbox.flush(10))
+        self.assertEqual(outbox.stats["retries"], 0)
+        self.assertEqual(outbox.stats["rejected"], 2)
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0][1], ValueError)
+        self.assertEqual(len(outbox), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Tests of concurrent user profile retrieval, run against the in-process stand-in service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import unittest
+
+from api.aei_ai import AeiClient
+from api.profiles import get_user_profiles
+from api.standin import StandInServer
+
+
+class _Body:
+    status_code = 200
+    content = b"<html>maintenance</html>"
+
+
+class _InvalidMoodClient(AeiClient):
+    """Client whose mood responses are not JSON."""
+    def get_user_mood(self, user_id, access_token, etag=None):
+        return _Body()
+
+
+class UserProfilesTest(unittest.TestCase):
+
+    def test_profiles(self):
+        with StandInServer(seed=0) as server:
+            user_ids = server.add_users(3)
+            with AeiClient(base_url=server.url) as client:
+                profiles = get_user_profiles(user_ids, server.issue_token(), client=client)
+        self.assertEqual([profile.user_id for profile in profiles], user_ids)
+        for profile in profiles:
+            self.assertTrue(profile.is_complete())
+            self.assertEqual(profile.user["user"]["userId"], profile.user_id)
+            self.assertEqual(set(profile.empathy["empathy"]), set(user_ids) - {profile.user_id})
+
+    def test_empathy_targets_split(self):
+        with StandInServer(seed=0) as server:
+            user_ids = server.add_users(20)
+            with AeiClient(base_url=server.url) as client:
+                profiles = get_user_profiles(user_ids, server.issue_token(), facets=["empathy"], client=client,
+                                             max_url_length=len(client.api_url) + 200)
+            requests = server.stats()["requests"]["get_user_facet"]
+        self.assertGreater(requests, len(user_ids))
+        for profile in profiles:
+            self.assertEqual(set(profile.empathy["empathy"]), set(user_ids) - {profile.user_id})
+
+    def test_invalid_facet_body(self):
+        with StandInServer(seed=0) as server:
+            user_ids = server.add_users(2)
+            with _InvalidMoodClient(base_url=server.url) as client:
+                profiles = get_user_profiles(user_ids, server.issue_token(), facets=["emotion", "mood"],
+                                             client=client)
+        for profile in profiles:
+            self.assertIsNotNone(profile.emotion)
+            self.assertIsNone(profile.mood)
+            self.assertIsInstance(profile.errors["mood"], ValueError)
+
+
+if __name__ == "__main__":
+    unittest.main()
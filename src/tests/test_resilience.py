@@ -0,0 +1,131 @@
+"""
+Tests of rate limiting, retries and circuit breaking, run against the in-process stand-in service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import asyncio
+import time
+import unittest
+
+from api.aei_ai import AeiClient
+from api.aei_ai_async import AsyncAeiClient
+from api.instrumentation import RequestHook
+from api.resilience import CircuitBreaker, CircuitOpenError, Resilience, RetryPolicy, TokenBucket
+from api.standin import StandInServer
+
+
+class ResilienceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer(seed=0, retry_after=0.1).start()
+        self.addCleanup(self.server.stop)
+        self.user_ids = self.server.add_users(1)
+        self.token = self.server.issue_token()
+
+    def _client(self, resilience: Resilience) -> AeiClient:
+        client = AeiClient(base_url=self.server.url, resilience=resilience)
+        self.addCleanup(client.close)
+        return client
+
+    def test_retry_after(self):
+        client = self._client(Resilience(retry_policy=RetryPolicy(max_retries=2, base_delay=0.001)))
+        self.server.throttle_rate = 1.0
+        start = time.monotonic()
+        response = client.get_user(self.user_ids[0], access_token=self.token)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(429, response.status_code)
+        self.assertEqual({429: 3}, self.server.stats()["statuses"])
+        # each retry waits for Retry-After rather than the much shorter backoff
+        self.assertGreaterEqual(elapsed, 0.2)
+
+    def test_retry_after_beyond_max_delay(self):
+        client = self._client(Resilience(retry_policy=RetryPolicy(max_retries=2, base_delay=0.001, max_delay=0.05)))
+        self.server.throttle_rate = 1.0
+        response = client.get_user(self.user_ids[0], access_token=self.token)
+
+        # the service asks to wait longer than the policy allows, so the request is not retried early
+        self.assertEqual(429, response.status_code)
+        self.assertEqual({429: 1}, self.server.stats()["statuses"])
+
+    def test_retry_until_success(self):
+        client = self._client(Resilience(retry_policy=RetryPolicy(max_retries=3, base_delay=0.001)))
+        self.server.throttle_rate = 1.0
+        client.add_hook(_StopThrottling(self.server))
+        response = client.get_user(self.user_ids[0], access_token=self.token)
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({429: 1, 200: 1}, self.server.stats()["statuses"])
+
+    def test_no_retry_without_idempotency_key(self):
+        client = self._client(Resilience(retry_policy=RetryPolicy(max_retries=2, base_delay=0.001)))
+        self.server.error_rate = 1.0
+        response = client.create_new_interaction(self.user_ids, access_token=self.token)
+
+        self.assertEqual(500, response.status_code)
+        self.assertEqual({500: 1}, self.server.stats()["statuses"])
+
+    def test_circuit_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+        client = self._client(Resilience(circuit_breaker=breaker))
+        self.server.error_rate = 1.0
+        for _ in range(2):
+            self.assertEqual(500, client.get_user(self.user_ids[0], access_token=self.token).status_code)
+        with self.assertRaises(CircuitOpenError):
+            client.get_user(self.user_ids[0], access_token=self.token)
+        self.assertEqual({500: 2}, self.server.stats()["statuses"])
+
+        # the trial call after the reset timeout closes the circuit again
+        self.server.error_rate = 0.0
+        time.sleep(0.25)
+        self.assertEqual(200, client.get_user(self.user_ids[0], access_token=self.token).status_code)
+        self.assertFalse(breaker.is_open)
+
+
+class AsyncResilienceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer(seed=0, retry_after=0.1).start()
+        self.addCleanup(self.server.stop)
+        self.user_ids = self.server.add_users(1)
+        self.token = self.server.issue_token()
+
+    def _run(self, resilience: Resilience, count: int = 1):
+        async def run():
+            async with AsyncAeiClient(base_url=self.server.url, resilience=resilience) as client:
+                return await asyncio.gather(*[client.get_user(self.user_ids[0], access_token=self.token)
+                                              for _ in range(count)])
+        return asyncio.run(run())
+
+    def test_retry_after(self):
+        self.server.throttle_rate = 1.0
+        start = time.monotonic()
+        responses = self._run(Resilience(retry_policy=RetryPolicy(max_retries=2, base_delay=0.001)))
+        elapsed = time.monotonic() - start
+
+        self.assertEqual([429], [response.status_code for response in responses])
+        self.assertEqual({429: 3}, self.server.stats()["statuses"])
+        self.assertGreaterEqual(elapsed, 0.2)
+
+    def test_rate_limit(self):
+        start = time.monotonic()
+        responses = self._run(Resilience(rate_limiter=TokenBucket(rate=20, capacity=1)), count=5)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual([200] * 5, [response.status_code for response in responses])
+        self.assertGreaterEqual(elapsed, 0.2)
+
+
+class _StopThrottling(RequestHook):
+    """Hook letting requests through the stand-in once the first one is retried."""
+    def __init__(self, server: StandInServer):
+        self.server = server
+
+    def on_retry(self, endpoint, attempt):
+        self.server.throttle_rate = 0.0
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Tests of the multi-process sharded executor, run against the in-process stand-in service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import unittest
+
+from api.aei_ai import AeiClient, text_input
+from api.sharding import ShardError, ShardedExecutor, stable_shard
+from api.standin import StandInServer
+from api.tokens import TokenProvider
+
+
+class ShardedExecutorTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInServer(seed=0).start()
+        cls.user_ids = cls.server.add_users(25)
+        # worker processes are slow to spawn, so all tests share them
+        cls.executor = ShardedExecutor("sample", "secret", base_url=cls.server.url, processes=2, threads=2,
+                                       batch_size=3)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.close()
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.error_rate = 0.0
+        self.server.paging = True
+
+    def _interactions(self, count: int):
+        with AeiClient(base_url=self.server.url) as client:
+            tokens = TokenProvider("sample", "secret", client=client)
+            return [tokens.call(client.create_new_interaction, user_ids=self.user_ids).json()["interaction"]
+                    ["interactionId"] for _ in range(count)]
+
+    def test_stable_shard(self):
+        self.assertEqual(stable_shard("interaction", 7), stable_shard("interaction", 7))
+        self.assertEqual(set(range(4)), {stable_shard("i%d" % i, 4) for i in range(100)})
+
+    def test_send_inputs(self):
+        interaction_ids = self._interactions(5) + ["unknown"]
+        inputs = [text_input(self.user_ids[i % 25], interaction_ids[i % 6], "text %d" % i) for i in range(40)]
+        queries = self.server.state.queries
+        statuses = self.executor.send_inputs(inputs)
+
+        # statuses come back in input order, whichever worker sent each input
+        self.assertEqual([404 if i % 6 == 5 else 200 for i in range(40)], list(statuses))
+        self.assertEqual(len([i for i in range(40) if i % 6 != 5]), self.server.state.queries - queries)
+
+    def test_affect_matrix(self):
+        for page_size in (None, 4, 1000):
+            matrix = self.executor.affect_matrix(page_size=page_size)
+            self.assertEqual(self.user_ids, list(matrix.user_ids))
+            self.assertEqual((25, 3), matrix.emotion.shape)
+
+    def test_affect_matrix_without_paging(self):
+        # a service ignoring limit and offset returns the whole list for every page, kept once
+        self.server.paging = False
+        matrix = self.executor.affect_matrix(page_size=4)
+        self.assertEqual(self.user_ids, list(matrix.user_ids))
+
+    def test_worker_error(self):
+        self.server.error_rate = 1.0
+        with self.assertRaises(ShardError):
+            self.executor.affect_matrix(page_size=4)
+
+        # workers are left ready for the next workload
+        self.server.error_rate = 0.0
+        self.assertEqual(self.user_ids, list(self.executor.affect_matrix(page_size=4).user_ids))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+"""
+Tests of the in-process stand-in service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import unittest
+
+from api.aei_ai import AeiClient
+from api.standin import StandInServer, lognormal_latency
+
+
+class StandInServerTest(unittest.TestCase):
+
+    def _run(self, seed: int):
+        latencies = []
+        sample = lognormal_latency(0.001)
+
+        def latency(rng):
+            latencies.append(sample(rng))
+            return latencies[-1]
+
+        with StandInServer(seed=seed, latency=latency, error_rate=0.3) as server:
+            user_id = server.add_users(1)[0]
+            token = server.issue_token()
+            with AeiClient(base_url=server.url) as client:
+                statuses = [client.get_user(user_id, access_token=token).status_code for _ in range(10)]
+        return latencies, statuses
+
+    def test_seeded_faults_reproducible(self):
+        # latencies and injected failures both come from the seeded generator
+        self.assertEqual(self._run(seed=1), self._run(seed=1))
+        self.assertNotEqual(self._run(seed=1)[0], self._run(seed=2)[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+Tests of streaming iteration over aEi.ai collections, run against the in-process stand-in service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import unittest
+
+from api.aei_ai import AeiClient
+from api.models import User
+from api.standin import StandInServer
+from api.streaming import iter_users
+
+
+class IterUsersTest(unittest.TestCase):
+
+    def _iter_user_ids(self, paging: bool, page_size: int, users: int = 25):
+        with StandInServer(seed=0, paging=paging) as server:
+            user_ids = server.add_users(users)
+            with AeiClient(base_url=server.url) as client:
+                found = [user["userId"] for user in iter_users(server.issue_token(), page_size=page_size,
+                                                               client=client)]
+        return user_ids, found
+
+    def test_pages(self):
+        for page_size in (1, 5, 7, 25, 100):
+            user_ids, found = self._iter_user_ids(True, page_size)
+            self.assertEqual(found, user_ids, "page size %d" % page_size)
+
+    def test_service_ignoring_paging(self):
+        for page_size in (1, 5, 7):
+            user_ids, found = self._iter_user_ids(False, page_size)
+            self.assertEqual(found, user_ids, "page size %d" % page_size)
+
+    def test_service_ignoring_paging_with_page_size_of_list(self):
+        # a full first page is requested again, and repeated by the service
+        user_ids, found = self._iter_user_ids(False, 25)
+        self.assertEqual(found, user_ids)
+
+    def test_models(self):
+        with StandInServer(seed=0) as server:
+            user_ids = server.add_users(3)
+            with AeiClient(base_url=server.url) as client:
+                users = list(iter_users(server.issue_token(), page_size=2, model=User, client=client))
+        self.assertEqual([user.user_id for user in users], user_ids)
+
+
+if __name__ == "__main__":
+    unittest.main()
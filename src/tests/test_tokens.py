@@ -0,0 +1,55 @@
+"""
+Tests of access token caching, run against the in-process stand-in service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import os
+import tempfile
+import unittest
+
+from api.aei_ai import AeiClient
+from api.standin import StandInServer
+from api.tokens import TokenProvider
+
+
+class TokenProviderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StandInServer(seed=0).start()
+        self.addCleanup(self.server.stop)
+        self.client = AeiClient(base_url=self.server.url)
+        self.addCleanup(self.client.close)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_path = os.path.join(directory.name, "token.json")
+
+    def _logins(self) -> int:
+        return self.server.stats()["requests"].get("login", 0)
+
+    def test_token_shared_between_providers(self):
+        first = TokenProvider("user", "password", client=self.client, cache_path=self.cache_path)
+        second = TokenProvider("user", "password", client=self.client, cache_path=self.cache_path)
+        token = first.get_token()
+        # the second provider was constructed before the token was persisted, and reads it instead of logging in
+        self.assertEqual(second.get_token(), token)
+        self.assertEqual(self._logins(), 1)
+        self.assertEqual(os.listdir(os.path.dirname(self.cache_path)), ["token.json"])
+
+    def test_rejected_token_not_reused(self):
+        first = TokenProvider("user", "password", client=self.client, cache_path=self.cache_path)
+        second = TokenProvider("user", "password", client=self.client, cache_path=self.cache_path)
+        token = first.get_token()
+        self.assertEqual(second.get_token(), token)
+        self.assertNotEqual(second.invalidate(token), token)
+        self.assertEqual(self._logins(), 2)
+
+    def test_unwritable_cache(self):
+        provider = TokenProvider("user", "password", client=self.client,
+                                 cache_path=os.path.join(self.cache_path, "missing", "token.json"))
+        self.assertTrue(provider.get_token())
+
+
+if __name__ == "__main__":
+    unittest.main()
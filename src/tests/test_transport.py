@@ -0,0 +1,103 @@
+"""
+Tests of the standard library transport, run against a raw socket service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import socket
+import threading
+import unittest
+
+from requests.exceptions import ConnectionError, ReadTimeout
+
+from api.transport import StdlibSession
+
+_REPLY = b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nContent-Type: application/json\r\n\r\n{}"
+
+
+class _DroppingService:
+    """Service replying to the first request of each connection, then closing it once a second one is received."""
+    def __init__(self, hang: bool = False):
+        self.hang = hang
+        self.requests = []
+        self._listener = socket.socket()
+        self._listener.bind(("127.0.0.1", 0))
+        self._listener.listen()
+        self.url = "http://127.0.0.1:%d/" % self._listener.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                connection, _ = self._listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+
+    def _handle(self, connection: socket.socket):
+        with connection:
+            for replied in (True, False):
+                request = self._read_request(connection)
+                if request is None:
+                    return
+                self.requests.append(request)
+                if replied:
+                    connection.sendall(_REPLY)
+                elif self.hang:
+                    connection.recv(1)
+
+    @staticmethod
+    def _read_request(connection: socket.socket):
+        data = b""
+        while b"\r\n\r\n" not in data:
+            chunk = connection.recv(4096)
+            if not chunk:
+                return None
+            data += chunk
+        head, body = data.split(b"\r\n\r\n", 1)
+        for line in head.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                while len(body) < int(value):
+                    body += connection.recv(4096)
+        return head.split(b" ", 1)[0], body
+
+    def close(self):
+        self._listener.close()
+
+
+class StdlibSessionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.session = StdlibSession()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_post_not_sent_twice(self):
+        service = _DroppingService()
+        self.addCleanup(service.close)
+        self.session.request("POST", service.url, data=b"first")
+        with self.assertRaises(ConnectionError):
+            self.session.request("POST", service.url, data=b"second")
+        self.assertEqual(service.requests, [(b"POST", b"first"), (b"POST", b"second")])
+
+    def test_get_sent_again(self):
+        service = _DroppingService()
+        self.addCleanup(service.close)
+        self.session.request("GET", service.url)
+        self.assertEqual(self.session.request("GET", service.url).json(), {})
+        self.assertEqual([method for method, _ in service.requests], [b"GET"] * 3)
+
+    def test_timeout_not_retried(self):
+        service = _DroppingService(hang=True)
+        self.addCleanup(service.close)
+        self.session.request("GET", service.url)
+        with self.assertRaises(ReadTimeout):
+            self.session.request("GET", service.url, timeout=0.2)
+        self.assertEqual(len(service.requests), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Tests of the streamed image upload bodies, run against the in-process stand-in service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from base64 import b64decode
+
+from api.aei_ai import AeiClient, image_input, text_input
+from api.standin import StandInServer
+from api.uploads import ImageBody, InputsBody, inputs_body, is_image_url
+
+_PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 40
+
+
+class _ShortReads(io.BytesIO):
+    """Seekable file returning at most 7 bytes per read, as sockets and pipes may."""
+    def read(self, size=-1):
+        return super().read(7 if size < 0 else min(size, 7))
+
+
+class UploadsTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "face.jpg")
+        with open(self.path, "wb") as f:
+            f.write(_PNG)
+        self.missing_path = os.path.join(directory.name, "fcae.jpg")
+
+    def test_is_image_url(self):
+        for url in ("http://example.com/face.png", "HTTPS://example.com/face.png", "data:image/png;base64,AA=="):
+            self.assertTrue(is_image_url(url))
+        for image in (self.path, self.missing_path, "example.com/face.png", "ftp://example.com/face.png", _PNG):
+            self.assertFalse(is_image_url(image))
+
+    def test_missing_path(self):
+        for image in (self.missing_path, "ftp://example.com/face.png"):
+            with self.assertRaises(FileNotFoundError):
+                ImageBody(image)
+            with self.assertRaises(FileNotFoundError):
+                InputsBody([image_input("u", "i", image)])
+
+    def test_path_body(self):
+        body = ImageBody(self.path, chunk_size=3 * 100)
+        # the content type of a file comes from its extension
+        self.assertEqual("image/jpeg", body.content_type)
+        chunks = [bytes(chunk) for chunk in body]
+        self.assertTrue(all(len(chunk) <= 300 for chunk in chunks))
+        self.assertEqual(_PNG, b"".join(chunks))
+        # bodies can be sent again, for example, by a retry
+        self.assertEqual(_PNG, b"".join(bytes(chunk) for chunk in body))
+        self.assertEqual(_PNG, b64decode(b"".join(body.iter_base64())))
+
+    def test_buffer_body(self):
+        for image in (_PNG, bytearray(_PNG), memoryview(_PNG)):
+            body = ImageBody(image, chunk_size=3 * 100)
+            self.assertEqual("image/png", body.content_type)
+            self.assertEqual(_PNG, b"".join(bytes(chunk) for chunk in body))
+            self.assertEqual(_PNG, b64decode(b"".join(body.iter_base64())))
+
+    def test_file_body(self):
+        file = _ShortReads(b"prefix" + _PNG)
+        file.seek(6)
+        body = ImageBody(file)
+        self.assertEqual("image/png", body.content_type)
+        # short reads are realigned, so that encoded chunks concatenate into one base64 string
+        self.assertEqual(_PNG, b64decode(b"".join(body.iter_base64())))
+        self.assertEqual(_PNG, b"".join(body))
+
+    def test_inputs_body(self):
+        inputs = [text_input("u1", "i1", "Hello \"there\""), image_input("u1", "i1", self.path),
+                  image_input("u2", "i1", "https://example.com/face.png"), image_input("u2", "i1", io.BytesIO(_PNG))]
+        body = inputs_body(inputs)
+        self.assertIsInstance(body, InputsBody)
+        for _ in range(2):
+            entries = json.loads(b"".join(body))["inputs"]
+            self.assertEqual(inputs[0], entries[0])
+            self.assertEqual(inputs[2], entries[2])
+            for entry, content_type in ((entries[1], "image/jpeg"), (entries[3], "image/png")):
+                self.assertEqual({"userId", "interactionId", "image"}, set(entry))
+                prefix = "data:%s;base64," % content_type
+                self.assertTrue(entry["image"].startswith(prefix))
+                self.assertEqual(_PNG, b64decode(entry["image"][len(prefix):]))
+
+        # inputs whose images are all URLs are sent as a plain string
+        self.assertEqual({"inputs": inputs[:1] + inputs[2:3]}, json.loads(inputs_body(inputs[:1] + inputs[2:3])))
+
+    def test_client_uploads(self):
+        with StandInServer(seed=0) as server, AeiClient(base_url=server.url) as client:
+            user_ids = server.add_users(1)
+            token = server.issue_token()
+            interaction_id = client.create_new_interaction(user_ids, access_token=token) \
+                .json()["interaction"]["interactionId"]
+
+            for image in (self.path, _PNG, io.BytesIO(_PNG)):
+                response = client.send_image(user_ids[0], interaction_id, image, access_token=token)
+                self.assertEqual(200, response.status_code)
+            response = client.send_inputs([image_input(user_ids[0], interaction_id, self.path)], access_token=token)
+            self.assertEqual(200, response.json()["inputs"][0]["status"]["code"])
+
+            # a mistyped path fails before anything is sent, rather than being sent as a URL
+            with self.assertRaises(FileNotFoundError):
+                client.send_image(user_ids[0], interaction_id, self.missing_path, access_token=token)
+            self.assertEqual(3, server.stats()["requests"]["send_input"])
+
+
+if __name__ == "__main__":
+    unittest.main()
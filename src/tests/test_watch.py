@@ -0,0 +1,60 @@
+"""
+Tests of adaptive emotion polling, run against the in-process stand-in service.
+
+Usage:
+    python -m unittest discover tests
+"""
+
+import time
+import unittest
+
+from api.aei_ai import AeiClient
+from api.standin import StandInServer
+from api.tokens import TokenProvider
+from api.watch import Watch
+
+
+def _wait(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class WatchTest(unittest.TestCase):
+
+    def test_first_poll_reported(self):
+        notifications = []
+        with StandInServer(seed=0) as server:
+            user_ids = server.add_users(2)
+            with AeiClient(base_url=server.url) as client:
+                with Watch(user_ids, callback=lambda *args: notifications.append(args),
+                           access_token=server.issue_token(), client=client, min_interval=0.05) as watch:
+                    _wait(lambda: watch.stats()["polls"] >= 4)
+        self.assertEqual(sorted(user_id for user_id, _, _, _ in notifications), sorted(user_ids))
+        self.assertTrue(all(previous is None for _, _, previous, _ in notifications))
+        stats = watch.stats()
+        self.assertEqual(stats["errors"], 0)
+        self.assertGreaterEqual(stats["not_modified"], 2)
+
+    def test_expired_token_refreshed(self):
+        errors = []
+        with StandInServer(seed=0) as server:
+            user_ids = server.add_users(1)
+            with AeiClient(base_url=server.url) as client:
+                tokens = TokenProvider("user", "password", client=client)
+                with Watch(user_ids, callback=lambda *args: None, access_token=tokens, client=client,
+                           min_interval=0.05, max_interval=0.05,
+                           on_error=lambda *args: errors.append(args)) as watch:
+                    _wait(lambda: watch.stats()["polls"] >= 2)
+                    # the service no longer accepts the token
+                    with server.state.lock:
+                        server.state.tokens.clear()
+                    polls = watch.stats()["polls"]
+                    _wait(lambda: watch.stats()["polls"] >= polls + 3)
+            logins = server.stats()["requests"]["login"]
+        self.assertEqual(errors, [])
+        self.assertEqual(logins, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()